@@ -0,0 +1,503 @@
+# batch_run.py
+# ディレクトリ内のPDFをまとめて処理するヘッドレス実行用エントリポイント
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+# 環境変数をここで読み込む（子プロセスでもimport時に読み込まれる）
+load_dotenv(override=True)
+import query_gui
+import mkmd_gui
+import pipeline_manifest
+import tracing
+import deadline as deadline_mod
+import progress
+
+EXPORT_FORMATS = ('md', 'pdf', 'pptx')
+# --progress で表示するイベント（ページ・トークンごとの通知は多すぎるため表示しない）
+PRINTED_EVENTS = ('stage_finished', 'llm_request')
+# PDF出力をまとめる場合に、1回のmarp起動で変換するMarkdownの最大数
+MARP_BATCH_SIZE = 50
+
+def find_pdfs(input_dir, recursive=False):
+    pdf_files = []
+    if recursive:
+        for root, _, files in os.walk(input_dir):
+            for name in files:
+                if name.lower().endswith('.pdf'):
+                    pdf_files.append(os.path.join(root, name))
+    else:
+        for name in os.listdir(input_dir):
+            path = os.path.join(input_dir, name)
+            if name.lower().endswith('.pdf') and os.path.isfile(path):
+                pdf_files.append(path)
+    return sorted(pdf_files)
+
+def find_duplicate_ids(pdf_files):
+    """
+    作業ディレクトリ名（query_gui.entry_id_for）が重なるPDFを {entry_id（小文字）: [パス, ...]} で返す。
+    -r で別のフォルダにある同じ名前のPDFは、同じ xmls/<entry_id> と output_marp/<entry_id> を
+    使ってしまい、並行して上書きしたり manifest.json で別の論文の結果を使ったりするため、処理前に止める。
+    大文字・小文字だけが違う名前も、区別しないファイルシステムがあるため重なりとして扱う。
+    """
+    groups = {}
+    for path in pdf_files:
+        groups.setdefault(query_gui.entry_id_for(path).lower(), []).append(path)
+    return {entry_id: paths for entry_id, paths in groups.items() if len(paths) > 1}
+
+def export_paper(dirpath, output_dir, formats=('md',), timeout_sec=60, start_time=None, deadline=None, on_event=None):
+    if start_time is None:
+        start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+    reporter = progress.Reporter(on_event)
+
+    # 論文ごとに出力先を分け、タイトル先頭14文字が同じ論文同士で上書きしないようにする
+    entry_id = os.path.basename(dirpath)
+    marp_dir = os.path.join(output_dir, "output_marp", entry_id)
+    md_file = mkmd_gui.convert_xmls_to_md(
+        dirpath,
+        output_dir=marp_dir,
+        timeout_sec=timeout_sec,
+        start_time=start_time,
+        deadline=deadline,
+        on_event=on_event
+    )
+    outputs = {'md': md_file}
+    base = os.path.splitext(md_file)[0]
+    # Markdownが前回と同じで出力ファイルも残っていれば、変換をやり直さない
+    manifest = pipeline_manifest.Manifest(dirpath)
+
+    if 'pdf' in formats:
+        import md2pdf
+        pdf_output = base + ".pdf"
+        pipeline_manifest.run_stage(
+            manifest, 'pdf', export_key(md_file, md2pdf.get_renderer()),
+            lambda: md2pdf.convert_md_to_pdf(md_file, pdf_output, deadline=deadline),
+            outputs=lambda r: [pdf_output],
+            reporter=reporter
+        )
+        outputs['pdf'] = pdf_output
+
+    if 'pptx' in formats:
+        # PPTXはMarkdownを経由せず paper.json から直接作る（図のスライドも含む）
+        import xml2pptx
+        pptx_output = base + ".pptx"
+        pipeline_manifest.run_stage(
+            manifest, 'pptx', xml2pptx.pptx_key(dirpath),
+            lambda: xml2pptx.convert_xml_to_pptx(dirpath, pptx_output, deadline=deadline),
+            outputs=lambda r: [pptx_output],
+            reporter=reporter
+        )
+        outputs['pptx'] = pptx_output
+
+    return outputs
+
+def export_key(md_file, *parts):
+    return pipeline_manifest.stage_key('export', pipeline_manifest.file_hash(md_file), *parts)
+
+def convert_pdf_chunk(md_files, timeout_sec, start_time):
+    """
+    md_files をまとめてPDFにし、{md_file: pdf_file または 例外} を返す。
+    marp が見つからない・期限切れなどで、まとめての変換自体が例外になった場合は、
+    1件ずつ（1件あたり timeout_sec で）変換し直し、失敗したファイルだけをエラーにする。
+    """
+    import md2pdf
+
+    # 1件ずつ変換していた場合と同じく、1件あたり timeout_sec を割り当てる
+    deadline = deadline_mod.Deadline(timeout_sec * len(md_files), start_time)
+    try:
+        return md2pdf.convert_mds_to_pdf(md_files, deadline=deadline)
+    except Exception as e:
+        print(f"まとめてのPDF変換に失敗したため、1件ずつ変換します: {type(e).__name__}: {e}")
+    converted = {}
+    for md_file in md_files:
+        pdf_output = os.path.splitext(md_file)[0] + ".pdf"
+        try:
+            md2pdf.convert_md_to_pdf(md_file, pdf_output, timeout_sec=timeout_sec)
+            converted[md_file] = pdf_output
+        except Exception as e:
+            converted[md_file] = e
+    return converted
+
+def export_pdfs_in_batch(results, timeout_sec=60, batch_size=MARP_BATCH_SIZE):
+    """
+    各論文のMarkdownを batch_size 件ずつまとめて1回のmarp起動でPDFにする。
+    marp（Node + Chromium）の起動を論文ごとに繰り返さないため、短いスライドが多いほど速い。
+    """
+    import md2pdf
+
+    pending = []
+    for result in results:
+        md_file = result['outputs'].get('md') if result['status'] == 'ok' else None
+        if not md_file:
+            continue
+        pdf_output = os.path.splitext(md_file)[0] + ".pdf"
+        manifest = pipeline_manifest.Manifest(result['dirpath'])
+        key = export_key(md_file, md2pdf.get_renderer())
+        if manifest.is_fresh('pdf', key):
+            result['outputs']['pdf'] = pdf_output
+        else:
+            pending.append((result, manifest, key))
+
+    for i in range(0, len(pending), batch_size):
+        chunk = pending[i:i + batch_size]
+        start_time = time.time()
+        converted = convert_pdf_chunk([r['outputs']['md'] for r, _, _ in chunk], timeout_sec, start_time)
+        elapsed = time.time() - start_time
+        for result, manifest, key in chunk:
+            pdf = converted.get(result['outputs']['md'])
+            if isinstance(pdf, str):
+                manifest.record('pdf', key, outputs=[pdf])
+                result['outputs']['pdf'] = pdf
+            else:
+                result['status'] = 'error'
+                result['error'] = f"{type(pdf).__name__}: {pdf}"
+            result['elapsed_sec'] = round((result['elapsed_sec'] or 0) + elapsed / len(chunk), 3)
+        print(f"PDF出力 [{min(i + batch_size, len(pending))}/{len(pending)}] {elapsed:.1f}s")
+
+def event_sender(events, pdf_path):
+    # ワーカープロセスの進捗イベントを (PDFのパス, Event) として親プロセスのキューに送る
+    if events is None:
+        return None
+    return lambda event: events.put((pdf_path, event))
+
+def process_one(pdf_path, output_dir, formats=('md',), timeout_sec=60, summarize=True, export=True, force=False,
+                events=None):
+    """
+    1つのPDFに対して process_pdf → MD生成 → 出力 を行い、結果をdictで返す。
+    例外は呼び出し元に投げず、レポート用に文字列化して返す。
+    summarize=False, export=False の場合はPDFの解析とpaper.jsonの作成だけを行う。
+    events（multiprocessing.Manager().Queue()）を渡すと進捗イベントを送る（--progress）。
+    """
+    on_event = event_sender(events, pdf_path)
+    start_time = time.time()
+    # 解析から出力まで同じ期限を使い、暴走したPDFでワーカーが止まり続けないようにする
+    deadline = deadline_mod.Deadline(timeout_sec, start_time)
+    result = {
+        'pdf': pdf_path,
+        'status': 'ok',
+        'dirpath': None,
+        'outputs': {},
+        'error': None,
+        'elapsed_sec': None,
+    }
+    try:
+        # TRACE_DIR が設定されていれば、解析から出力までを1つのトレースファイルにまとめる
+        with tracing.trace_run("batch_" + os.path.splitext(os.path.basename(pdf_path))[0]):
+            dirpath = query_gui.process_pdf(
+                pdf_path,
+                dir=output_dir,
+                timeout_sec=timeout_sec,
+                start_time=start_time,
+                summarize=summarize,
+                force=force,
+                deadline=deadline,
+                on_event=on_event
+            )
+            result['dirpath'] = dirpath
+            deadline.check()
+            if export:
+                result['outputs'] = export_paper(
+                    dirpath, output_dir, formats=formats, deadline=deadline, on_event=on_event
+                )
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['elapsed_sec'] = round(time.time() - start_time, 3)
+    return result
+
+def export_one(result, output_dir, formats=('md',), timeout_sec=60, events=None):
+    # 要約の書き戻し後に出力だけを行う
+    start_time = time.time()
+    try:
+        with tracing.trace_run("export_" + os.path.basename(result['dirpath'])):
+            result['outputs'] = export_paper(
+                result['dirpath'], output_dir, formats=formats,
+                timeout_sec=timeout_sec, start_time=start_time,
+                on_event=event_sender(events, result['pdf'])
+            )
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['elapsed_sec'] = round((result['elapsed_sec'] or 0) + time.time() - start_time, 3)
+    return result
+
+def run_pool(executor, fn, items, label):
+    """
+    items の各要素 (key, args) について fn(*args) をプールで実行し、
+    完了順に進捗を表示しながら結果のリストを返す。
+    """
+    results = []
+    start_time = time.time()
+    futures = {executor.submit(fn, *args): key for key, args in items}
+    for i, future in enumerate(as_completed(futures), 1):
+        pdf = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            # ワーカープロセス自体が落ちた場合
+            result = {
+                'pdf': pdf,
+                'status': 'error',
+                'dirpath': None,
+                'outputs': {},
+                'error': f"{type(e).__name__}: {e}",
+                'elapsed_sec': None,
+            }
+        results.append(result)
+        mark = "OK " if result['status'] == 'ok' else "NG "
+        eta = ""
+        if i < len(futures):
+            # ここまでに完了した件数の速さ（並列分を含む）で残りを見積もる
+            eta = "  " + progress.format_eta((time.time() - start_time) / i * (len(futures) - i))
+        print(f"{label}[{i}/{len(futures)}] {mark}{os.path.basename(pdf)} ({result['elapsed_sec']}s){eta}")
+        if result['error']:
+            print(f"    {result['error']}")
+    return results
+
+def print_events(events):
+    # ワーカーから届いた進捗イベントを表示する（--progress）。None を受け取ったら終了する
+    started = {}
+    while True:
+        item = events.get()
+        if item is None:
+            break
+        pdf, event = item
+        key = (pdf, event.stage)
+        if event.kind == 'stage_started':
+            started[key] = event.time
+            continue
+        if event.kind not in PRINTED_EVENTS:
+            continue
+        text = event.describe()
+        if event.kind == 'stage_finished' and key in started:
+            start = started.pop(key)
+            if not event.info.get('skipped'):
+                text += f" ({event.time - start:.1f}s)"
+        print(f"    {os.path.basename(pdf)}: {text}", flush=True)
+
+def summarize_results_in_batch(results, output_dir, poll_interval=30):
+    import batch_summary
+
+    dirpaths = [r['dirpath'] for r in results if r['status'] == 'ok']
+    if not dirpaths:
+        return
+    work_dir = os.path.join(output_dir, "batch_jobs")
+    summaries = batch_summary.summarize_dirpaths(dirpaths, work_dir, poll_interval=poll_interval)
+    for result in results:
+        summary = summaries.get(result['dirpath'])
+        if result['status'] == 'ok' and not isinstance(summary, dict):
+            result['status'] = 'error'
+            result['error'] = summary or "バッチ要約の結果がありません"
+
+def summarize_results_sync(results, timeout_sec=60):
+    """
+    解析済みの論文の要約を親プロセスでまとめて行い、paper.json と manifest.json の summary 段階に書き込む。
+    ワーカーごとに要約すると LLM_RPM / LLM_TPM の上限がプロセスの数だけ重なるため、
+    通常は query_gui.get_summaries で1つの AsyncLLMClient からまとめて送り、上限を全論文で共有する。
+    長文モードでは論文を1件ずつ要約する（チャンクは論文ごとのクライアントから並行して送る）。
+    summary 段階が前回と同じ論文はAPIを呼ばず、前回の結果を使う。
+    """
+    import batch_summary
+    import long_summary
+
+    pending = []
+    for result in results:
+        if result['status'] != 'ok':
+            continue
+        dirpath = result['dirpath']
+        manifest = pipeline_manifest.Manifest(dirpath)
+        metadata = manifest.result('metadata')
+        key = query_gui.summary_stage_key(metadata, manifest.source_hash(result['pdf']))
+        if manifest.is_fresh('summary', key):
+            # 中間データを作り直した場合は paper.json の要約が空欄になっているため書き戻す
+            if batch_summary.needs_summary(dirpath):
+                batch_summary.update_paper_summary(dirpath, manifest.result('summary'))
+            continue
+        pending.append((result, manifest, key, metadata))
+    if not pending:
+        return
+
+    start_time = time.time()
+    if long_summary.long_summary_enabled():
+        summaries = []
+        for i, (result, _, _, metadata) in enumerate(pending, 1):
+            try:
+                with tracing.trace_run("summary_" + os.path.basename(result['dirpath'])):
+                    summaries.append(long_summary.get_long_summary(
+                        result['pdf'], metadata, idle_timeout=timeout_sec,
+                        deadline=deadline_mod.Deadline(timeout_sec)
+                    ))
+            except Exception as e:
+                summaries.append(e)
+            print(f"要約 [{i}/{len(pending)}] {os.path.basename(result['pdf'])}")
+    else:
+        summaries = query_gui.get_summaries([metadata for _, _, _, metadata in pending], timeout=timeout_sec)
+    elapsed = time.time() - start_time
+
+    for (result, manifest, key, _), summary in zip(pending, summaries):
+        if isinstance(summary, Exception):
+            result['status'] = 'error'
+            result['error'] = f"{type(summary).__name__}: {summary}"
+        else:
+            batch_summary.update_paper_summary(result['dirpath'], summary)
+            manifest.record('summary', key, summary)
+        result['elapsed_sec'] = round((result['elapsed_sec'] or 0) + elapsed / len(pending), 3)
+    failed = sum(1 for s in summaries if isinstance(s, Exception))
+    print(f"要約 {len(pending)} 件 {elapsed:.1f}s" + (f"（失敗 {failed} 件）" if failed else ""))
+
+def run_batch(input_dir, output_dir='./output', workers=None, formats=('md',),
+              timeout_sec=60, recursive=False, report_path=None,
+              summary_mode='sync', poll_interval=30, force=False, marp_batch=MARP_BATCH_SIZE,
+              show_progress=False):
+    pdf_files = find_pdfs(input_dir, recursive=recursive)
+    if not pdf_files:
+        raise FileNotFoundError(f"{input_dir} にPDFファイルが見つかりません。")
+    duplicates = find_duplicate_ids(pdf_files)
+    if duplicates:
+        lines = "\n".join(f"  {entry_id}: {', '.join(paths)}" for entry_id, paths in duplicates.items())
+        raise ValueError(f"同じ名前のPDFが複数あります。出力先が重なるため、ファイル名を変えてください:\n{lines}")
+
+    # process_pdf内でスペースが置換されるため、ここでも揃えておく
+    output_dir = output_dir.replace(' ', '_')
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pdf_files)))
+
+    import md2pdf
+
+    # PDF出力は各ワーカーで行わず、最後にまとめてmarpを起動する
+    batch_pdf = 'pdf' in formats and marp_batch > 1 and md2pdf.get_renderer() == 'marp'
+    worker_formats = tuple(f for f in formats if f != 'pdf') if batch_pdf else formats
+
+    batch_start = time.time()
+    print(f"{len(pdf_files)} 件のPDFを {workers} プロセスで処理します。")
+    # --progress: ワーカープロセスの進捗イベントをキューで受け取り、別スレッドで表示する
+    events = None
+    manager = None
+    printer = None
+    if show_progress:
+        manager = multiprocessing.Manager()
+        events = manager.Queue()
+        printer = threading.Thread(target=print_events, args=(events,), daemon=True)
+        printer.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # 1) PDF解析のみ並列実行 2) 要約を親プロセスでまとめて実行 3) 出力を並列実行
+            results = run_pool(executor, process_one, [
+                (pdf, (pdf, output_dir, worker_formats, timeout_sec, False, False, force, events))
+                for pdf in pdf_files
+            ], label="解析")
+            if summary_mode == 'batch':
+                # Batch APIで一括実行する
+                summarize_results_in_batch(results, output_dir, poll_interval=poll_interval)
+            else:
+                # 送信量の上限（LLM_RPM / LLM_TPM）を全論文で共有するため、ワーカーでは要約しない
+                summarize_results_sync(results, timeout_sec=timeout_sec)
+            ok_results = [r for r in results if r['status'] == 'ok']
+            exported = run_pool(executor, export_one, [
+                (r['pdf'], (r, output_dir, worker_formats, timeout_sec, events)) for r in ok_results
+            ], label="出力")
+            results = [r for r in results if r['status'] != 'ok'] + exported
+    finally:
+        if manager is not None:
+            events.put(None)
+            printer.join()
+            manager.shutdown()
+
+    if batch_pdf:
+        export_pdfs_in_batch(results, timeout_sec=timeout_sec, batch_size=marp_batch)
+
+    results.sort(key=lambda r: r['pdf'])
+    report = {
+        'input_dir': input_dir,
+        'output_dir': output_dir,
+        'workers': workers,
+        'formats': list(formats),
+        'summary_mode': summary_mode,
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'elapsed_sec': round(time.time() - batch_start, 3),
+        'results': results,
+    }
+
+    if report_path is None:
+        report_path = os.path.join(output_dir, "batch_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"レポートを出力しました: {report_path}")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ディレクトリ内のPDFを一括でスライド化します。")
+    parser.add_argument('input_dir', help="PDFが格納されたディレクトリ")
+    parser.add_argument('-o', '--output-dir', default=os.getenv("OUTPUT_DIR", "./output"))
+    parser.add_argument('-j', '--workers', type=int, default=None, help="プロセス数（既定: CPUコア数）")
+    parser.add_argument('-f', '--formats', default='md',
+                        help="出力形式をカンマ区切りで指定 (md,pdf,pptx)")
+    parser.add_argument('-t', '--timeout', type=int, default=int(os.getenv("TIMEOUT_SEC", "60")),
+                        help="1ファイルあたりのタイムアウト(秒)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="サブディレクトリも探索する")
+    parser.add_argument('--report', default=None, help="レポートJSONの出力先")
+    parser.add_argument('--summary-mode', choices=('sync', 'batch'), default='sync',
+                        help="sync: APIを並行して呼ぶ / batch: Batch APIでまとめて要約する")
+    parser.add_argument('--poll', type=float, default=30, help="batchモードでの状態確認の間隔(秒)")
+    parser.add_argument('--force', action='store_true', help="manifest.jsonを無視して全段階をやり直す")
+    parser.add_argument('--pdf-renderer', choices=('marp', 'pymupdf'), default=None,
+                        help="PDF出力の方法（既定: 環境変数 PDF_RENDERER、未設定ならmarp）")
+    parser.add_argument('--marp-batch', type=int, default=MARP_BATCH_SIZE,
+                        help="PDF出力で1回のmarp起動にまとめる件数（1で論文ごとに起動）")
+    parser.add_argument('--progress', action='store_true',
+                        help="各PDFの段階の完了と要約リクエストの送信を表示する")
+    parser.add_argument('--long-summary', action='store_true',
+                        help="本文全体をチャンクに分けて要約する（長文モード、syncモードのみ）")
+    args = parser.parse_args(argv)
+
+    if args.pdf_renderer:
+        # ワーカープロセスにも引き継ぐため環境変数で渡す
+        os.environ["PDF_RENDERER"] = args.pdf_renderer
+    if args.long_summary:
+        if args.summary_mode == 'batch':
+            # Batch APIには paper.json の本文だけを送るため、チャンクの要約はできない
+            parser.error("--long-summary は --summary-mode sync でのみ使えます")
+        os.environ["LONG_SUMMARY"] = "1"
+    formats = tuple(f.strip() for f in args.formats.split(',') if f.strip())
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        parser.error(f"未対応の出力形式です: {', '.join(unknown)}")
+
+    try:
+        report = run_batch(
+            args.input_dir,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            formats=formats,
+            timeout_sec=args.timeout,
+            recursive=args.recursive,
+            report_path=args.report,
+            summary_mode=args.summary_mode,
+            poll_interval=args.poll,
+            force=args.force,
+            marp_batch=args.marp_batch,
+            show_progress=args.progress,
+        )
+    except ValueError as e:
+        print(e)
+        return 2
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
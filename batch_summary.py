@@ -0,0 +1,193 @@
+# batch_summary.py
+# 多数の論文の要約をOpenAIのBatch APIでまとめて実行する
+# process_pdf(summarize=False) で作成したpaper.jsonの title/abstract を
+# JSONLにまとめて投入し、完了後に各paper.jsonへ結果を書き戻す
+import os
+import sys
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+load_dotenv(override=True)
+import openai
+import query_gui
+import paper_record
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+def update_paper_summary(dirpath, summary_dict):
+    paper = paper_record.load(dirpath)
+    for field in query_gui.SUMMARY_FIELDS:
+        paper[field] = summary_dict.get(field, "N/A")
+    paper_record.save(dirpath, paper)
+
+def needs_summary(dirpath):
+    paper = paper_record.load(dirpath)
+    return all((paper.get(field) or "N/A") == "N/A" for field in query_gui.SUMMARY_FIELDS)
+
+def build_batch_requests(dirpaths, use_cache=None):
+    """
+    paper.jsonからBatch API用のリクエストを作る。
+    キャッシュに要約がある論文はリクエストに含めず、cached に入れて返す。
+    """
+    requests = []
+    mapping = {}
+    cached = {}
+    for i, dirpath in enumerate(dirpaths):
+        paper = paper_record.load(dirpath)
+        metadata = {
+            'title': paper.get('title') or "Unknown",
+            'abstract': paper.get('abstract') or "N/A",
+        }
+        text = query_gui.build_summary_text(metadata)
+        _, _, hit = query_gui.lookup_summary_cache(text, use_cache)
+        if hit is not None:
+            cached[dirpath] = hit
+            continue
+
+        custom_id = f"paper-{i:05d}"
+        mapping[custom_id] = {'dirpath': dirpath, 'text': text}
+        requests.append({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': {
+                'model': query_gui.MODEL,
+                'messages': query_gui.build_messages(text),
+                'temperature': query_gui.TEMPERATURE,
+            },
+        })
+    return requests, mapping, cached
+
+def submit_batch(client, requests, work_dir):
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    input_path = os.path.join(work_dir, f"batch_input_{stamp}.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for req in requests:
+            f.write(json.dumps(req, ensure_ascii=False) + "\n")
+
+    with open(input_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    print(f"バッチジョブを投入しました: {batch.id} ({len(requests)} 件)")
+    return batch
+
+def wait_for_batch(client, batch_id, poll_interval=30, timeout_sec=24 * 3600):
+    start_time = time.time()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"  {batch.status}: {counts.completed}/{counts.total} 完了, {counts.failed} 失敗")
+        else:
+            print(f"  {batch.status}")
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if (time.time() - start_time) > timeout_sec:
+            raise Exception(f"バッチジョブ {batch_id} の待機中にタイムアウトしました")
+        time.sleep(poll_interval)
+
+def apply_batch_results(client, batch, mapping, use_cache=None):
+    """
+    完了したバッチの出力を各paper.jsonに書き戻し、要約キャッシュにも保存する。
+    戻り値は {dirpath: summary_dict または エラー文字列}。
+    """
+    results = {}
+    if batch.output_file_id:
+        content = client.files.content(batch.output_file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            entry = mapping.get(item.get('custom_id'))
+            if entry is None:
+                continue
+            response = item.get('response') or {}
+            if item.get('error') or response.get('status_code') != 200:
+                results[entry['dirpath']] = f"バッチ要約に失敗: {item.get('error') or response.get('status_code')}"
+                continue
+            summary = response['body']['choices'][0]['message']['content']
+            summary_dict = query_gui.parse_summary(summary)
+            update_paper_summary(entry['dirpath'], summary_dict)
+            cache, cache_key, _ = query_gui.lookup_summary_cache(entry['text'], use_cache)
+            if cache is not None:
+                cache.put(cache_key, summary_dict, raw=summary)
+            results[entry['dirpath']] = summary_dict
+
+    for entry in mapping.values():
+        if entry['dirpath'] not in results:
+            results[entry['dirpath']] = f"バッチ要約の結果がありません (status: {batch.status})"
+    return results
+
+def summarize_dirpaths(dirpaths, work_dir, poll_interval=30, timeout_sec=24 * 3600,
+                       use_cache=None, client=None):
+    if client is None:
+        client = openai.OpenAI()
+
+    requests, mapping, cached = build_batch_requests(dirpaths, use_cache=use_cache)
+    results = {}
+    for dirpath, summary_dict in cached.items():
+        update_paper_summary(dirpath, summary_dict)
+        results[dirpath] = summary_dict
+    if not requests:
+        return results
+
+    batch = submit_batch(client, requests, work_dir)
+    # 途中で中断しても --resume で結果を回収できるようにジョブ情報を保存しておく
+    state_path = os.path.join(work_dir, f"{batch.id}.json")
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump({'batch_id': batch.id, 'mapping': mapping}, f, ensure_ascii=False, indent=2)
+
+    batch = wait_for_batch(client, batch.id, poll_interval=poll_interval, timeout_sec=timeout_sec)
+    results.update(apply_batch_results(client, batch, mapping, use_cache=use_cache))
+    return results
+
+def resume_batch(state_path, poll_interval=30, timeout_sec=24 * 3600, use_cache=None, client=None):
+    if client is None:
+        client = openai.OpenAI()
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    batch = wait_for_batch(client, state['batch_id'], poll_interval=poll_interval, timeout_sec=timeout_sec)
+    return apply_batch_results(client, batch, state['mapping'], use_cache=use_cache)
+
+def find_paper_dirs(xmls_dir):
+    return sorted(
+        os.path.join(xmls_dir, name) for name in os.listdir(xmls_dir)
+        if paper_record.exists(os.path.join(xmls_dir, name))
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="paper.jsonの要約をBatch APIでまとめて生成します。")
+    parser.add_argument('xmls_dir', nargs='?', help="process_pdfが出力したxmlsディレクトリ")
+    parser.add_argument('--all', action='store_true', help="要約済みの論文も再要約する")
+    parser.add_argument('--poll', type=float, default=30, help="状態確認の間隔(秒)")
+    parser.add_argument('--resume', default=None, help="保存したジョブ情報(JSON)から結果を回収する")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        results = resume_batch(args.resume, poll_interval=args.poll)
+    else:
+        if not args.xmls_dir:
+            parser.error("xmls_dir または --resume を指定してください")
+        dirpaths = find_paper_dirs(args.xmls_dir)
+        if not args.all:
+            dirpaths = [d for d in dirpaths if needs_summary(d)]
+        work_dir = os.path.join(os.path.dirname(os.path.abspath(args.xmls_dir)), "batch_jobs")
+        results = summarize_dirpaths(dirpaths, work_dir, poll_interval=args.poll)
+
+    failed = {d: r for d, r in results.items() if not isinstance(r, dict)}
+    print(f"{len(results) - len(failed)} 件の要約を書き戻しました。失敗 {len(failed)} 件")
+    for dirpath, error in failed.items():
+        print(f"  {dirpath}: {error}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench_derivatives.py
+# 図の縮小コピー（image_derivatives.py）の有無で、PPTX・PDF（PyMuPDF）の出力サイズと時間を比べる
+# marp CLI がPATHにあれば、marpでのPDF出力も計測する
+#
+#   python benchmarks/bench_derivatives.py --pages 8 --image-size 2400x1800
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def export_all(dirpath, out_dir, use_marp):
+    import mkmd_gui
+    import md2pdf
+    import xml2pptx
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    md_file = None
+
+    def make_md():
+        nonlocal md_file
+        md_file = mkmd_gui.make_md(dirpath, output_dir=out_dir)
+
+    results['make_md'] = (timed(make_md), None)
+    pptx = os.path.join(out_dir, "out.pptx")
+    results['pptx'] = (timed(lambda: xml2pptx.convert_xml_to_pptx(dirpath, pptx)), os.path.getsize(pptx))
+    pdf = os.path.join(out_dir, "out_pymupdf.pdf")
+    results['pdf_pymupdf'] = (timed(lambda: md2pdf.convert_md_to_pdf(md_file, pdf, renderer='pymupdf')),
+                              os.path.getsize(pdf))
+    if use_marp:
+        pdf = os.path.join(out_dir, "out_marp.pdf")
+        results['pdf_marp'] = (timed(lambda: md2pdf.convert_md_to_pdf(md_file, pdf, timeout_sec=600, renderer='marp')),
+                               os.path.getsize(pdf))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="図の縮小コピーの有無による出力サイズ・時間の比較")
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--images', type=int, default=1, help="1ページあたりの画像数")
+    parser.add_argument('--image-size', default="2400x1800", help="画像のサイズ（幅x高さ）")
+    args = parser.parse_args(argv)
+
+    import synthetic_pdf
+    import query_gui
+
+    width, height = (int(v) for v in args.image_size.split('x'))
+    use_marp = shutil.which('marp') is not None
+    rows = {}
+    with tempfile.TemporaryDirectory() as work, redirect_stdout(sys.stderr):
+        pdf = synthetic_pdf.make_paper(os.path.join(work, "paper.pdf"), pages=args.pages,
+                                       images_per_page=args.images, image_size=(width, height), masked_every=0)
+        dirpath = query_gui.process_pdf(pdf, dir=os.path.join(work, "out"), summarize=False)
+        # 縮小コピーなし・初回（コピーを作る）・2回目（キャッシュを使う）
+        for label, enabled in (('original', '0'), ('derived_cold', '1'), ('derived_warm', '1')):
+            os.environ['IMAGE_DERIVATIVES'] = enabled
+            rows[label] = export_all(dirpath, os.path.join(work, label), use_marp)
+
+    stages = list(next(iter(rows.values())))
+    print(f"{'':16s}" + "".join(f"{s:>22s}" for s in stages))
+    for label, results in rows.items():
+        cells = []
+        for s in stages:
+            sec, size = results[s]
+            cells.append(f"{sec * 1000:8.1f} ms" + (f" {size / 1024:8.0f} KB" if size is not None else " " * 12))
+        print(f"{label:16s}" + "".join(f"{c:>22s}" for c in cells))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# bench_half.py
+# get_half（1ページ目上半分の画像化）の時間とピークメモリを計測する
+# 計測ごとに子プロセスを起動し、ru_maxrss の増分をピークメモリとして比較する
+#
+#   python benchmarks/bench_half.py --width 2384 --height 3370
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHILD = r"""
+import sys, os, io, time, json, resource
+sys.path.insert(0, {root!r})
+import fitz
+from PIL import Image
+import query_gui
+
+def legacy(pdf, outdir):
+    # 比較用: 変更前の実装（ページ全体を2倍で描画→PNG化→PILで再デコード→切り抜き）
+    doc = fitz.open(pdf)
+    pix = doc[0].get_pixmap(matrix=fitz.Matrix(2, 2))
+    im = Image.open(io.BytesIO(pix.tobytes()))
+    w, h = im.size
+    im.crop((0, h // 20, w, h // 2 + h // 20)).save(os.path.join(outdir, "half.png"), "PNG")
+    doc.close()
+
+pdf, outdir, variant = sys.argv[1], sys.argv[2], sys.argv[3]
+doc = fitz.open(pdf)
+doc[0].get_text()
+doc.close()
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+if variant == "legacy":
+    legacy(pdf, outdir)
+elif variant == "png":
+    query_gui.get_half(pdf, outdir)
+elif variant == "jpg-1600":
+    query_gui.get_half(pdf, outdir, fmt="jpg", max_width=1600)
+elif variant == "webp-1600":
+    query_gui.get_half(pdf, outdir, fmt="webp", max_width=1600)
+elapsed = time.perf_counter() - t0
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+out = [f for f in os.listdir(outdir) if f.startswith("half.")][0]
+print(json.dumps({{"variant": variant, "seconds": elapsed, "peak_kb": peak - base,
+                  "bytes": os.path.getsize(os.path.join(outdir, out))}}))
+"""
+
+def make_large_page(path, width, height):
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.insert_textbox(fitz.Rect(72, 72, width - 72, height - 72), "Poster title\n" + "lorem ipsum " * 4000, fontsize=14)
+    page.draw_rect(fitz.Rect(100, height / 3, width - 100, height / 2), color=(0, 0, 1), fill=(0.8, 0.8, 1))
+    doc.save(path)
+    doc.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="get_half のベンチマーク")
+    parser.add_argument('--width', type=float, default=2384, help="ページ幅(pt)。既定はA0")
+    parser.add_argument('--height', type=float, default=3370, help="ページ高さ(pt)")
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as work:
+        pdf = os.path.join(work, "large.pdf")
+        make_large_page(pdf, args.width, args.height)
+        script = os.path.join(work, "child.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(CHILD.format(root=root))
+        results = []
+        for variant in ("legacy", "png", "jpg-1600", "webp-1600"):
+            outdir = os.path.join(work, variant)
+            os.makedirs(outdir)
+            out = subprocess.run([sys.executable, "-W", "ignore", script, pdf, outdir, variant],
+                                 check=True, capture_output=True, text=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            results.append(r)
+            print(f"{variant:10s} {r['seconds'] * 1000:8.1f} ms  peak +{r['peak_kb'] / 1024:7.1f} MB  {r['bytes'] / 1024:8.1f} KB")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({'width': args.width, 'height': args.height, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
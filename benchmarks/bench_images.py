@@ -0,0 +1,124 @@
+# bench_images.py
+# extract_images_from_pdf のベンチマーク（画像の多いPDFを生成して計測する）
+#
+#   python benchmarks/bench_images.py --pages 40 --images 4 --workers 4
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fitz  # PyMuPDF
+import query_gui
+from synthetic_pdf import make_paper
+
+def legacy_extract(pdf_path, imgdir, min_width=400, min_height=400, abssize=2048, max_ratio=8, max_num=5):
+    # 比較用: 変更前の実装（全候補をデコードしてから判定、リストでの重複判定）
+    os.makedirs(imgdir, exist_ok=True)
+    doc = fitz.open(pdf_path)
+    xreflist = []
+    images = []
+    for pno in range(doc.page_count):
+        if len(images) >= max_num:
+            break
+        for img in doc.get_page_images(pno):
+            xref = img[0]
+            if xref in xreflist:
+                continue
+            width, height = img[2], img[3]
+            if width < min_width and height < min_height:
+                continue
+            smask = img[1]
+            if smask > 0:
+                pix0 = fitz.Pixmap(doc.extract_image(xref)["image"])
+                if pix0.alpha:
+                    pix0 = fitz.Pixmap(pix0, 0)
+                mask = fitz.Pixmap(doc.extract_image(smask)["image"])
+                try:
+                    pix = fitz.Pixmap(pix0, mask)
+                except Exception:
+                    pix = fitz.Pixmap(doc.extract_image(xref)["image"])
+                ext = "pam" if pix0.n > 3 else "png"
+                image = {"ext": ext, "image": pix.tobytes(ext)}
+            elif "/ColorSpace" in doc.xref_object(xref, compressed=True):
+                pix = fitz.Pixmap(fitz.csRGB, fitz.Pixmap(doc, xref))
+                image = {"ext": "png", "image": pix.tobytes("png")}
+            else:
+                image = doc.extract_image(xref)
+            imgdata = image["image"]
+            if len(imgdata) <= abssize:
+                continue
+            if width / height > max_ratio or height / width > max_ratio:
+                continue
+            imgname = f"img{pno+1:02d}_{xref:05d}.{image['ext']}"
+            images.append((imgname, pno + 1, width, height))
+            with open(os.path.join(imgdir, imgname), "wb") as fout:
+                fout.write(imgdata)
+            xreflist.append(xref)
+    doc.close()
+    return xreflist, images
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="extract_images_from_pdf のベンチマーク")
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--images', type=int, default=4, help="1ページあたりの画像数")
+    parser.add_argument('--size', default="1200x900", help="画像サイズ WxH")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', default=None, help="結果をJSONで保存するパス")
+    args = parser.parse_args(argv)
+
+    w, h = (int(v) for v in args.size.lower().split('x'))
+    work = tempfile.mkdtemp(prefix="bench_images_")
+    try:
+        pdf_path = make_paper(os.path.join(work, "heavy.pdf"), pages=args.pages,
+                              images_per_page=args.images, image_size=(w, h))
+        size_mb = os.path.getsize(pdf_path) / 1024 / 1024
+        print(f"PDF: {args.pages} ページ, {args.pages * args.images} 枚, {size_mb:.1f} MB")
+
+        cases = []
+        for max_num in (5, 10 ** 6):
+            label = "max_num=5" if max_num == 5 else "全画像"
+            variants = [
+                ("legacy", lambda d: legacy_extract(pdf_path, d, max_num=max_num)),
+                ("sequential", lambda d: query_gui.extract_images_from_pdf(pdf_path, d, max_num=max_num)),
+                (f"thread x{args.workers}", lambda d: query_gui.extract_images_from_pdf(
+                    pdf_path, d, max_num=max_num, workers=args.workers, executor="thread")),
+                (f"process x{args.workers}", lambda d: query_gui.extract_images_from_pdf(
+                    pdf_path, d, max_num=max_num, workers=args.workers, executor="process")),
+            ]
+            for name, fn in variants:
+                outdir = os.path.join(work, "out")
+
+                def run():
+                    shutil.rmtree(outdir, ignore_errors=True)
+                    return fn(outdir)
+
+                elapsed, (xrefs, images) = timed(run, args.repeat)
+                cases.append({'case': label, 'variant': name, 'seconds': round(elapsed, 4), 'images': len(images)})
+                print(f"{label:10s} {name:14s} {elapsed * 1000:9.1f} ms  ({len(images)} 枚)")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({'pages': args.pages, 'images_per_page': args.images, 'size': args.size,
+                           'pdf_mb': round(size_mb, 2), 'results': cases}, f, ensure_ascii=False, indent=2)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# bench_md_parser.py
+# md2pptx のスライド解析について、1パスの tokenize_slides と従来の
+# split_slides + parse_slide（markdown + BeautifulSoup、このファイルに残してある）を比べる
+#   1. CORPUS の各Markdown（tokenize_slides が扱う Marp の記法）で両者の結果が一致するか
+#   2. FIXED の各Markdown（従来の分割が誤っていたもの）と CHANGED の各Markdown（扱う記法を絞ったため
+#      従来と結果が異なるもの）で期待どおりの結果になるか
+#   3. 生成した大きなスライドで何倍速くなったか
+# いずれかを満たさなければ終了コード1を返す
+#
+#   python benchmarks/bench_md_parser.py
+#   python benchmarks/bench_md_parser.py --slides 2000 --min-speedup 10
+# コーパスでの一致は tests/test_md_parser.py でも確かめる
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import md2pptx
+
+# make_md が出力するスライドと、Marp のスライドで手で書かれることの多い記法
+CORPUS = [
+    ("make_md", (
+        "# A Study of Things\n\n\n---\n"
+        "# 物事の研究\nA Study of Things\n[2023] 2301.00001\n"
+        "__課題__ 既存手法は遅い\n__手法__ 1パスで処理する\n__結果__ 10倍速くなった\n\n---\n"
+        "![width:1400](../../xmls/2301.00001/half.png)\n\n---\n"
+        "![width:1200](../../xmls/2301.00001/images/p1_x12.png)\n")),
+    ("heading_levels", "# T1\ntext\n## T2\nmore\n#### h4\n### T3\n"),
+    ("heading_forms", "#foo\n## bar ##\ntext\n# C#\n"),
+    ("no_heading", "first paragraph\n\nsecond paragraph\n\nthird\n"),
+    ("empty_heading", "#\nparagraph\n"),
+    ("paragraph_lines", "line one\nline two\n  indented three\n"),
+    ("tight_list", "# L\n- a\n- b\n* c\n+ d\n"),
+    ("ordered_list", "# O\n1. x\n2. y\n10. z\n"),
+    ("two_space_indent", "- a\n  - b\n"),
+    ("list_continuation", "- a\ncont\n- b\n"),
+    ("paragraph_list", "para\n\n- a\n\npara2\n"),
+    ("heading_splits_list", "- a\n# H\n- b\n"),
+    ("bullets_and_text", "# Mixed\nintro\n\n- one\n- two\n\noutro\n"),
+    ("inline", "**b** *e* `c` [l](u) ![i](s) <b>h</b> x_y_z _em_\n"),
+    ("inline_nested", "**bold *nested* b** _x_y_ __u__ ***both***\n"),
+    ("link_formatting", "[link **b**](u) ![a](s \"t\")\n"),
+    ("escapes_entities", "a \\*b\\* &amp; &copy; <http://x.y> 1 < 2\n"),
+    ("line_break", "a  \nb\n"),
+    ("code_span", "use `x = a*b*c` and ``a`b``\n"),
+    ("blockquote", "> quote\n> more\n"),
+    ("blockquote_lazy", "> a\nb\n\n> c\n>\n> d\n"),
+    ("fenced_code", "```\n# no\n- x\n```\ntext\n"),
+    ("fenced_between", "text\n```python\ncode\n```\nmore\n"),
+    ("indented_code", "a\n\n    code\n\nb\n"),
+    ("notes", "<div class=\"notes\">\nnote1\nnote2\n</div>\n# T\n"),
+    ("notes_inline", "# T\nbody\n\n<div class=\"notes\">note *x*\n\nmore</div>\n"),
+    ("notes_tags", "# T\n<div class=\"notes\">a<br>b &amp; c</div>\n"),
+    ("image_in_list", "# Figures\n- ![w:200](a.png) first\n- second ![](b.png)\n"),
+    ("html_img", "# T\n<img src=\"x.png\" alt=\"w:300\">\n"),
+    ("comment_only", "# A\n\n---\n\n\n---\n# B\n"),
+]
+
+# 従来の分割（--- を含む箇所すべてで分割）では壊れていた入力と、期待する結果
+FIXED = [
+    ("hr_in_code", "# Code\n```\na\n---\nb\n```\ntext\n", [
+        {'type': 'text', 'title': 'Code', 'notes': None, 'images': [], 'text_lines': ['text']},
+    ]),
+    ("dashes_in_text", "# T\nA---B and C--D\n", [
+        {'type': 'text', 'title': 'T', 'notes': None, 'images': [], 'text_lines': ['A---B and C--D']},
+    ]),
+    ("table", "# T\n| a | b |\n|---|---|\n| 1 | 2 |\n\nafter\n", [
+        {'type': 'text', 'title': 'T', 'notes': None, 'images': [], 'text_lines': ['after']},
+    ]),
+    ("other_hr", "# A\n\n***\n\n# B\n\n___\n# C\n", [
+        {'type': 'text', 'title': 'A', 'notes': None, 'images': [], 'text_lines': []},
+        {'type': 'text', 'title': 'B', 'notes': None, 'images': [], 'text_lines': []},
+        {'type': 'text', 'title': 'C', 'notes': None, 'images': [], 'text_lines': []},
+    ]),
+]
+
+# tokenize_slides では扱いを変えた（Marp と同じか、スライドとして自然な結果にした）入力と、期待する結果
+CHANGED = [
+    # 入れ子の項目は親の項目に含めず、それぞれ1項目にする
+    ("nested_list", "- a\n    - b\n    - c\n- d\n", [
+        {'type': 'bullet', 'title': 'No Title', 'notes': None, 'images': [], 'bullets': ['a', 'b', 'c', 'd']},
+    ]),
+    # 空行を挟んだ項目も同じリストとし、段落として重ねて数えない
+    ("loose_list", "- a\n\n- b\n- c\n", [
+        {'type': 'bullet', 'title': 'No Title', 'notes': None, 'images': [], 'bullets': ['a', 'b', 'c']},
+    ]),
+    # Marp と同じく、段落の直後の項目からリストにする
+    ("list_after_paragraph", "# 概要\n本研究では、**大規模**な実験を行った。\n- 手法A：高速\n- 手法B：高精度\n", [
+        {'type': 'bullet', 'title': '概要', 'notes': None, 'images': [],
+         'bullets': ['手法A：高速', '手法B：高精度', '本研究では、大規模な実験を行った。']},
+    ]),
+    # 引用符・ダッシュ・三点リーダーは置き換えない
+    ("no_smarty", "# T\npara 'quoted' \"dq\" it's -- x ... y\n", [
+        {'type': 'text', 'title': 'T', 'notes': None, 'images': [], 'text_lines': ['para \'quoted\' "dq" it\'s -- x ... y']},
+    ]),
+    # 段落の直後の引用も > を除いて同じ段落にする
+    ("quote_after_paragraph", "para\n> q\n", [
+        {'type': 'text', 'title': 'para\nq', 'notes': None, 'images': [], 'text_lines': []},
+    ]),
+]
+
+def split_slides(md_text):
+    # 従来の分割（--- を含む箇所すべてで分割する）
+    slides = [s.strip() for s in md_text.split('---') if s.strip()]
+    return slides
+
+def parse_slide(slide_md):
+    # 従来の1スライドの解析（markdown + BeautifulSoup）
+    from markdown import markdown
+    from bs4 import BeautifulSoup
+    html_text = markdown(slide_md, extensions=['extra', 'smarty'])
+    soup = BeautifulSoup(html_text, 'html.parser')
+    notes_div = soup.find('div', class_='notes')
+    notes = None
+    if notes_div:
+        notes = notes_div.get_text(strip=True, separator='\n')
+        notes_div.decompose()
+    heading = soup.find(['h1', 'h2', 'h3'])
+    title = heading.get_text(strip=True) if heading else None
+    if heading:
+        heading.decompose()
+
+    # Marpの画像指定 ![width:1400](path) は alt にサイズが入る
+    images = [{'src': img.get('src'), 'alt': img.get('alt', '')} for img in soup.find_all('img')]
+    bullets = [li.get_text(strip=True) for li in soup.find_all('li')]
+    paragraphs = [p.get_text(strip=True) for p in soup.find_all('p')]
+    return md2pptx.make_slide_data(title, notes, images, bullets, paragraphs)
+
+def legacy_slides_data(body):
+    return [parse_slide(s) for s in split_slides(body)]
+
+def check_front_matter():
+    # 先頭以外の --- を front matter として読まないこと
+    fm, body = md2pptx.parse_front_matter("# A\n\n---\n# B\n\n---\n# C")
+    ok = fm == {} and len(md2pptx.tokenize_slides(body)) == 3
+    fm, body = md2pptx.parse_front_matter("---\nmarp: true\nsize: 4:3\n---\n# A\n\n---\n# B")
+    ok = ok and fm == {'marp': 'true', 'size': '4:3'} and len(md2pptx.tokenize_slides(body)) == 2
+    return ok
+
+def check_corpus(verbose=False):
+    failures = []
+    for name, md in CORPUS:
+        expected = legacy_slides_data(md)
+        actual = md2pptx.tokenize_slides(md)
+        if actual != expected:
+            failures.append((name, expected, actual))
+    for name, md, expected in FIXED + CHANGED:
+        actual = md2pptx.tokenize_slides(md)
+        if actual != expected:
+            failures.append((name, expected, actual))
+    for name, expected, actual in failures:
+        print(f"不一致: {name}")
+        if verbose:
+            print(f"  期待: {expected}")
+            print(f"  結果: {actual}")
+    return failures
+
+def generate_deck(slides, seed=0):
+    # make_md の出力に、箇条書き・強調・ノートを含むスライドを混ぜた大きなデッキ
+    rng = random.Random(seed)
+    words = ["モデル", "学習", "データ", "精度", "推論", "性能", "手法", "評価", "paper", "model", "fast", "graph"]
+
+    def sentence(n=8):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    parts = []
+    for i in range(slides):
+        kind = i % 4
+        if kind == 0:
+            parts.append(f"<!-- _class: title -->\n# {sentence(4)}\n{sentence()}\n[2023] 2301.{i:05d}\n"
+                         f"__課題__ {sentence()}\n__手法__ {sentence()}\n__結果__ {sentence()}\n")
+        elif kind == 1:
+            parts.append(f"# {sentence(3)}\n" + "".join(f"- {sentence()} **{rng.choice(words)}**\n" for _ in range(5))
+                         + f"\n<div class=\"notes\">\n{sentence()}\n</div>\n")
+        elif kind == 2:
+            parts.append(f"<!-- _class: info -->\n![width:1400](images/p{i}_x{i}.png)\n")
+        else:
+            parts.append(f"## {sentence(3)}\n{sentence(12)}\n\n{sentence(12)} *{rng.choice(words)}* `{rng.choice(words)}`\n")
+    return md2pptx.preprocess_marp("\n---\n".join(parts))
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="スライド解析の一致確認とベンチマーク")
+    parser.add_argument('--slides', type=int, default=1000, help="生成するデッキのスライド数")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-speedup', type=float, default=10.0, help="これ未満の高速化なら失敗とする")
+    parser.add_argument('-v', '--verbose', action='store_true', help="不一致の内容を表示する")
+    args = parser.parse_args(argv)
+
+    ok = True
+    failures = check_corpus(args.verbose)
+    total = len(CORPUS) + len(FIXED) + len(CHANGED)
+    print(f"コーパス: {total - len(failures)}/{total} 件一致")
+    ok = ok and not failures
+    if not check_front_matter():
+        print("front matter の判定が正しくありません")
+        ok = False
+
+    deck = generate_deck(args.slides)
+    if md2pptx.tokenize_slides(deck) != legacy_slides_data(deck):
+        print("生成したデッキで結果が一致しません")
+        ok = False
+    legacy = best_time(lambda: legacy_slides_data(deck), args.repeat)
+    new = best_time(lambda: md2pptx.tokenize_slides(deck), args.repeat)
+    speedup = legacy / new
+    print(f"{args.slides} スライド ({len(deck.encode('utf-8')) / 1024:.0f} KB): "
+          f"従来 {legacy * 1000:.1f} ms / 1パス {new * 1000:.1f} ms  x{speedup:.1f}")
+    if speedup < args.min_speedup:
+        print(f"高速化が {args.min_speedup} 倍に届いていません")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
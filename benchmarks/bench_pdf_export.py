@@ -0,0 +1,85 @@
+# bench_pdf_export.py
+# 短いスライドを多数PDFにする場合の、1件ずつのmarp起動・まとめての起動・
+# PyMuPDFによるプロセス内での出力（slide_pdf.py）を比較する
+# marp CLI がPATHに無い場合はPyMuPDFのみ計測する
+#
+#   python benchmarks/bench_pdf_export.py --decks 20
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DECK = """---
+marp: true
+theme: default
+size: 16:9
+paginate: true
+---
+# Deck {i}
+
+---
+# 論文タイトル {i}
+__課題__ ベンチマーク用の課題
+__手法__ ベンチマーク用の手法
+__結果__ ベンチマーク用の結果
+"""
+
+def make_decks(work, n):
+    paths = []
+    for i in range(n):
+        d = os.path.join(work, f"paper_{i:03d}")
+        os.makedirs(d)
+        path = os.path.join(d, "deck_output.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(DECK.format(i=i))
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="marpの起動方法によるPDF出力時間の比較")
+    parser.add_argument('--decks', type=int, default=20)
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args(argv)
+
+    import md2pdf
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        if shutil.which('marp') is None:
+            print("marp が見つからないため、PyMuPDFのみ計測します。")
+        else:
+            decks = make_decks(os.path.join(work, "single"), args.decks)
+            t0 = time.perf_counter()
+            for md in decks:
+                md2pdf.convert_md_to_pdf(md, os.path.splitext(md)[0] + ".pdf", timeout_sec=600, renderer='marp')
+            results['per_deck'] = time.perf_counter() - t0
+
+            decks = make_decks(os.path.join(work, "batch"), args.decks)
+            t0 = time.perf_counter()
+            converted = md2pdf.convert_mds_to_pdf(decks, timeout_sec=600, renderer='marp')
+            results['batched'] = time.perf_counter() - t0
+            failed = [md for md, r in converted.items() if not isinstance(r, str)]
+            if failed:
+                print(f"変換に失敗したファイルがあります: {failed}")
+
+        decks = make_decks(os.path.join(work, "pymupdf"), args.decks)
+        t0 = time.perf_counter()
+        for md in decks:
+            md2pdf.convert_md_to_pdf(md, os.path.splitext(md)[0] + ".pdf", timeout_sec=600, renderer='pymupdf')
+        results['pymupdf'] = time.perf_counter() - t0
+
+    for name, sec in results.items():
+        print(f"{name:9s} {sec:7.2f} s  ({sec / args.decks * 1000:7.1f} ms/deck)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'decks': args.decks, 'seconds': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# bench_record.py
+# 論文ごとの中間データについて、従来の paper.xml（dicttoxml + minidom で保存、xmltodict で読み込み）と
+# paper.json（paper_record.py）の保存・読み込みの時間とファイルサイズを比べる
+#
+#   python benchmarks/bench_record.py --records 2000
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import paper_record
+import query_gui
+
+def make_paper(i, rng):
+    # process_pdf が保存するものと同じ項目・同程度の大きさ（本文は先頭2000文字）
+    images_dir = f"/data/output/xmls/paper_{i:05d}/images"
+    image_meta = [
+        {
+            'file': f"img{p:02d}_{xref:05d}.png",
+            'page': p,
+            'xref': xref,
+            'width': rng.randint(400, 2400),
+            'height': rng.randint(400, 1800),
+            'bytes': rng.randint(20000, 3000000),
+            'sha256': "%064x" % rng.getrandbits(256),
+        }
+        for p, xref in ((1, 10), (1, 14), (2, 21), (3, 30), (4, 41))
+    ]
+    return {
+        'title': f"A Study of Things {i}",
+        'authors': ["Alice", "Bob", "Carol"],
+        'abstract': "".join(rng.choice("abcdefghij klmnopqrst 論文 手法 結果") for _ in range(2000)),
+        'pdf': f"/data/pdfs/paper_{i:05d}.pdf",
+        'image_count': len(image_meta),
+        'images': [f"{images_dir}/{m['file']}" for m in image_meta] + [f"{images_dir}/half.png"],
+        'image_meta': image_meta,
+        'half_img_path': f"{images_dir}/half.png",
+        'title_jp': "物事の研究",
+        'keywords': "高速化, 中間形式",
+        'problem': "既存手法は遅い" * 10,
+        'method': "1パスで処理する" * 10,
+        'result': "10倍速くなった" * 10,
+        'query': "N/A",
+    }
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def total_size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="paper.xml と paper.json の保存・読み込みの比較")
+    parser.add_argument('--records', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    import xmltodict
+
+    rng = random.Random(0)
+    papers = [make_paper(i, rng) for i in range(args.records)]
+    with tempfile.TemporaryDirectory() as work:
+        dirpaths = []
+        for i in range(args.records):
+            dirpath = os.path.join(work, f"paper_{i:05d}")
+            os.makedirs(dirpath)
+            dirpaths.append(dirpath)
+        xml_paths = [os.path.join(d, paper_record.LEGACY_XML_NAME) for d in dirpaths]
+        json_paths = [os.path.join(d, paper_record.RECORD_NAME) for d in dirpaths]
+
+        def save_xml():
+            for paper, path in zip(papers, xml_paths):
+                query_gui.save_as_xml({'paper': dict(paper)}, path)
+
+        def load_xml():
+            for path in xml_paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    xmltodict.parse(f.read())
+
+        def save_json():
+            for paper, dirpath in zip(papers, dirpaths):
+                paper_record.save(dirpath, paper)
+
+        loaded = {}
+
+        def load_json():
+            loaded.update(paper_record.load_many(dirpaths))
+
+        rows = [
+            ("paper.xml", timed(save_xml), timed(load_xml), total_size(xml_paths)),
+            ("paper.json", timed(save_json), timed(load_json), total_size(json_paths)),
+        ]
+        if len(loaded) != args.records or loaded[dirpaths[0]] != papers[0]:
+            print("paper.json の読み込み結果が保存したものと一致しません")
+            return 1
+
+    print(f"{args.records} 件")
+    print(f"{'':12s}{'save':>12s}{'load':>12s}{'size':>12s}")
+    for name, save_sec, load_sec, size in rows:
+        print(f"{name:12s}{save_sec * 1000:9.1f} ms{load_sec * 1000:9.1f} ms{size / 1024:9.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# bench_stages.py
+# パイプラインの各段階（メタデータ取得・画像抽出・ヘッダー画像・中間データ保存・Markdown生成・PPTX変換・要約）の
+# 時間とピークメモリを合成PDFで計測し、JSONで出力する
+# 要約はローカルのモックサーバーに対して実行するため、ネットワークやAPIキーは不要
+# 段階ごとに子プロセスを起動し、ru_maxrss の増分をピークメモリとして記録する
+#
+#   python benchmarks/bench_stages.py --json bench_before.json
+#   python benchmarks/bench_stages.py --json bench_after.json --compare bench_before.json
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# make_paper に渡す条件
+SCENARIOS = {
+    'small': {'pages': 4, 'images_per_page': 1, 'image_size': (800, 600), 'masked_every': 0, 'two_column': False},
+    'medium': {'pages': 12, 'images_per_page': 2, 'image_size': (1200, 900), 'masked_every': 3, 'two_column': True},
+    'large': {'pages': 40, 'images_per_page': 3, 'image_size': (1600, 1200), 'masked_every': 2, 'two_column': True},
+}
+STAGES = ('metadata', 'images', 'half_image', 'save_record', 'make_md', 'pptx', 'summary')
+
+def prepare(pdf_path, work_dir):
+    # make_md / PPTX変換 の入力になる paper.json・画像・Markdown を用意する（計測対象外）
+    import query_gui
+    import mkmd_gui
+    dirpath = query_gui.process_pdf(pdf_path, dir=os.path.join(work_dir, "prepared"), summarize=False, force=True)
+    md_file = mkmd_gui.make_md(dirpath, output_dir=os.path.join(work_dir, "prepared", "md"))
+    return dirpath, md_file
+
+def make_stage(stage, pdf_path, work_dir, prepared):
+    """
+    計測する処理を返す。返り値の関数は繰り返し番号 i を受け取り、
+    出力先が前回の結果と重ならないようにする。
+    """
+    import query_gui
+    import mkmd_gui
+    dirpath, md_file = prepared
+
+    def out_dir(i):
+        d = os.path.join(work_dir, f"{stage}_{i}")
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    if stage == 'metadata':
+        return lambda i: query_gui.get_metadata_from_pdf(pdf_path)
+    if stage == 'images':
+        return lambda i: query_gui.extract_images_from_pdf(pdf_path, out_dir(i), **query_gui.IMAGE_PARAMS)
+    if stage == 'half_image':
+        return lambda i: query_gui.get_half(pdf_path, out_dir(i))
+    if stage == 'save_record':
+        import paper_record
+        paper = paper_record.load(dirpath)
+        return lambda i: paper_record.save(out_dir(i), paper)
+    if stage == 'make_md':
+        return lambda i: mkmd_gui.make_md(dirpath, output_dir=out_dir(i))
+    if stage == 'pptx':
+        import xml2pptx
+        return lambda i: xml2pptx.convert_xml_to_pptx(dirpath, os.path.join(out_dir(i), "out.pptx"))
+    if stage == 'summary':
+        import mock_llm_server
+        server = mock_llm_server.start_server()
+        os.environ['OPENAI_BASE_URL'] = server.base_url
+        os.environ['OPENAI_API_KEY'] = "benchmark"
+        metadata = query_gui.get_metadata_from_pdf(pdf_path)
+        return lambda i: query_gui.get_summary(metadata, use_cache=False)
+    raise ValueError(f"未知の段階です: {stage}")
+
+def run_child(stage, pdf_path, work_dir, repeat):
+    import resource
+    from contextlib import redirect_stdout
+
+    with redirect_stdout(sys.stderr):
+        prepared = prepare(pdf_path, work_dir)
+        fn = make_stage(stage, pdf_path, work_dir, prepared)
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # 1回目は遅延importや接続確立を含むため時間の計測からは除く（メモリには含める）
+        fn(-1)
+        times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - t0)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'wall_ms_min': round(min(times) * 1000, 3),
+        'wall_ms_median': round(statistics.median(times) * 1000, 3),
+        'peak_rss_kb': peak,
+        'peak_rss_delta_kb': peak - base,
+    }))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold, min_ms=1.0):
+    # 前回のJSONと比べ、threshold 倍を超えて遅くなった段階を返す（min_ms 未満の差は誤差とみなす）
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r['scenario'], r['stage']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\n{baseline_path} との比較 (median)")
+    for r in results:
+        old = baseline.get((r['scenario'], r['stage']))
+        if old is None or not old['wall_ms_median']:
+            continue
+        ratio = r['wall_ms_median'] / old['wall_ms_median']
+        slower = ratio > threshold and r['wall_ms_median'] - old['wall_ms_median'] > min_ms
+        mark = "  <-- 遅くなっています" if slower else ""
+        print(f"  {r['scenario']:7s} {r['stage']:10s} {old['wall_ms_median']:9.1f} -> {r['wall_ms_median']:9.1f} ms  x{ratio:.2f}{mark}")
+        if slower:
+            regressions.append(r)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="各段階のベンチマーク")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="計測するシナリオ（カンマ区切り）")
+    parser.add_argument('--stages', default=','.join(STAGES), help="計測する段階（カンマ区切り）")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', default=None, help="結果JSONの出力先")
+    parser.add_argument('--compare', default=None, help="比較対象の結果JSON")
+    parser.add_argument('--threshold', type=float, default=1.2, help="この倍率を超えて遅くなったら失敗とする")
+    parser.add_argument('--min-ms', type=float, default=1.0, help="これ未満の差は比較で無視する(ms)")
+    parser.add_argument('--child', nargs=3, metavar=('STAGE', 'PDF', 'WORK_DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child, repeat=args.repeat)
+        return 0
+
+    import synthetic_pdf
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    stages = [s for s in args.stages.split(',') if s]
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        for scenario in scenarios:
+            pdf = synthetic_pdf.make_paper(os.path.join(work, f"{scenario}.pdf"), **SCENARIOS[scenario])
+            for stage in stages:
+                stage_dir = os.path.join(work, f"{scenario}_{stage}")
+                os.makedirs(stage_dir)
+                proc = subprocess.run(
+                    [sys.executable, "-W", "ignore", os.path.abspath(__file__),
+                     '--child', stage, pdf, stage_dir, '--repeat', str(args.repeat)],
+                    capture_output=True, text=True, env={**os.environ, 'SUMMARY_CACHE': '0'}
+                )
+                if proc.returncode != 0:
+                    print(proc.stderr, file=sys.stderr)
+                    raise Exception(f"{scenario}/{stage} の計測に失敗しました")
+                r = {'scenario': scenario, 'stage': stage, **json.loads(proc.stdout.strip().splitlines()[-1])}
+                results.append(r)
+                print(f"{scenario:7s} {stage:10s} {r['wall_ms_median']:9.1f} ms (min {r['wall_ms_min']:9.1f})  "
+                      f"peak {r['peak_rss_kb'] / 1024:7.1f} MB (+{r['peak_rss_delta_kb'] / 1024:.1f})")
+                shutil.rmtree(stage_dir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'scenarios': {s: SCENARIOS[s] for s in scenarios},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を出力しました: {args.json}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold, args.min_ms)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# bench_startup.py
+# main_gui の起動からウィンドウ表示までの時間を計測する
+#   lazy : 現在の main_gui（重いモジュールは処理の開始時に import）
+#   eager: 起動時に query_gui / mkmd_gui / xml2pptx も import した場合（以前の main_gui と同じ）
+# 毎回新しいPythonプロセスを起動し、プロセスの起動からウィンドウを表示して最初のイベント処理を
+# 終えるまでを計る。あわせて -X importtime で main_gui の import にかかる時間の内訳を表示する。
+# lazy の中央値が --target-ms を超えたら終了コード1を返す
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --repeat 10 --target-ms 300
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# main_gui を import すると PyQt5 を読み込むため、モジュール名はここに書いておく（main_gui.PREWARM_MODULES と同じ）
+PREWARM_MODULES = ('query_gui', 'mkmd_gui', 'xml2pptx')
+
+# 子プロセスで実行する。ウィンドウを表示したら経過を出力し、事前読み込みの完了も待って出力する
+CHILD = r"""
+import sys, time
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+if {eager}:
+    import query_gui, mkmd_gui, xml2pptx  # 以前の main_gui と同じく起動時に読み込む
+import main_gui
+window = main_gui.PDFApp()
+window.show()
+app.processEvents()
+print("shown", flush=True)
+if {prewarm}:
+    t1 = time.perf_counter()
+    main_gui.start_prewarm().join()
+    print(f"prewarm {{(time.perf_counter() - t1) * 1000:.1f}}", flush=True)
+"""
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+def time_to_window(eager, prewarm=False):
+    code = CHILD.format(eager=eager, prewarm=prewarm)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=child_env(),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    shown = None
+    prewarm_ms = None
+    for line in proc.stdout:
+        if line.startswith("shown") and shown is None:
+            shown = (time.perf_counter() - t0) * 1000
+        elif line.startswith("prewarm"):
+            prewarm_ms = float(line.split()[1])
+    proc.wait()
+    if shown is None:
+        raise RuntimeError("ウィンドウを表示できませんでした")
+    return shown, prewarm_ms
+
+def import_breakdown(top=12):
+    # -X importtime の出力から、main_gui が直接・間接に読み込むモジュールの累積時間を集計する
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main_gui'], cwd=ROOT,
+                          env=child_env(), capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # 名前の前の空白は区切りの1文字と、入れ子の深さ1段につき2文字
+        depth = (len(name) - 1 - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    # 子は親より先に出力されるため、main_gui の行から遡って深さ1以上の行が main_gui の下で読み込まれたもの
+    end = next(i for i, r in enumerate(rows) if r[3] == 'main_gui' and r[2] == 0)
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    # main_gui が直接 import したモジュールのみ表示する
+    direct = sorted((r for r in rows[start:end] if r[2] == 1), reverse=True)[:top]
+    return rows[end][0], direct
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="main_gui の起動時間の計測")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=400.0, help="ウィンドウ表示までの目標時間(ms)")
+    args = parser.parse_args(argv)
+
+    ok = True
+    results = {}
+    for label, eager in (('eager', True), ('lazy', False)):
+        # 1回目は .pyc の作成やディスクキャッシュの影響を受けるため別に表示する
+        first, _ = time_to_window(eager)
+        times = [time_to_window(eager)[0] for _ in range(args.repeat)]
+        results[label] = statistics.median(times)
+        print(f"{label:6s} 1回目 {first:7.1f} ms / 中央値 {results[label]:7.1f} ms  (最小 {min(times):.1f} ms)")
+    print(f"ウィンドウ表示まで x{results['eager'] / results['lazy']:.1f} 速くなりました")
+
+    _, prewarm_ms = time_to_window(False, prewarm=True)
+    print(f"表示後の事前読み込み（{', '.join(PREWARM_MODULES)}）: {prewarm_ms:.1f} ms")
+
+    total, rows = import_breakdown()
+    print(f"\nimport main_gui: {total / 1000:.1f} ms (-X importtime)")
+    for cumulative, self_us, depth, name in rows:
+        print(f"  {name:40s}{cumulative / 1000:8.1f} ms")
+
+    if results['lazy'] > args.target_ms:
+        print(f"ウィンドウ表示までの時間が目標 {args.target_ms:.0f} ms を超えています")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# bench_text_select.py
+# 要約プロンプトに入れる本文の選び方を比較する
+#   legacy  変更前: 1〜3ページ目のテキストを連結して先頭2000文字
+#   select  text_select.select_text: Abstract / Introduction / Conclusion をトークン数の上限まで
+# 既定では benchmarks/synthetic_pdf.py の make_sectioned_paper で見出しの書き方が異なる論文を生成し、
+# 各節の文がどれだけ含まれたか（Abstract の文の割合・Conclusion を含むか・前付けの割合）を数える。
+# --pdf-dir を指定すると実際のPDFでトークン数・時間・使った節だけを表示する。
+#
+#   python benchmarks/bench_text_select.py --papers 9 --budget 700
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fitz
+import text_select
+
+# query_gui.MODEL と同じ（トークン数の数え方を合わせる）
+MODEL = "gpt-4o"
+
+def legacy(doc):
+    text = ""
+    for page_num in range(min(3, doc.page_count)):
+        text += doc[page_num].get_text()
+    return text[:2000]
+
+def select(doc, budget):
+    return text_select.select_text(doc, MODEL, budget)[0]
+
+def coverage(text, truth):
+    # 正解の各節について、選んだテキストに含まれる文の割合
+    flat = text_select._clean(text)
+    result = {}
+    for kind, sentences in truth.items():
+        if kind == 'front':
+            continue
+        hit = sum(1 for s in sentences if s in flat)
+        result[kind] = hit / len(sentences) if sentences else 0.0
+    return result
+
+def front_share(text, truth):
+    # 前付け（著者・所属）の語がテキストに占める割合
+    front_words = set(truth['front'][0].replace(",", " ").split())
+    words = text.split()
+    if not words:
+        return 0.0
+    return sum(1 for w in words if w.strip(",") in front_words) / len(words)
+
+def measure(pdf, method, budget, repeat):
+    doc = fitz.open(pdf)
+    try:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            text = legacy(doc) if method == 'legacy' else select(doc, budget)
+        seconds = (time.perf_counter() - t0) / repeat
+    finally:
+        doc.close()
+    return text, seconds
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="要約に使う本文の選び方のベンチマーク")
+    parser.add_argument('--papers', type=int, default=9, help="生成する論文の数（見出しの書き方を順に変える）")
+    parser.add_argument('--paragraphs', type=int, default=4, help="1節あたりの段落数")
+    parser.add_argument('--authors', type=int, default=8, help="著者数（多いほど1ページ目の先頭が前付けで埋まる）")
+    parser.add_argument('--budget', type=int, default=text_select.DEFAULT_TOKEN_BUDGET, help="トークン数の上限")
+    parser.add_argument('--repeat', type=int, default=5, help="時間計測の繰り返し回数")
+    parser.add_argument('--pdf-dir', default=None, help="生成する代わりにこのフォルダのPDFを使う")
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args(argv)
+
+    print(f"トークン数の数え方: {text_select.tokenizer_name(MODEL)}  上限: {args.budget}")
+    with tempfile.TemporaryDirectory() as work:
+        if args.pdf_dir:
+            papers = [(p, None) for p in sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))]
+        else:
+            import synthetic_pdf
+            papers = []
+            for i in range(args.papers):
+                path = os.path.join(work, f"sectioned_{i}.pdf")
+                truth = synthetic_pdf.make_sectioned_paper(path, seed=i, authors=args.authors,
+                                                           paragraphs=args.paragraphs)
+                papers.append((path, truth))
+
+        results = {'legacy': [], 'select': []}
+        for path, truth in papers:
+            for method in results:
+                text, seconds = measure(path, method, args.budget, args.repeat)
+                r = {'pdf': os.path.basename(path), 'seconds': seconds,
+                     'tokens': text_select.count_tokens(text, MODEL), 'chars': len(text)}
+                if truth is not None:
+                    r.update(coverage(text, truth))
+                    r['front_share'] = front_share(text, truth)
+                results[method].append(r)
+
+    print(f"{'方式':8s} {'件数':>4s} {'トークン':>8s} {'時間':>9s} {'Abstract':>9s} {'Intro':>7s} "
+          f"{'Concl含む':>9s} {'前付け':>7s}")
+    summary = {}
+    for method, rows in results.items():
+        n = len(rows)
+        if not n:
+            continue
+        s = {
+            'papers': n,
+            'tokens': sum(r['tokens'] for r in rows) / n,
+            'ms': sum(r['seconds'] for r in rows) / n * 1000,
+        }
+        if 'abstract' in rows[0]:
+            s['abstract'] = sum(r['abstract'] for r in rows) / n
+            s['introduction'] = sum(r['introduction'] for r in rows) / n
+            s['with_conclusion'] = sum(1 for r in rows if r['conclusion'] > 0) / n
+            s['front_share'] = sum(r['front_share'] for r in rows) / n
+            print(f"{method:8s} {n:4d} {s['tokens']:8.0f} {s['ms']:7.2f}ms {s['abstract']:8.0%} "
+                  f"{s['introduction']:6.0%} {s['with_conclusion']:8.0%} {s['front_share']:6.0%}")
+        else:
+            print(f"{method:8s} {n:4d} {s['tokens']:8.0f} {s['ms']:7.2f}ms")
+        summary[method] = s
+    if args.pdf_dir:
+        # 実際のPDFでは正解がないため、どの節が見つかったかを表示する
+        for path, _ in papers:
+            doc = fitz.open(path)
+            info = text_select.select_text(doc, MODEL, args.budget)[1]
+            doc.close()
+            print(f"  {os.path.basename(path)}: {', '.join(info['sections']) or '節なし（先頭ページを使用）'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'budget': args.budget, 'tokenizer': text_select.tokenizer_name(MODEL),
+                       'summary': summary, 'results': results}, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
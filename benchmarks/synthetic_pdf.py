@@ -0,0 +1,185 @@
+# synthetic_pdf.py
+# ベンチマーク用の論文風PDFをPyMuPDFでローカル生成する
+import io
+import os
+import random
+import fitz  # PyMuPDF
+from PIL import Image
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+def make_image_bytes(width, height, seed=0, alpha=False, noise=True):
+    """
+    noise=True なら圧縮しにくい画像（大きいファイル）、Falseならベタ塗りに近い画像を返す。
+    アルファ無しはJPEG（PDFにはそのまま埋め込まれる）、アルファ付きはPNG（SMask付き画像になる）。
+    """
+    rnd = random.Random(seed)
+    if noise:
+        # 縮小したノイズを拡大し、生成時間を抑えつつ写真並みのサイズにする
+        sw, sh = max(1, width // 4), max(1, height // 4)
+        im = Image.frombytes("RGB", (sw, sh), rnd.randbytes(sw * sh * 3)).resize((width, height), Image.BILINEAR)
+    else:
+        color = (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+        im = Image.new("RGB", (width, height), color)
+    buf = io.BytesIO()
+    if alpha:
+        mask = Image.linear_gradient("L").resize((width, height))
+        im.putalpha(mask)
+        im.save(buf, "PNG", compress_level=1)
+    else:
+        im.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+def make_paper(path, pages=8, images_per_page=2, image_size=(1200, 900), masked_every=3,
+               repeat_logo=True, two_column=True, seed=0):
+    """
+    論文風のPDFを生成して path に保存する。
+    - 1ページ目にタイトル・著者・Abstract
+    - 2段組みの本文
+    - ページごとに images_per_page 枚のラスター画像（masked_every 枚ごとにアルファ付き）
+    - repeat_logo=True なら全ページに同じロゴ画像（同一xref）を配置
+    """
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    logo_xref = 0
+    for pno in range(pages):
+        page = doc.new_page(width=612, height=792)
+        y = 72
+        if pno == 0:
+            page.insert_text((72, y), "A Synthetic Study of Benchmarking", fontsize=18)
+            y += 24
+            page.insert_text((72, y), "Alice Example, Bob Example", fontsize=10)
+            y += 14
+            page.insert_text((72, y), "Example University, Department of Benchmarks", fontsize=9)
+            y += 24
+            page.insert_textbox(fitz.Rect(72, y, 540, y + 90), "Abstract\n" + LOREM * 3, fontsize=9)
+            y += 100
+        if two_column:
+            page.insert_textbox(fitz.Rect(72, y, 300, 740), ("1 Introduction\n" if pno == 0 else "") + LOREM * 12, fontsize=8)
+            page.insert_textbox(fitz.Rect(312, y, 540, 740), LOREM * 12, fontsize=8)
+        else:
+            page.insert_textbox(fitz.Rect(72, y, 540, 740), LOREM * 20, fontsize=8)
+
+        if repeat_logo:
+            rect = fitz.Rect(520, 20, 580, 60)
+            if logo_xref:
+                page.insert_image(rect, xref=logo_xref)
+            else:
+                logo_xref = page.insert_image(rect, stream=make_image_bytes(480, 480, seed=999, noise=False))
+
+        for i in range(images_per_page):
+            n = pno * images_per_page + i
+            alpha = bool(masked_every) and n % masked_every == masked_every - 1
+            w = image_size[0] + rnd.randrange(-50, 50)
+            h = image_size[1] + rnd.randrange(-50, 50)
+            data = make_image_bytes(w, h, seed=seed * 1000 + n, alpha=alpha)
+            top = 420 + (i % 2) * 160
+            page.insert_image(fitz.Rect(80 + (i // 2) * 10, top, 300, top + 150), stream=data)
+
+    doc.set_metadata({"title": "A Synthetic Study of Benchmarking", "author": "Alice Example,Bob Example"})
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+# make_sectioned_paper の見出しの書き方（論文誌・会議ごとの違いを模したもの）
+HEADING_STYLES = (
+    {'abstract': "Abstract", 'sections': ["1 Introduction", "2 Related Work", "3 Method", "4 Experiments",
+                                          "5 Conclusion"], 'references': "References", 'inline': False},
+    {'abstract': "ABSTRACT", 'sections': ["I. INTRODUCTION", "II. BACKGROUND", "III. PROPOSED METHOD",
+                                          "IV. EVALUATION", "V. CONCLUSIONS"], 'references': "REFERENCES", 'inline': False},
+    {'abstract': "Abstract. ", 'sections': ["1. Introduction", "2. Preliminaries", "3. Approach", "4. Results",
+                                           "5. Concluding Remarks"], 'references': "References", 'inline': True},
+)
+WORDS = ("model data method result network training system approach performance task learning "
+         "feature graph image text signal error baseline accuracy efficient robust novel large "
+         "sparse dense adaptive scalable proposed existing previous significant").split()
+
+def _sentence(rnd, tag):
+    # tag は節ごとの目印の語（ベンチマークで選ばれた節を判定するため）
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(10, 18))]
+    words.insert(rnd.randrange(len(words)), tag)
+    return " ".join(words).capitalize() + "."
+
+def make_sectioned_paper(path, seed=0, style=None, authors=8, paragraphs=4):
+    """
+    見出し付きの節（Abstract・Introduction・…・Conclusion・References）を持つ2段組みの論文風PDFを生成する。
+    著者と所属を多めに入れ、1ページ目の先頭がそれで埋まる論文を模す。
+    戻り値は {節の種類: [文, ...]}（abstract / introduction / conclusion / front）で、
+    要約に使う本文の選び方のベンチマーク（bench_text_select.py）で正解として使う。
+    """
+    rnd = random.Random(seed)
+    style = HEADING_STYLES[seed % len(HEADING_STYLES) if style is None else style]
+    truth = {'front': [], 'abstract': [], 'introduction': [], 'conclusion': []}
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+
+    page.insert_textbox(fitz.Rect(72, 60, 540, 100), f"A Sectioned Study of Benchmarking {seed}", fontsize=16, align=1)
+    names = [f"Author{seed}_{i} Example" for i in range(authors)]
+    affiliations = "\n".join(f"{i + 1} Department of Examples {i}, Example University {seed}, Example City, Country"
+                             for i in range(authors // 2))
+    front = ", ".join(names) + "\n" + affiliations + f"\nEmail: author{seed}@example.edu"
+    truth['front'] = [front]
+    rc = page.insert_textbox(fitz.Rect(72, 104, 540, 300), front, fontsize=8, align=1)
+    y = 300 - rc + 10
+
+    abstract = [_sentence(rnd, "abstracttag") for _ in range(6)]
+    truth['abstract'] = abstract
+    if style['inline']:
+        text = style['abstract'] + " ".join(abstract)
+        rc = page.insert_textbox(fitz.Rect(90, y, 522, 520), text, fontsize=8.5)
+    else:
+        page.insert_textbox(fitz.Rect(90, y, 522, y + 20), style['abstract'], fontsize=9, align=1)
+        rc = page.insert_textbox(fitz.Rect(90, y + 20, 522, 520), " ".join(abstract), fontsize=8.5)
+    y = 520 - rc + 12
+
+    # 2段組みの本文。見出しと段落はそれぞれ別のブロックとして書き、入らなければ次の段・ページに送る
+    columns = ((72, 300), (312, 540))
+    col = 0
+
+    def put(text, fontsize, space=0):
+        # space は前のブロックとの間隔（近すぎると PyMuPDF が1つのブロックにまとめてしまう）
+        nonlocal page, y, col, top
+        y += space
+        while True:
+            x0, x1 = columns[col]
+            if y < 720:
+                rc = page.insert_textbox(fitz.Rect(x0, y, x1, 740), text, fontsize=fontsize)
+                if rc >= 0:
+                    y = 740 - rc + 6
+                    return
+            if col == 0:
+                col = 1
+                y = top
+            else:
+                page = doc.new_page(width=612, height=792)
+                col = 0
+                y = top = 72
+
+    top = y
+    tags = {0: 'introduction', len(style['sections']) - 1: 'conclusion'}
+    for i, heading in enumerate(style['sections']):
+        put(heading, 10, space=10)
+        kind = tags.get(i)
+        for _ in range(paragraphs):
+            paragraph = [_sentence(rnd, f"{kind or 'body'}tag") for _ in range(rnd.randint(4, 7))]
+            if kind:
+                truth[kind].extend(paragraph)
+            put(" ".join(paragraph), 8)
+    put(style['references'], 10, space=10)
+    for i in range(12):
+        put(f"[{i + 1}] A. Example and B. Example. Paper number {i}. In Proceedings of Examples, 20{i:02d}.", 7)
+
+    doc.set_metadata({"title": f"A Sectioned Study of Benchmarking {seed}", "author": ",".join(names)})
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    doc.save(path, deflate=True)
+    doc.close()
+    return truth
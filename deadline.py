@@ -0,0 +1,122 @@
+# deadline.py
+# 処理全体の期限とキャンセルを各段階に伝えるためのトークン
+# process_pdf / convert_xmls_to_md / convert_md_to_pdf / convert_md_to_pptx に同じものを渡し、
+# 段階の合間やページごとに check() を呼ぶ。GUIのキャンセルボタンは cancel() を呼ぶ。
+import os
+import time
+import signal
+import threading
+import subprocess
+
+class Cancelled(Exception):
+    pass
+
+class DeadlineExceeded(Exception):
+    pass
+
+def _kill_tree(proc):
+    # marpはChromiumを子プロセスとして起動するため、プロセスグループごと終了させる
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+class Deadline:
+    def __init__(self, timeout_sec=None, start_time=None):
+        """
+        timeout_sec=None なら期限なし（キャンセルのみ）。
+        start_time は既存の呼び出しと同じく time.time() の値。
+        """
+        if start_time is None:
+            start_time = time.time()
+        self.timeout_sec = timeout_sec
+        self.expires_at = None if timeout_sec is None else start_time + timeout_sec
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = []
+
+    def cancel(self):
+        self._cancelled.set()
+        # 実行中の外部プロセス（marp）はその場で止める
+        with self._lock:
+            processes = list(self._processes)
+        for proc in processes:
+            _kill_tree(proc)
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def touch(self):
+        # 要約の受信が続いている間など、進捗があったときに期限を延ばす
+        if self.timeout_sec is not None:
+            self.expires_at = time.time() + self.timeout_sec
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def check(self, stage=None):
+        if self.cancelled():
+            raise Cancelled("キャンセルされました")
+        if self.expired():
+            if stage:
+                raise DeadlineExceeded(f"{stage}中にタイムアウトしました")
+            raise DeadlineExceeded("タイムアウトに達しました")
+
+    def timeout(self, cap=None, stage=None):
+        """
+        HTTP呼び出しなどに渡すタイムアウト(秒)を返す。残り時間と cap の小さい方。
+        どちらも無ければNone。期限切れ・キャンセル済みなら例外を投げる。
+        """
+        self.check(stage)
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if cap is None:
+            return remaining
+        return min(cap, remaining)
+
+    def run_process(self, command, stage=None, poll_interval=0.1):
+        """
+        subprocess.run の代わりに使う。期限切れかキャンセルでプロセスを止めて例外を投げる。
+        """
+        self.check(stage)
+        if os.name == 'nt':
+            proc = subprocess.Popen(command, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            proc = subprocess.Popen(command, start_new_session=True)
+        with self._lock:
+            self._processes.append(proc)
+        try:
+            while True:
+                try:
+                    returncode = proc.wait(timeout=poll_interval)
+                    break
+                except subprocess.TimeoutExpired:
+                    if self.cancelled() or self.expired():
+                        _kill_tree(proc)
+                        proc.wait()
+                        self.check(stage)
+            if returncode != 0:
+                # cancel() から終了させられた場合はキャンセルとして扱う
+                self.check(stage)
+                raise subprocess.CalledProcessError(returncode, command)
+            return returncode
+        finally:
+            with self._lock:
+                self._processes.remove(proc)
+
+def ensure(deadline, timeout_sec=None, start_time=None):
+    # deadline が渡されなければ、従来の timeout_sec / start_time から作る
+    if deadline is None:
+        return Deadline(timeout_sec, start_time)
+    return deadline
@@ -0,0 +1,148 @@
+# image_derivatives.py
+# スライドに貼る図を、表示される大きさ（make_md の 1600x900×0.7 の枠）に縮小・再圧縮したコピーを作る
+# 抽出した図は元の解像度のまま（PNGやPAM）で数MBになることがあり、Marp・PPTXにそのまま埋め込まれていた。
+# コピーは xmls/<entry_id>/derived/ に置き、元画像の内容ハッシュとパラメータが同じなら作り直さない。
+# IMAGE_DERIVATIVES=0 で無効化できる（元画像をそのまま使う）
+import os
+import json
+import fitz  # PyMuPDF
+from PIL import Image, UnidentifiedImageError
+import pipeline_manifest
+
+DERIVED_DIR = "derived"
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+# 写真などは JPEG、色数の少ない図（グラフ・線画）と透過画像は PNG にする
+JPEG_QUALITY = 85
+MAX_PNG_COLORS = 256
+# 縮小の必要がなく、再圧縮しても小さくならない場合は元画像を使う（Marp・PPTXが読める形式のみ）
+PASSTHROUGH_EXTS = ('.png', '.jpg', '.jpeg')
+
+def derivatives_enabled():
+    return os.getenv("IMAGE_DERIVATIVES", "1").strip().lower() not in ("0", "false", "off", "no")
+
+def open_image(path):
+    # PILで読めない形式（PAM・JPEG2000など）はPyMuPDFで読み込む
+    try:
+        im = Image.open(path)
+        im.load()
+        return im
+    except (UnidentifiedImageError, OSError):
+        pix = fitz.Pixmap(path)
+        if pix.n - pix.alpha not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        mode = ("LA" if pix.alpha else "L") if pix.n - pix.alpha == 1 else ("RGBA" if pix.alpha else "RGB")
+        return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+def make_derivative(src_path, out_stem, box, jpeg_quality=JPEG_QUALITY):
+    """
+    src_path を box(幅, 高さ) に収まるよう縮小して out_stem + 拡張子 に保存し、
+    (パス, 幅, 高さ, 縮小したか) を返す。枠より小さい画像は拡大しない。
+    """
+    im = open_image(src_path)
+    width, height = im.size
+    ratio = min(box[0] / width, box[1] / height, 1.0)
+    if ratio < 1.0:
+        if im.mode not in ("RGB", "RGBA", "L", "LA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+        im = im.resize((max(1, round(width * ratio)), max(1, round(height * ratio))), Image.LANCZOS)
+
+    has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+    if not has_alpha and im.mode not in ("RGB", "L"):
+        im = im.convert("RGB")
+    colors = None if has_alpha else im.getcolors(MAX_PNG_COLORS)
+    if has_alpha or colors is not None:
+        ext = "png"
+        if colors is not None and im.mode == "RGB":
+            # 色数が少なければパレット画像にする（色は変わらない）
+            im = im.quantize(colors=len(colors))
+    else:
+        ext = "jpg"
+
+    out_path = f"{out_stem}.{ext}"
+    tmp_path = out_path + ".tmp"
+    if ext == "png":
+        im.save(tmp_path, "PNG")
+    else:
+        im.save(tmp_path, "JPEG", quality=jpeg_quality, optimize=True)
+    os.replace(tmp_path, out_path)
+    return out_path, im.size[0], im.size[1], ratio < 1.0
+
+class DerivativeCache:
+    def __init__(self, dirpath, box, jpeg_quality=JPEG_QUALITY):
+        """
+        dirpath は xmls/<entry_id>。box はコピーの最大サイズ(px)。
+        """
+        self.dir = os.path.join(dirpath, DERIVED_DIR)
+        self.index_path = os.path.join(self.dir, INDEX_NAME)
+        self.params = {'box': [int(box[0]), int(box[1])], 'jpeg_quality': jpeg_quality}
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION:
+                    self.entries = data['entries']
+            except (OSError, ValueError, KeyError):
+                # 壊れた索引は無視して作り直す
+                pass
+
+    def get(self, src_path, digest=None):
+        """
+        src_path のコピーの (パス, 幅, 高さ) を返す。索引に同じ内容・パラメータのものがあればそれを使う。
+        digest（元画像のSHA-256。抽出時に paper.xml に記録したもの）を渡すと、読み直して計算しない。
+        """
+        name = os.path.basename(src_path)
+        st = os.stat(src_path)
+        entry = self.entries.get(name)
+        if digest is None:
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                digest = entry['sha256']
+            else:
+                digest = pipeline_manifest.file_hash(src_path)
+        key = pipeline_manifest.stage_key('derivative', digest, self.params)
+        if entry and entry['key'] == key:
+            path = src_path if entry['file'] is None else os.path.join(self.dir, entry['file'])
+            if os.path.exists(path):
+                if entry['mtime_ns'] != st.st_mtime_ns:
+                    entry['mtime_ns'] = st.st_mtime_ns
+                    self.dirty = True
+                return path, entry['width'], entry['height']
+
+        if not os.path.exists(self.dir):
+            os.makedirs(self.dir)
+        stem = os.path.join(self.dir, f"{os.path.splitext(name)[0]}_{key[:12]}")
+        path, width, height, resized = make_derivative(src_path, stem, self.params['box'],
+                                                       self.params['jpeg_quality'])
+        file = os.path.basename(path)
+        if not resized and name.lower().endswith(PASSTHROUGH_EXTS) and os.path.getsize(path) >= st.st_size:
+            os.remove(path)
+            path = src_path
+            file = None
+        if entry and entry['file'] and entry['file'] != file:
+            # 元画像が変わった場合は古いコピーを消す
+            old = os.path.join(self.dir, entry['file'])
+            if os.path.exists(old):
+                os.remove(old)
+        self.entries[name] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest,
+            'key': key,
+            'file': file,
+            'width': width,
+            'height': height,
+            'bytes': os.path.getsize(path),
+        }
+        self.dirty = True
+        return path, width, height
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
@@ -0,0 +1,94 @@
+# image_hash.py
+# 抽出画像の知覚ハッシュ(dHash)と、ハミング距離による近似重複の検出
+# 白地の多い棒グラフなどは dHash の差が小さく、別の図でも距離が数ビットになることがあるため、
+# 距離の近い画像は縮小画像（格子ごとの平均輝度）も比べてから重複とみなす
+import numpy as np
+import fitz  # PyMuPDF
+
+HASH_COLS = 9
+HASH_ROWS = 8
+# 重複とみなすハミング距離の上限
+DEFAULT_MAX_DISTANCE = 4
+# 確認に使う縮小画像の格子数と、重複とみなす格子の平均輝度の差の上限（0〜255）
+THUMB_SIZE = 16
+DEFAULT_MAX_PIXEL_DIFF = 32
+
+def _gray_samples(pix):
+    # アルファを落としてグレースケールにし、ハッシュ計算に十分な大きさまで縮小する
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    shrink = 0
+    while min(pix.width, pix.height) >> (shrink + 1) >= 4 * HASH_ROWS:
+        shrink += 1
+    if shrink:
+        pix.shrink(shrink)
+    a = np.frombuffer(pix.samples, dtype=np.uint8)
+    return a.reshape(pix.height, pix.stride)[:, :pix.width].astype(np.float32)
+
+def _cell_means(a, rows, cols):
+    # 各画素を rows x cols の格子に割り当て、格子ごとの平均をまとめて計算する
+    h, w = a.shape
+    ys = np.arange(h) * rows // h
+    xs = np.arange(w) * cols // w
+    cells = (ys[:, None] * cols + xs[None, :]).ravel()
+    sums = np.bincount(cells, weights=a.ravel(), minlength=rows * cols)
+    counts = np.bincount(cells, minlength=rows * cols)
+    return (sums / np.maximum(counts, 1)).reshape(rows, cols)
+
+def _dhash(a):
+    means = _cell_means(a, HASH_ROWS, HASH_COLS)
+    bits = means[:, 1:] > means[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+def dhash_from_pixmap(pix):
+    return _dhash(_gray_samples(pix))
+
+def dhash_from_bytes(data):
+    # PNG/JPEG/PAMなど、PyMuPDFが読める画像データから計算する
+    return dhash_from_pixmap(fitz.Pixmap(data))
+
+def signature_from_bytes(data):
+    # (dHash, 縮小画像) を返す。縮小画像は HashIndex で重複を確かめるのに使う
+    a = _gray_samples(fitz.Pixmap(data))
+    return _dhash(a), _cell_means(a, THUMB_SIZE, THUMB_SIZE).astype(np.float32)
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+class HashIndex:
+    """
+    64bitハッシュを保持し、指定距離以内のものがあるかをまとめて調べる。
+    論文1本あたりの画像数は少ないため、配列に対する一括XORで十分速い。
+    縮小画像（signature_from_bytes）も渡した場合は、格子の平均輝度の差がどこも max_pixel_diff 以下のものだけを
+    重複とみなす。
+    """
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, max_pixel_diff=DEFAULT_MAX_PIXEL_DIFF):
+        self.max_distance = max_distance
+        self.max_pixel_diff = max_pixel_diff
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.keys = []
+        self.thumbs = []
+
+    def find(self, h, thumb=None):
+        # 最も近い重複の (key, 距離) を返す。距離が max_distance 以内で縮小画像も近いものがなければNone
+        if not len(self.hashes):
+            return None
+        x = np.bitwise_xor(self.hashes, np.uint64(h))
+        dists = np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        for i in np.argsort(dists, kind='stable'):
+            if dists[i] > self.max_distance:
+                break
+            other = self.thumbs[i]
+            if thumb is None or other is None or np.abs(thumb - other).max() <= self.max_pixel_diff:
+                return self.keys[i], int(dists[i])
+        return None
+
+    def add(self, h, key=None, thumb=None):
+        self.hashes = np.append(self.hashes, np.uint64(h))
+        self.keys.append(key)
+        self.thumbs.append(thumb)
+
+    def __len__(self):
+        return len(self.keys)
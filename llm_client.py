@@ -0,0 +1,163 @@
+# llm_client.py
+# 複数の論文の要約リクエストを並行して投げるための非同期クライアント
+# HTTP接続を使い回し、同時実行数と requests/min・tokens/min の上限を守る
+import os
+import time
+import random
+import asyncio
+import httpx
+import openai
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30000
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+
+def estimate_tokens(text):
+    # トークナイザを使わない概算。日本語混じりの文章でも多めに見積もる
+    return max(1, len(text) // 2)
+
+class TokenBucket:
+    """
+    1分あたりの上限 rate_per_min で補充されるトークンバケット。
+    acquire(n) は n 個取り出せるまで待つ。
+    """
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(capacity or rate_per_min)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    async def acquire(self, amount=1):
+        # asyncio.Lockはイベントループ内で生成する（Python 3.9対策）
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                now = self._refill()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount):
+        # 見積もりより実際の消費が少なかった分を戻す（多かった場合は負の値で差し引く）
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds):
+        # 429を受け取ったときは指定時間だけ全体の送信を止める
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class AsyncLLMClient:
+    """
+    openai.AsyncOpenAI を1つの httpx.AsyncClient（接続プール）で共有し、
+    セマフォとトークンバケットで送信量を制御する。
+    async with で使い、終了時に接続を閉じること。
+    """
+    def __init__(self, concurrency=None, rpm=None, tpm=None, max_retries=5, timeout=60,
+                 api_key=None, base_url=None):
+        if concurrency is None:
+            concurrency = int(os.getenv("LLM_CONCURRENCY", DEFAULT_CONCURRENCY))
+        if rpm is None:
+            rpm = int(os.getenv("LLM_RPM", DEFAULT_RPM))
+        if tpm is None:
+            tpm = int(os.getenv("LLM_TPM", DEFAULT_TPM))
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=timeout,
+        )
+        # リトライはレート制限と連動させるためSDK側では行わない
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.close()
+
+    async def chat(self, messages, model, temperature, max_tokens=None, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if max_tokens is None:
+            max_tokens = DEFAULT_MAX_OUTPUT_TOKENS
+        estimated = sum(estimate_tokens(m['content']) for m in messages) + max_tokens
+
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(estimated)
+            try:
+                async with self._semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **kwargs
+                    )
+            except openai.RateLimitError as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                wait = _retry_after(e, attempt)
+                self.request_bucket.pause(wait)
+                self.token_bucket.pause(wait)
+                await asyncio.sleep(wait)
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError):
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+                continue
+
+            usage = getattr(response, 'usage', None)
+            if usage is not None and getattr(usage, 'total_tokens', None):
+                self.token_bucket.refund(estimated - usage.total_tokens)
+            return response
+
+def _backoff(attempt):
+    return min(30.0, 0.5 * (2 ** (attempt - 1))) * (0.5 + random.random() / 2)
+
+def _retry_after(error, attempt):
+    response = getattr(error, 'response', None)
+    if response is not None:
+        value = response.headers.get('retry-after-ms')
+        if value:
+            try:
+                return float(value) / 1000.0
+            except ValueError:
+                pass
+        value = response.headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return _backoff(attempt)
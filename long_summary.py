@@ -0,0 +1,234 @@
+# long_summary.py
+# 論文全体を読む要約（長文モード、LONG_SUMMARY=1）
+# 通常の要約は text_select.py で選んだ Abstract / Introduction / Conclusion だけを送るため、
+# 手法・結果の項目を本文から書けないことがある。長文モードでは本文全体を節の区切りでチャンクに分け、
+#   map    チャンクごとに課題・手法・結果の要点を並行して要約する（同時実行数は LONG_SUMMARY_CONCURRENCY）
+#   reduce 要点をまとめて、通常と同じ5項目（query_gui.get_summary）にする
+# の2段階で要約する。map の結果はチャンクの本文ごとに要約キャッシュ（summary_cache.py）に保存するため、
+# 再実行時は内容が変わったチャンクだけを要約し直す。
+import os
+import re
+import time
+import asyncio
+
+import text_select
+import summary_cache
+import tracing
+import progress
+
+DEFAULT_CHUNK_TOKENS = 2000
+DEFAULT_MAX_CHUNKS = 16
+DEFAULT_CONCURRENCY = 8
+# map の出力の上限（要点は300文字程度を求めている）
+MAP_MAX_TOKENS = 400
+# これより短い節は前のチャンクにまとめる（チャンク上限に対する割合）
+MIN_SECTION_SHARE = 0.25
+
+MAP_PROMPT = """与えられたのは論文の一部分である。この部分に書かれている内容から、論文の課題・提案手法・実験結果に関する要点を日本語で箇条書きにせよ。
+数値・データセット名・手法名はそのまま残し、全体で300文字以内にまとめよ。該当する内容がなければ「なし」とだけ出力せよ。"""
+
+# 要約に使わない節（参考文献・謝辞・付録）
+SKIP_SECTIONS = ('end',)
+
+def long_summary_enabled():
+    return os.getenv("LONG_SUMMARY", "0").strip().lower() in ("1", "true", "on", "yes")
+
+def _env_int(name, default, minimum=1):
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+def chunk_params():
+    # チャンクの分け方（変わったら要約をやり直す。pipeline_manifest の段階キーに含める）
+    return {
+        'chunk_tokens': _env_int("LONG_SUMMARY_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS, minimum=200),
+        'max_chunks': _env_int("LONG_SUMMARY_MAX_CHUNKS", DEFAULT_MAX_CHUNKS),
+    }
+
+def concurrency():
+    # 指定がなければ LLM_CONCURRENCY と同じ
+    return _env_int("LONG_SUMMARY_CONCURRENCY", _env_int("LLM_CONCURRENCY", DEFAULT_CONCURRENCY))
+
+def _split_long(text, max_tokens, model):
+    # 文の区切りで max_tokens 以内の部分に分ける。1文が長すぎる場合は文字数で分ける
+    pieces = []
+    current = []
+    current_tokens = 0
+    for sentence in re.split(r"(?<=[.!?。！？])\s+", text):
+        if not sentence:
+            continue
+        tokens = text_select.count_tokens(sentence, model)
+        if tokens > max_tokens:
+            step = max(1, len(sentence) * max_tokens // tokens)
+            for i in range(0, len(sentence), step):
+                sub = sentence[i:i + step]
+                if current:
+                    pieces.append(" ".join(current))
+                    current, current_tokens = [], 0
+                pieces.append(sub)
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens + 1
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def split_chunks(doc, model, chunk_tokens=DEFAULT_CHUNK_TOKENS, max_chunks=DEFAULT_MAX_CHUNKS):
+    """
+    doc（fitz.Document）の本文を節ごとにまとめ、chunk_tokens 以内のチャンクのリストにする。
+    チャンクは節の区切りで始めるため、一部の節だけが変わった場合も他のチャンクの内容（キャッシュキー）は変わらない。
+    本文が max_chunks 個に収まらない場合は、チャンクの上限を大きくして分け直す。
+    """
+    sections = [(kind, text) for kind, text in text_select.split_sections(doc)
+                if text and kind not in SKIP_SECTIONS]
+    if not sections:
+        return []
+    total = sum(text_select.count_tokens(text, model) for _, text in sections)
+    chunk_tokens = max(chunk_tokens, -(-total // max_chunks))
+
+    chunks = []
+    for kind, text in sections:
+        label = text_select.SECTION_LABELS.get(kind)
+        if label and kind != 'front':
+            text = f"{label}: {text}"
+        tokens = text_select.count_tokens(text, model)
+        if chunks and tokens < chunk_tokens * MIN_SECTION_SHARE:
+            last = chunks[-1]
+            if text_select.count_tokens(last, model) + tokens <= chunk_tokens:
+                chunks[-1] = last + "\n\n" + text
+                continue
+        chunks.extend(_split_long(text, chunk_tokens, model))
+    return chunks
+
+def build_map_text(title, chunk):
+    return f"title: {title}\nbody: {chunk}"
+
+def build_reduce_metadata(metadata, notes):
+    """
+    map の要点から reduce 用のメタデータを作る。query_gui.get_summary にそのまま渡せる形で、
+    abstract に選んだ本文（Abstract など）と各チャンクの要点を入れる。
+    """
+    parts = []
+    if metadata.get('abstract'):
+        parts.append(metadata['abstract'])
+    kept = [(i, n) for i, n in enumerate(notes) if n and n.strip() not in ("なし", "「なし」")]
+    if kept:
+        parts.append("各部分の要点:\n" + "\n".join(f"[{i + 1}/{len(notes)}]\n{n.strip()}" for i, n in kept))
+    reduced = dict(metadata)
+    reduced['abstract'] = "\n\n".join(parts) or "N/A"
+    return reduced
+
+async def _map_chunks(texts, model, temperature, use_cache, deadline, reporter, idle_timeout, on_progress=None):
+    import llm_client
+
+    if use_cache is None:
+        use_cache = summary_cache.cache_enabled()
+    cache = summary_cache.get_default_cache() if use_cache else None
+    notes = [None] * len(texts)
+    keys = [summary_cache.make_key(model, MAP_PROMPT, temperature, text) for text in texts]
+    todo = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            notes[i] = cached['summary'].get('notes', "")
+        else:
+            todo.append(i)
+    done_count = len(texts) - len(todo)
+    if done_count:
+        reporter.emit('chunk_summarized', 'summary', done_count, len(texts), cached=done_count)
+    if not todo:
+        return notes, done_count
+
+    timeout = idle_timeout
+    if deadline is not None:
+        timeout = deadline.timeout(idle_timeout, stage="要約")
+
+    async with llm_client.AsyncLLMClient(concurrency=concurrency(), timeout=timeout or 60) as client:
+        async def summarize(i):
+            messages = [
+                {'role': 'system', 'content': MAP_PROMPT},
+                {'role': 'user', 'content': texts[i]},
+            ]
+            reporter.emit('llm_request', 'summary', prompt_chars=len(texts[i]), chunk=i + 1)
+            with tracing.span("map_chunk", cat='llm', chunk=i + 1, prompt_chars=len(texts[i])) as sp:
+                response = await client.chat(messages, model=model, temperature=temperature,
+                                             max_tokens=MAP_MAX_TOKENS)
+                content = response.choices[0].message.content or ""
+                sp.set(completion_chars=len(content))
+            if cache is not None:
+                cache.put(keys[i], {'notes': content}, raw=content)
+            return i, content
+
+        tasks = [asyncio.ensure_future(summarize(i)) for i in todo]
+        pending = set(tasks)
+        try:
+            while pending:
+                # キャンセル・期限切れを確認するため、短い間隔で完了を待つ
+                finished, pending = await asyncio.wait(pending, timeout=0.2, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    i, content = task.result()
+                    notes[i] = content
+                    done_count += 1
+                    reporter.emit('chunk_summarized', 'summary', done_count, len(texts))
+                    if on_progress is not None:
+                        # 通常モードのトークン受信と同じく、呼び出し元に進捗を知らせる
+                        # （GUIは deadline.touch を渡して期限を延ばす。batch_run は渡さず、期限は延びない）
+                        on_progress()
+                if deadline is not None:
+                    deadline.check("要約")
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    return notes, len(texts) - len(todo)
+
+def get_long_summary(pdf_path, metadata, use_cache=None, on_field=None, on_progress=None, idle_timeout=None,
+                     deadline=None, reporter=None):
+    """
+    PDF全体を map-reduce で要約し、query_gui.get_summary と同じ5項目の辞書を返す。
+    引数は get_summary と同じ（on_field / reporter は reduce の受信に使う）。
+    on_progress() はチャンクの要約が1つ返るたびと reduce のトークン受信ごとに呼ばれる。
+    deadline はここでは延ばさない。受信が続く間の延長が必要な呼び出し元（GUI）は on_progress で延ばす。
+    本文を取り出せない場合は通常の要約にする。
+    """
+    import query_gui
+
+    reporter = progress.ensure(reporter)
+    params = chunk_params()
+    doc = query_gui.open_pdf(pdf_path)
+    if doc is None:
+        chunks = []
+    else:
+        try:
+            with tracing.span("split_chunks", pages=doc.page_count) as sp:
+                chunks = split_chunks(doc, query_gui.MODEL, **params)
+                sp.set(chunks=len(chunks))
+        finally:
+            doc.close()
+    if not chunks:
+        print(f"本文を分割できなかったため、通常の要約を行います: {pdf_path}")
+        return query_gui.get_summary(metadata, use_cache=use_cache, on_field=on_field, on_progress=on_progress,
+                                     idle_timeout=idle_timeout, deadline=deadline, reporter=reporter)
+
+    title = metadata['title']
+    if isinstance(title, list):
+        title = ''.join(title)
+    texts = [build_map_text(title, chunk) for chunk in chunks]
+    t0 = time.time()
+    with tracing.span("map_summaries", cat='llm', chunks=len(texts)) as sp:
+        notes, cached = asyncio.run(_map_chunks(texts, query_gui.MODEL, query_gui.TEMPERATURE, use_cache,
+                                                deadline, reporter, idle_timeout, on_progress=on_progress))
+        sp.set(cached_chunks=cached)
+    print(f"長文モード: {len(texts)}チャンクを要約しました"
+          f"（キャッシュ {cached}件、{time.time() - t0:.1f}秒）")
+
+    if deadline is not None:
+        deadline.check("要約")
+    return query_gui.get_summary(build_reduce_metadata(metadata, notes), use_cache=use_cache, on_field=on_field,
+                                 on_progress=on_progress, idle_timeout=idle_timeout, deadline=deadline,
+                                 reporter=reporter)
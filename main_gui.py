@@ -1,22 +1,65 @@
 import sys
 import os
 import time
+import threading
 import subprocess
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog,
-    QMessageBox, QHBoxLayout, QDialog, QFormLayout, QLineEdit
+    QMessageBox, QHBoxLayout, QDialog, QFormLayout, QLineEdit, QComboBox,
+    QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QProgressBar
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QTimer
+from PyQt5.QtCore import Qt, QThread, QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot, QTimer
 from PyQt5.QtGui import QIcon
 from dotenv import load_dotenv
 import dotenv
 # 環境変数をここで読み込む
 load_dotenv(override=True)
-import query_gui
-import mkmd_gui
+# PyMuPDF・openai・python-pptx などを読み込む query_gui / mkmd_gui / xml2pptx は起動時には読み込まず、
+# 各段階の処理を始めるときに import する（ウィンドウ表示までの時間を短くするため）
 import md2pdf
-import md2pptx
-import xmltodict
+import paper_record
+import deadline as deadline_mod
+import progress
+
+def env_flag(name, default="1"):
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "off", "no")
+
+# ウィンドウ表示後にバックグラウンドで読み込んでおくモジュール（GUI_PREWARM=0 で無効）
+PREWARM_MODULES = ('query_gui', 'mkmd_gui', 'xml2pptx')
+
+def prewarm_enabled():
+    return env_flag("GUI_PREWARM")
+
+def prewarm_modules():
+    import importlib
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # 失敗しても、その段階を実行したときに改めて import され、そこでエラーになる
+            print(f"{name} の事前読み込みに失敗: {e}")
+
+def start_prewarm():
+    # 処理の開始時に読み込み済みであるよう、ウィンドウの表示後に別スレッドで import しておく
+    thread = threading.Thread(target=prewarm_modules, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def gui_concurrency():
+    # 同時に処理するPDFの数（GUI_CONCURRENCY、設定画面で変更できる）
+    try:
+        return max(1, int(os.getenv("GUI_CONCURRENCY", "2")))
+    except ValueError:
+        return 2
+
+# 表示順は query_gui.SUMMARY_FIELDS と同じ
+SUMMARY_FIELD_LABELS = {
+    'title_jp': "論文名",
+    'keywords': "キーワード",
+    'problem': "課題",
+    'method': "手法",
+    'result': "結果",
+}
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -28,6 +71,9 @@ class SettingsDialog(QDialog):
         current_output_dir = os.getenv("OUTPUT_DIR", "./output")
         current_timeout_str = os.getenv("TIMEOUT_SEC", "60")
         current_api_key = os.getenv("OPENAI_API_KEY", "")
+        current_renderer = os.getenv("PDF_RENDERER", "marp")
+        current_concurrency = gui_concurrency()
+        current_edit_title = env_flag("EDIT_TITLE")
 
         layout = QFormLayout()
 
@@ -48,6 +94,24 @@ class SettingsDialog(QDialog):
         self.timeout_edit = QLineEdit(current_timeout_str, self)
         layout.addRow("タイムアウト(秒)", self.timeout_edit)
 
+        # PDF出力の方法（marp: Marp CLI / pymupdf: Marp不要の簡易レイアウト）
+        self.renderer_combo = QComboBox(self)
+        self.renderer_combo.addItems(list(md2pdf.PDF_RENDERERS))
+        if current_renderer in md2pdf.PDF_RENDERERS:
+            self.renderer_combo.setCurrentText(current_renderer)
+        layout.addRow("PDF出力方法", self.renderer_combo)
+
+        # 同時に処理するPDFの数（要約はAPIの応答待ちが長いため、CPU数より多くてもよい）
+        self.concurrency_spin = QSpinBox(self)
+        self.concurrency_spin.setRange(1, 16)
+        self.concurrency_spin.setValue(current_concurrency)
+        layout.addRow("同時実行数", self.concurrency_spin)
+
+        # 解析後にタイトル編集ダイアログを出すか
+        self.edit_title_check = QCheckBox("解析後にタイトルを編集する", self)
+        self.edit_title_check.setChecked(current_edit_title)
+        layout.addRow("", self.edit_title_check)
+
         # OK, Cancelボタン
         btn_layout = QHBoxLayout()
         ok_button = QPushButton("OK")
@@ -91,6 +155,9 @@ class SettingsDialog(QDialog):
         env_data["OPENAI_API_KEY"] = new_api_key
         env_data["OUTPUT_DIR"] = new_output_dir
         env_data["TIMEOUT_SEC"] = new_timeout_str
+        env_data["PDF_RENDERER"] = self.renderer_combo.currentText()
+        env_data["GUI_CONCURRENCY"] = str(self.concurrency_spin.value())
+        env_data["EDIT_TITLE"] = "1" if self.edit_title_check.isChecked() else "0"
 
         with open(env_file_path, "w", encoding="utf-8") as f:
             for k, v in env_data.items():
@@ -100,50 +167,104 @@ class SettingsDialog(QDialog):
         self.accept()
 
 
-class Worker(QThread):
-    finished = pyqtSignal(str)  # (dirpath)を返す
-    error = pyqtSignal(str)
+class JobSignals(QObject):
+    # QRunnable はシグナルを持てないため、ジョブからの通知はこのオブジェクト経由で送る
+    started = pyqtSignal(int)
+    field_ready = pyqtSignal(int, str, str)  # 要約の各項目を受信次第 (job_id, field, value) で通知
+    finished = pyqtSignal(int, str)  # (job_id, 出力パス)
+    error = pyqtSignal(int, str)
+    event = pyqtSignal(int, object)  # 進捗イベント (job_id, progress.Event)
+
 
-    def __init__(self, pdf_path, output_dir, timeout_sec):
+class PdfJob(QRunnable):
+    # 1件のPDFを解析・要約して paper.json を作る。QThreadPool で複数件を並行に実行する
+    def __init__(self, job_id, pdf_path, output_dir, timeout_sec, deadline, signals):
         super().__init__()
+        self.job_id = job_id
         self.pdf_path = pdf_path
         self.output_dir = output_dir
         self.timeout_sec = timeout_sec
+        self.deadline = deadline
+        self.signals = signals
+
+    def on_field(self, field, value):
+        self.deadline.touch()
+        self.signals.field_ready.emit(self.job_id, field, value)
+
+    def on_event(self, event):
+        self.signals.event.emit(self.job_id, event)
 
     def run(self):
-        start_time = time.time()
+        self.signals.started.emit(self.job_id)
+        # キューで待っていた時間は期限に含めない
+        self.deadline.touch()
         try:
+            self.deadline.check("PDF解析")
+            import query_gui
             # PDF解析してxmls生成のみ行う
             dirpath = query_gui.process_pdf(
                 self.pdf_path,
                 dir=self.output_dir,
                 timeout_sec=self.timeout_sec,
-                start_time=start_time
+                on_field=self.on_field,
+                # 受信が続いている間はタイムアウトさせず、最後の受信から timeout_sec で打ち切る
+                on_progress=self.deadline.touch,
+                deadline=self.deadline,
+                on_event=self.on_event
             )
-            if (time.time() - start_time) > self.timeout_sec:
-                raise Exception("タイムアウトに達しました")
         except Exception as e:
-            self.error.emit(str(e))
+            self.signals.error.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, dirpath)
+
+
+class MarkdownJob(QRunnable):
+    # タイトル編集の後に、paper.json からMarkdownを作る
+    def __init__(self, job_id, dirpath, marp_dir, timeout_sec, deadline, signals):
+        super().__init__()
+        self.job_id = job_id
+        self.dirpath = dirpath
+        self.marp_dir = marp_dir
+        self.timeout_sec = timeout_sec
+        self.deadline = deadline
+        self.signals = signals
+
+    def run(self):
+        self.signals.started.emit(self.job_id)
+        self.deadline.touch()
+        try:
+            import mkmd_gui
+            md_file = mkmd_gui.convert_xmls_to_md(
+                self.dirpath,
+                output_dir=self.marp_dir,
+                timeout_sec=self.timeout_sec,
+                deadline=self.deadline,
+                on_event=lambda event: self.signals.event.emit(self.job_id, event)
+            )
+        except Exception as e:
+            self.signals.error.emit(self.job_id, str(e))
             return
-        self.finished.emit(dirpath)
+        self.signals.finished.emit(self.job_id, md_file)
 
 
 class PdfWorker(QThread):
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
-    def __init__(self, md_file, pdf_output, timeout_sec):
+    event = pyqtSignal(object)  # 進捗イベント（progress.Event）
+    def __init__(self, md_file, pdf_output, timeout_sec, deadline):
         super().__init__()
         self.md_file = md_file
         self.pdf_output = pdf_output
         self.timeout_sec = timeout_sec
+        self.deadline = deadline
 
     def run(self):
-        start_time = time.time()
         try:
+            # 期限切れ・キャンセル時はmarpのプロセスを終了させる
             md2pdf.convert_md_to_pdf(
                 self.md_file, self.pdf_output,
-                timeout_sec=self.timeout_sec,
-                start_time=start_time
+                deadline=self.deadline,
+                on_event=self.event.emit
             )
         except Exception as e:
             self.error.emit(str(e))
@@ -154,42 +275,39 @@ class PdfWorker(QThread):
 class PptxWorker(QThread):
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
-    def __init__(self, md_file, pptx_output, timeout_sec):
+    event = pyqtSignal(object)  # 進捗イベント（progress.Event）
+    def __init__(self, dirpath, pptx_output, timeout_sec, deadline):
         super().__init__()
-        self.md_file = md_file
+        self.dirpath = dirpath
         self.pptx_output = pptx_output
         self.timeout_sec = timeout_sec
+        self.deadline = deadline
 
     def run(self):
-        # PPTX出力にはmd2pptxにtimeoutが無いため、run中に計測してtimeoutを超えたらエラーにします。
-        start_time = time.time()
-        while True:
-            elapsed = time.time() - start_time
-            if elapsed > self.timeout_sec:
-                self.error.emit("PPTX変換中にタイムアウトしました")
-                return
-            try:
-                md2pptx.convert_md_to_pptx(
-                    self.md_file, pptx_output_file=self.pptx_output
-                )
-                break
-            except Exception as e:
-                self.error.emit(str(e))
-                return
+        # paper.json から直接作る。図のスライドごとに期限切れ・キャンセルを確認する
+        try:
+            import xml2pptx
+            xml2pptx.convert_xml_to_pptx(
+                self.dirpath, self.pptx_output,
+                deadline=self.deadline,
+                on_event=self.event.emit
+            )
+        except Exception as e:
+            self.error.emit(str(e))
+            return
         self.finished.emit(self.pptx_output)
 
 
 class TitleEditDialog(QDialog):
-    def __init__(self, paper_xml_path, parent=None):
+    def __init__(self, dirpath, parent=None):
         super().__init__(parent)
         self.setWindowTitle("タイトル編集")
         self.setModal(True)
-        self.paper_xml_path = paper_xml_path
+        self.dirpath = dirpath
 
-        with open(self.paper_xml_path, 'r', encoding='utf-8') as f:
-            self.paper_data = xmltodict.parse(f.read())
+        self.paper_data = paper_record.load(self.dirpath)
 
-        current_title = self.paper_data.get('paper', {}).get('title', 'Unknown')
+        current_title = self.paper_data.get('title', 'Unknown')
 
         layout = QFormLayout()
         self.title_edit = QLineEdit(current_title)
@@ -213,17 +331,46 @@ class TitleEditDialog(QDialog):
             return
 
         # Update the in-memory data
-        self.paper_data['paper']['title'] = new_title
+        self.paper_data['title'] = new_title
 
-        # Save updated XML
-        xml_str = xmltodict.unparse(self.paper_data, pretty=True)
-        with open(self.paper_xml_path, 'w', encoding='utf-8') as f:
-            f.write(xml_str)
+        # Save updated record
+        paper_record.save(self.dirpath, self.paper_data)
 
         self.accept()
 
 
+class Job:
+    # キューの1行分の状態
+    def __init__(self, job_id, pdf_path):
+        self.id = job_id
+        self.pdf_path = pdf_path
+        self.status = "追加済み"
+        self.deadline = None
+        self.dirpath = None
+        self.md_file = None
+        self.error = None
+        self.summary_fields = {}
+        # 進捗イベントから進み具合と残り時間を見積もる（progress.Tracker）
+        self.tracker = None
+        # 実行中の時間の合計（タイトル編集やキューでの待ち時間は含めない）
+        self.elapsed = 0.0
+        self.run_started = None
+
+    def active(self):
+        return self.status in ("待機中", "実行中", "要約を受信中", "タイトル確認待ち", "Markdown生成中")
+
+    def finished(self):
+        return self.status in ("完了", "エラー", "キャンセル")
+
+    def elapsed_now(self):
+        if self.run_started is None:
+            return self.elapsed
+        return self.elapsed + time.time() - self.run_started
+
+
 class PDFApp(QWidget):
+    COL_FILE, COL_STATUS, COL_PROGRESS, COL_TIME = range(4)
+
     def __init__(self):
         super().__init__()
 
@@ -235,22 +382,37 @@ class PDFApp(QWidget):
         self.timeout_sec = int(os.getenv("TIMEOUT_SEC", "60"))
         self.api_key = os.getenv("OPENAI_API_KEY", "")
 
-        self.pdf_path = None
-        self.worker = None
+        # 複数のPDFを bounded な QThreadPool で並行に処理する
+        self.jobs = []
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(gui_concurrency())
+        self.pdf_signals = JobSignals(self)
+        self.pdf_signals.started.connect(self.on_job_started)
+        self.pdf_signals.field_ready.connect(self.on_summary_field)
+        self.pdf_signals.finished.connect(self.on_processing_finished)
+        self.pdf_signals.error.connect(self.on_job_error)
+        self.pdf_signals.event.connect(self.on_job_event)
+        self.md_signals = JobSignals(self)
+        self.md_signals.started.connect(self.on_job_started)
+        self.md_signals.finished.connect(self.on_markdown_finished)
+        self.md_signals.error.connect(self.on_job_error)
+        self.md_signals.event.connect(self.on_job_event)
+        # 表示中のタイトル編集ダイアログ（ジョブごと、モードレス）
+        self.title_dialogs = {}
+
         self.pdf_worker = None
         self.pptx_worker = None
-        self.countdown_timer = None
-        self.remaining_time = self.timeout_sec
-
-        self.generated_md_file = None
-        self.dirpath = None
+        # 実行中の出力（PDF/PPTX）の期限とキャンセル（キャンセルボタンから cancel() する）
+        self.deadline = None
+        self.export_tracker = None
 
         self.setWindowTitle("PDF to Summary & Markdown Converter (Timeout対応)")
-        self.setGeometry(300, 300, 600, 300)
+        self.setGeometry(300, 300, 700, 480)
+        self.setAcceptDrops(True)
 
         main_layout = QVBoxLayout()
 
-        self.label = QLabel("PDFファイルを選択してください:", self)
+        self.label = QLabel("PDFファイルを選択するか、ここにドラッグしてください:", self)
         main_layout.addWidget(self.label, alignment=Qt.AlignCenter)
 
         btn_layout = QHBoxLayout()
@@ -264,17 +426,39 @@ class PDFApp(QWidget):
         self.run_button.clicked.connect(self.start_processing)
         btn_layout.addWidget(self.run_button, alignment=Qt.AlignCenter)
 
+        self.cancel_button = QPushButton("キャンセル", self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        btn_layout.addWidget(self.cancel_button, alignment=Qt.AlignCenter)
+
         self.settings_button = QPushButton("設定")
         self.settings_button.clicked.connect(self.open_settings)
         btn_layout.addWidget(self.settings_button, alignment=Qt.AlignCenter)
 
         main_layout.addLayout(btn_layout)
 
+        # ジョブの一覧（ファイル・状態・進捗・所要時間）
+        self.job_table = QTableWidget(0, 4, self)
+        self.job_table.setHorizontalHeaderLabels(["ファイル", "状態", "進捗", "時間"])
+        self.job_table.horizontalHeader().setSectionResizeMode(self.COL_FILE, QHeaderView.Stretch)
+        self.job_table.horizontalHeader().setSectionResizeMode(self.COL_STATUS, QHeaderView.ResizeToContents)
+        self.job_table.horizontalHeader().setSectionResizeMode(self.COL_PROGRESS, QHeaderView.Stretch)
+        self.job_table.horizontalHeader().setSectionResizeMode(self.COL_TIME, QHeaderView.ResizeToContents)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.job_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.job_table.itemSelectionChanged.connect(self.on_selection_changed)
+        main_layout.addWidget(self.job_table)
+
         self.status_label = QLabel("", self)
         main_layout.addWidget(self.status_label, alignment=Qt.AlignCenter)
 
-        self.timeout_label = QLabel("", self)
-        main_layout.addWidget(self.timeout_label, alignment=Qt.AlignCenter)
+
+        # 選択中のジョブの要約を、各項目を受信した順に表示する
+        self.summary_label = QLabel("", self)
+        self.summary_label.setWordWrap(True)
+        main_layout.addWidget(self.summary_label)
 
         output_btn_layout = QHBoxLayout()
 
@@ -290,8 +474,20 @@ class PDFApp(QWidget):
 
         main_layout.addLayout(output_btn_layout)
 
+        # 出力（PDF/PPTX）の進捗。marpのようにページごとの進捗が分からない場合は動きだけを表示する
+        self.export_bar = QProgressBar(self)
+        self.export_bar.setVisible(False)
+        main_layout.addWidget(self.export_bar)
+        self.export_label = QLabel("", self)
+        main_layout.addWidget(self.export_label, alignment=Qt.AlignCenter)
+
         self.setLayout(main_layout)
 
+        # 実行中のジョブの経過時間と残り時間を1秒ごとに更新する
+        self.elapsed_timer = QTimer(self)
+        self.elapsed_timer.timeout.connect(self.refresh_elapsed)
+        self.elapsed_timer.start(1000)
+
         # ★ アプリ起動時にAPIキーが無ければ設定画面を強制表示
         if not self.api_key:
             QMessageBox.warning(self, "要OpenAI API Key", "OpenAI API Keyが設定されていません。設定画面を開きます。")
@@ -305,10 +501,7 @@ class PDFApp(QWidget):
         dialog = SettingsDialog(self)
         result = dialog.exec_()
         if result == QDialog.Accepted:
-            load_dotenv(override=True)
-            self.api_key = os.getenv("OPENAI_API_KEY", "")
-            self.output_dir = os.getenv("OUTPUT_DIR", "./output")
-            self.timeout_sec = int(os.getenv("TIMEOUT_SEC", "60"))
+            self.reload_settings()
             if not self.api_key:
                 QMessageBox.critical(self, "エラー", "APIキーが設定されませんでした。アプリを終了します。")
                 sys.exit(1)
@@ -316,156 +509,337 @@ class PDFApp(QWidget):
             # キャンセルされた場合
             sys.exit(0)
 
+    def reload_settings(self):
+        load_dotenv(override=True)
+        self.api_key = os.getenv("OPENAI_API_KEY", "")
+        self.output_dir = os.getenv("OUTPUT_DIR", "./output")
+        self.timeout_sec = int(os.getenv("TIMEOUT_SEC", "60"))
+        # 実行中のジョブはそのまま、以降に始まるジョブから同時実行数を変える
+        self.pool.setMaxThreadCount(gui_concurrency())
+
+    # ---- キュー ----
+
+    def add_pdfs(self, paths):
+        import query_gui
+
+        # 作業ディレクトリ（xmls/<entry_id>・output_marp/<entry_id>）が重なるPDFは、終わっていないジョブと
+        # 同時に処理すると上書きし合うため追加しない（batch_run.find_duplicate_ids と同じく大文字・小文字は区別しない）
+        known = {query_gui.entry_id_for(job.pdf_path).lower(): job.pdf_path
+                 for job in self.jobs if not job.finished()}
+        skipped = []
+        for path in paths:
+            entry_id = query_gui.entry_id_for(path).lower()
+            if entry_id in known:
+                if known[entry_id] != path:
+                    path = f"{path}（{known[entry_id]} と重なります）"
+                skipped.append(path)
+                continue
+            known[entry_id] = path
+            job = Job(len(self.jobs), path)
+            self.jobs.append(job)
+            row = self.job_table.rowCount()
+            self.job_table.insertRow(row)
+            item = QTableWidgetItem(os.path.basename(path))
+            item.setToolTip(path)
+            self.job_table.setItem(row, self.COL_FILE, item)
+            self.job_table.setItem(row, self.COL_STATUS, QTableWidgetItem(job.status))
+            bar = QProgressBar(self.job_table)
+            bar.setRange(0, 100)
+            bar.setValue(0)
+            bar.setFormat("")
+            self.job_table.setCellWidget(row, self.COL_PROGRESS, bar)
+            self.job_table.setItem(row, self.COL_TIME, QTableWidgetItem(""))
+        if self.jobs and not self.job_table.selectedItems():
+            self.job_table.selectRow(len(self.jobs) - 1)
+        self.update_controls()
+        if skipped:
+            QMessageBox.warning(self, "警告", "同じ名前のPDFが処理待ちか処理中のため、追加しませんでした。\n"
+                                "終わってから追加するか、ファイル名を変えてください:\n" + "\n".join(skipped))
+
+    def set_status(self, job, status, tooltip=None):
+        job.status = status
+        item = self.job_table.item(job.id, self.COL_STATUS)
+        item.setText(status)
+        item.setToolTip(tooltip or "")
+        self.refresh_elapsed()
+        self.update_controls()
+
+    def selected_job(self):
+        rows = self.job_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.jobs[rows[0].row()]
+
+    def update_controls(self):
+        counts = {}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        self.run_button.setEnabled(counts.get("追加済み", 0) > 0)
+        self.cancel_button.setEnabled(bool(self.cancel_targets()) or self.deadline is not None)
+        if self.jobs:
+            parts = [f"{status} {n}" for status, n in counts.items()]
+            self.status_label.setText(" / ".join(parts))
+        job = self.selected_job()
+        exporting = self.pdf_worker is not None or self.pptx_worker is not None
+        ready = job is not None and job.md_file is not None and not exporting
+        self.pdf_button.setEnabled(ready)
+        self.pptx_button.setEnabled(ready)
+
+    @pyqtSlot()
+    def refresh_elapsed(self):
+        for job in self.jobs:
+            if job.run_started is not None or job.elapsed:
+                self.job_table.item(job.id, self.COL_TIME).setText(f"{job.elapsed_now():.1f} 秒")
+            if job.run_started is not None:
+                self.update_progress(job)
+        if self.export_tracker is not None:
+            self.update_export_progress()
+
+    def update_progress(self, job):
+        bar = self.job_table.cellWidget(job.id, self.COL_PROGRESS)
+        if job.tracker is None:
+            bar.setValue(0)
+            bar.setFormat("")
+            return
+        bar.setValue(int(job.tracker.fraction() * 100))
+        text = job.tracker.describe() or job.status
+        if job.run_started is not None:
+            # 残り時間はタイトル編集やキューでの待ち時間を除いた実行時間から見積もる
+            text += "  " + progress.format_eta(job.tracker.eta(elapsed=job.elapsed_now()))
+        bar.setFormat(f"%p%  {text}")
+
+    @pyqtSlot(int, object)
+    def on_job_event(self, job_id, event):
+        job = self.jobs[job_id]
+        if job.tracker is not None:
+            job.tracker.update(event)
+            self.update_progress(job)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = []
+        for url in event.mimeData().urls():
+            path = url.toLocalFile()
+            if os.path.isdir(path):
+                # フォルダをドロップした場合は直下のPDFをすべて追加する
+                paths += sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(".pdf"))
+            elif path.lower().endswith(".pdf"):
+                paths.append(path)
+        if paths:
+            self.add_pdfs(paths)
+            event.acceptProposedAction()
+
     def select_pdf(self):
-        pdf_file, _ = QFileDialog.getOpenFileName(self, "PDFを選択", "", "PDF Files (*.pdf)")
-        if pdf_file:
-            self.pdf_path = pdf_file
-            self.status_label.setText(f"選択中のPDF: {os.path.basename(pdf_file)}")
-            self.run_button.setEnabled(True)
+        pdf_files, _ = QFileDialog.getOpenFileNames(self, "PDFを選択", "", "PDF Files (*.pdf)")
+        if pdf_files:
+            self.add_pdfs(pdf_files)
 
     def start_processing(self):
-        if not self.pdf_path:
+        pending = [job for job in self.jobs if job.status == "追加済み"]
+        if not pending:
             QMessageBox.critical(self, "エラー", "PDFファイルが選択されていません。")
             return
 
         # 改めて env を再読込
-        load_dotenv(override=True)
-        self.api_key = os.getenv("OPENAI_API_KEY", "")
+        self.reload_settings()
         if not self.api_key:
             QMessageBox.critical(self, "エラー", "OpenAI API Key が設定されていません。")
             return
 
-        self.output_dir = os.getenv("OUTPUT_DIR", "./output")
-        self.timeout_sec = int(os.getenv("TIMEOUT_SEC", "60"))
-
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
-        self.status_label.setText("実行中…")
-        self.run_button.setEnabled(False)
-        self.select_button.setEnabled(False)
-        self.settings_button.setEnabled(False)
-        self.pdf_button.setEnabled(False)
-        self.pptx_button.setEnabled(False)
-
-        self.worker = Worker(self.pdf_path, self.output_dir, self.timeout_sec)
-        self.worker.finished.connect(self.on_processing_finished)
-        self.worker.error.connect(self.on_processing_error)
-        self.worker.start()
-
-        # ここでタイマー開始
-        self.start_countdown()
-
-    def start_countdown(self):
-        self.stop_countdown()
-        self.remaining_time = self.timeout_sec
-        self.timeout_label.setText(f"タイムアウトまで {self.remaining_time} 秒")
-        self.countdown_timer = QTimer(self)
-        self.countdown_timer.timeout.connect(self.update_countdown)
-        self.countdown_timer.start(1000)
-
-    def stop_countdown(self):
-        if self.countdown_timer:
-            self.countdown_timer.stop()
-            self.countdown_timer = None
-        self.timeout_label.setText("")
-
-    def update_countdown(self):
-        self.remaining_time -= 1
-        if self.remaining_time <= 0:
-            self.timeout_label.setText("タイムアウトしました!")
-            self.stop_countdown()
+        for job in pending:
+            job.deadline = deadline_mod.Deadline(self.timeout_sec)
+            job.summary_fields = {}
+            job.error = None
+            job.tracker = progress.Tracker(progress.PDF_STAGES + ('markdown',))
+            self.update_progress(job)
+            self.set_status(job, "待機中")
+            self.pool.start(PdfJob(job.id, job.pdf_path, self.output_dir, self.timeout_sec,
+                                   job.deadline, self.pdf_signals))
+
+    def cancel_targets(self):
+        # 選択中のジョブがあればそれだけ（実行中でなければ対象なし）、選択がなければ実行中のすべて
+        job = self.selected_job()
+        if job is not None:
+            return [job] if job.active() else []
+        return [j for j in self.jobs if j.active()]
+
+    def cancel_processing(self):
+        # 実行中の段階はページ・チャンク・スライドの区切りで止まり、marpは即座に終了する
+        # 実行中のPDF/PPTX出力は、どのジョブを選択しているかに関わらずキャンセルする
+        for job in self.cancel_targets():
+            if job.deadline is not None:
+                job.deadline.cancel()
+            dialog = self.title_dialogs.get(job.id)
+            if dialog is not None:
+                dialog.reject()
+        if self.deadline is not None:
+            self.deadline.cancel()
+            self.status_label.setText("キャンセル中…")
+
+    def finish_run(self, job):
+        if job.run_started is not None:
+            job.elapsed += time.time() - job.run_started
+            job.run_started = None
+            self.update_progress(job)
+
+    @pyqtSlot(int)
+    def on_job_started(self, job_id):
+        job = self.jobs[job_id]
+        job.run_started = time.time()
+        self.set_status(job, "Markdown生成中" if job.dirpath else "実行中")
+
+    @pyqtSlot(int, str, str)
+    def on_summary_field(self, job_id, field, value):
+        job = self.jobs[job_id]
+        job.summary_fields[field] = value
+        if job.status != "要約を受信中":
+            self.set_status(job, "要約を受信中")
+        if job is self.selected_job():
+            self.show_summary(job)
+
+    def show_summary(self, job):
+        if job is None:
+            self.summary_label.setText("")
+            return
+        if job.error:
+            self.summary_label.setText(job.error)
+            return
+        lines = [
+            f"{SUMMARY_FIELD_LABELS[f]}: {job.summary_fields[f]}"
+            for f in SUMMARY_FIELD_LABELS if f in job.summary_fields
+        ]
+        self.summary_label.setText("\n".join(lines))
+
+    @pyqtSlot()
+    def on_selection_changed(self):
+        self.show_summary(self.selected_job())
+        self.update_controls()
+
+    @pyqtSlot(int, str)
+    def on_processing_finished(self, job_id, dirpath):
+        job = self.jobs[job_id]
+        job.dirpath = dirpath
+        self.finish_run(job)
+
+        # タイトル編集ダイアログを表示（モードレスなので、他のジョブは止めずに進める）
+        if env_flag("EDIT_TITLE") and paper_record.exists(dirpath):
+            try:
+                dialog = TitleEditDialog(dirpath, self)
+            except Exception as e:
+                self.fail_job(job, f"タイトルの読み込み中にエラーが発生:\n{e}")
+                return
+            dialog.setModal(False)
+            dialog.setWindowTitle(f"タイトル編集 - {os.path.basename(job.pdf_path)}")
+            dialog.finished.connect(lambda _result, job=job: self.on_title_done(job))
+            self.title_dialogs[job.id] = dialog
+            self.set_status(job, "タイトル確認待ち")
+            dialog.show()
         else:
-            self.timeout_label.setText(f"タイムアウトまで {self.remaining_time} 秒")
-
-    @pyqtSlot(str)
-    def on_processing_finished(self, dirpath):
-        self.dirpath = dirpath
-        self.status_label.setText(
-            "処理完了！xmlsフォルダに中間ファイルが生成されました。"
-        )
-
-        # タイトル編集ダイアログを表示
-        paper_xml_path = os.path.join(self.dirpath, "paper.xml")
-        if os.path.exists(paper_xml_path):
-            dialog = TitleEditDialog(paper_xml_path, self)
-            dialog.exec_()  # ユーザーがOKを押せばtitleが更新
+            self.start_markdown(job)
 
-        # タイトル編集が完了したらMD生成
-        try:
-            marp_dir = os.path.join(self.output_dir, "output_marp")
-            if not os.path.exists(marp_dir):
-                os.makedirs(marp_dir)
-            # 最新タイトルでMD生成
-            start_time = time.time()
-            self.generated_md_file = mkmd_gui.convert_xmls_to_md(
-                self.dirpath,
-                output_dir=marp_dir,
-                timeout_sec=self.timeout_sec,
-                start_time=start_time
-            )
-            QMessageBox.information(
-                self, "完了", "処理が完了しました。\n'./output_marp'フォルダでMDを確認できます。"
-            )
-        except Exception as e:
-            QMessageBox.critical(
-                self, "エラー", f"MD生成中にエラーが発生:\n{e}"
-            )
-
-        self.reset_ui()
-        self.pdf_button.setEnabled(True)
-        self.pptx_button.setEnabled(True)
-
-    @pyqtSlot(str)
-    def on_processing_error(self, error_msg):
-        QMessageBox.critical(
-            self, "エラー", f"処理中にエラーが発生:\n{error_msg}"
-        )
-        self.reset_ui()
+    def on_title_done(self, job):
+        self.title_dialogs.pop(job.id, None)
+        if job.deadline.cancelled():
+            self.set_status(job, "キャンセル")
+            return
+        self.start_markdown(job)
+
+    def start_markdown(self, job):
+        # タイトル編集が完了したら最新タイトルでMD生成
+        # 論文ごとに出力先を分け、タイトル先頭14文字が同じ論文を並行して処理しても上書きしないようにする（batch_run と同じ）
+        entry_id = os.path.basename(job.dirpath)
+        marp_dir = os.path.join(self.output_dir, "output_marp", entry_id)
+        if not os.path.exists(marp_dir):
+            os.makedirs(marp_dir)
+        self.set_status(job, "待機中")
+        self.pool.start(MarkdownJob(job.id, job.dirpath, marp_dir, self.timeout_sec, job.deadline, self.md_signals))
+
+    @pyqtSlot(int, str)
+    def on_markdown_finished(self, job_id, md_file):
+        job = self.jobs[job_id]
+        job.md_file = md_file
+        self.finish_run(job)
+        self.set_status(job, "完了", tooltip=md_file)
+
+    @pyqtSlot(int, str)
+    def on_job_error(self, job_id, error_msg):
+        job = self.jobs[job_id]
+        self.finish_run(job)
+        if job.deadline is not None and job.deadline.cancelled():
+            self.set_status(job, "キャンセル")
+            return
+        self.fail_job(job, f"処理中にエラーが発生:\n{error_msg}")
 
-    def reset_ui(self):
-        self.run_button.setEnabled(True if self.pdf_path else False)
-        self.select_button.setEnabled(True)
-        self.settings_button.setEnabled(True)
-        self.stop_countdown()
-        self.worker = None
+    def fail_job(self, job, message):
+        # 他のジョブを止めないよう、エラーはダイアログではなく行の状態と要約欄に表示する
+        job.error = message
+        self.set_status(job, "エラー", tooltip=message)
+        if job is self.selected_job():
+            self.show_summary(job)
 
     def open_settings(self):
         dialog = SettingsDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             # ここでは「設定が保存されました」のメッセージを重複表示しない
-            load_dotenv(override=True)
-            self.api_key = os.getenv("OPENAI_API_KEY", "")
-            self.output_dir = os.getenv("OUTPUT_DIR", "./output")
-            self.timeout_sec = int(os.getenv("TIMEOUT_SEC", "60"))
+            self.reload_settings()
         else:
             # キャンセルの場合は何もしない
             pass
 
+    # ---- 出力（選択中のジョブ） ----
+
+    @pyqtSlot(object)
+    def on_export_event(self, event):
+        if self.export_tracker is not None:
+            self.export_tracker.update(event)
+            self.update_export_progress()
+
+    def update_export_progress(self):
+        tracker = self.export_tracker
+        fraction = tracker.fraction()
+        if fraction <= 0 or fraction >= 1:
+            # スライドごとの進捗が届くまでは動きだけを表示する
+            self.export_bar.setRange(0, 0)
+        else:
+            self.export_bar.setRange(0, 100)
+            self.export_bar.setValue(int(fraction * 100))
+        text = tracker.describe() or "出力中…"
+        if 0 < fraction < 1:
+            text += "  " + progress.format_eta(tracker.eta())
+        self.export_label.setText(text)
+
+    def was_cancelled(self):
+        return self.deadline is not None and self.deadline.cancelled()
+
     def start_pdf_export(self):
-        if not self.generated_md_file:
+        job = self.selected_job()
+        if job is None or not job.md_file:
             QMessageBox.warning(self, "警告", "処理が完了していません。")
             return
         pdf_filename = self.generate_unique_filename(
             os.path.splitext(
-                os.path.basename(self.generated_md_file)
+                os.path.basename(job.md_file)
             )[0],
             "pdf",
             self.output_dir
         )
         pdf_output = os.path.join(self.output_dir, pdf_filename)
 
-        self.disable_ui_during_export()
+        self.disable_ui_during_export('pdf')
         self.pdf_worker = PdfWorker(
-            self.generated_md_file, pdf_output, self.timeout_sec
+            job.md_file, pdf_output, self.timeout_sec, self.deadline
         )
         self.pdf_worker.finished.connect(self.on_pdf_finished)
         self.pdf_worker.error.connect(self.on_pdf_error)
+        self.pdf_worker.event.connect(self.on_export_event)
         self.pdf_worker.start()
 
-        # PDF変換もタイマー開始
-        self.start_countdown()
-
     @pyqtSlot(str)
     def on_pdf_finished(self, pdf_path):
         QMessageBox.information(
@@ -475,34 +849,37 @@ class PDFApp(QWidget):
 
     @pyqtSlot(str)
     def on_pdf_error(self, error_msg):
+        if self.was_cancelled():
+            self.enable_ui_after_export()
+            self.export_label.setText("キャンセルしました")
+            return
         QMessageBox.critical(
             self, "エラー", f"PDF出力中にエラー:\n{error_msg}"
         )
         self.enable_ui_after_export()
 
     def start_pptx_export(self):
-        if not self.generated_md_file:
+        job = self.selected_job()
+        if job is None or not job.md_file:
             QMessageBox.warning(self, "警告", "処理が完了していません。")
             return
         base_title = os.path.splitext(
-            os.path.basename(self.generated_md_file)
+            os.path.basename(job.md_file)
         )[0]
         pptx_filename = self.generate_unique_filename(
             base_title, "pptx", self.output_dir
         )
         pptx_output = os.path.join(self.output_dir, pptx_filename)
 
-        self.disable_ui_during_export()
+        self.disable_ui_during_export('pptx')
         self.pptx_worker = PptxWorker(
-            self.generated_md_file, pptx_output, self.timeout_sec
+            job.dirpath, pptx_output, self.timeout_sec, self.deadline
         )
         self.pptx_worker.finished.connect(self.on_pptx_finished)
         self.pptx_worker.error.connect(self.on_pptx_error)
+        self.pptx_worker.event.connect(self.on_export_event)
         self.pptx_worker.start()
 
-        # PPTX変換もタイマー開始
-        self.start_countdown()
-
     @pyqtSlot(str)
     def on_pptx_finished(self, pptx_path):
         QMessageBox.information(
@@ -512,29 +889,33 @@ class PDFApp(QWidget):
 
     @pyqtSlot(str)
     def on_pptx_error(self, error_msg):
+        if self.was_cancelled():
+            self.enable_ui_after_export()
+            self.export_label.setText("キャンセルしました")
+            return
         QMessageBox.critical(
             self, "エラー", f"PPTX出力中にエラー:\n{error_msg}"
         )
         self.enable_ui_after_export()
 
-    def disable_ui_during_export(self):
-        self.run_button.setEnabled(False)
-        self.select_button.setEnabled(False)
-        self.settings_button.setEnabled(False)
+    def disable_ui_during_export(self, stage):
+        # キューの処理は止めず、出力ボタンだけを無効にする
         self.pdf_button.setEnabled(False)
         self.pptx_button.setEnabled(False)
-        self.status_label.setText("出力中…")
+        self.export_tracker = progress.Tracker((stage,))
+        self.export_bar.setVisible(True)
+        self.update_export_progress()
+        self.deadline = deadline_mod.Deadline(self.timeout_sec)
+        self.cancel_button.setEnabled(True)
 
     def enable_ui_after_export(self):
-        self.run_button.setEnabled(True if self.pdf_path else False)
-        self.select_button.setEnabled(True)
-        self.settings_button.setEnabled(True)
-        self.pdf_button.setEnabled(True if self.generated_md_file else False)
-        self.pptx_button.setEnabled(True if self.generated_md_file else False)
-        self.stop_countdown()
+        self.export_tracker = None
+        self.export_bar.setVisible(False)
+        self.export_label.setText("")
         self.pdf_worker = None
         self.pptx_worker = None
-        self.status_label.setText("")
+        self.deadline = None
+        self.update_controls()
 
     def generate_unique_filename(self, base_name, ext, target_dir):
         out_name = f"{base_name}.{ext}"
@@ -550,4 +931,7 @@ if __name__ == "__main__":
     app.setWindowIcon(QIcon('icon.ico'))  # タスクバーアイコンも設定
     window = PDFApp()
     window.show()
+    if prewarm_enabled():
+        # 最初の描画が終わってから読み込みを始める
+        QTimer.singleShot(0, start_prewarm)
     sys.exit(app.exec_())
\ No newline at end of file
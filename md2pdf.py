@@ -2,10 +2,37 @@
 import time
 import os
 import subprocess
+import tracing
+import deadline as deadline_mod
+import progress
 
-def convert_md_to_pdf(md_file, pdf_output_file, timeout_sec=60, start_time=None):
+PDF_RENDERERS = ('marp', 'pymupdf')
+
+def get_renderer(renderer=None):
+    # 指定がなければ環境変数 PDF_RENDERER（既定: marp）を使う
+    renderer = (renderer or os.getenv("PDF_RENDERER", "marp")).lower()
+    if renderer not in PDF_RENDERERS:
+        raise Exception(f"未対応のPDF出力方法です: {renderer}")
+    return renderer
+
+def convert_md_to_pdf(md_file, pdf_output_file, timeout_sec=60, start_time=None, deadline=None, renderer=None,
+                      on_event=None):
+    """
+    renderer="marp" ならMarp CLIで、"pymupdf" ならMarpを使わずプロセス内で
+    PyMuPDFにより出力する（slide_pdf.py）。
+    on_event を渡すと開始・終了（pymupdf ではスライドごとにも）を通知する（progress.py）。
+    """
     if start_time is None:
         start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+    reporter = progress.Reporter(on_event)
+    if get_renderer(renderer) == 'pymupdf':
+        import slide_pdf
+        reporter.stage_started('pdf')
+        with tracing.trace_run("convert_md_to_pdf"):
+            slide_pdf.convert_md_to_pdf(md_file, pdf_output_file, deadline=deadline, reporter=reporter)
+        reporter.stage_finished('pdf')
+        return
 
     # コマンド構築: Marp CLIを利用
     command = [
@@ -22,17 +49,72 @@ def convert_md_to_pdf(md_file, pdf_output_file, timeout_sec=60, start_time=None)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # 現時点で残りタイムを計算しtimeoutに反映
-    elapsed = time.time() - start_time
-    remaining_timeout = timeout_sec - elapsed
-    if remaining_timeout <= 0:
+    if deadline.expired():
         raise Exception("PDF変換開始前に既にタイムアウト")
 
-    try:
-        subprocess.run(command, check=True, timeout=remaining_timeout)
-        print(f"Successfully converted {md_file} to {pdf_output_file}")
-    except subprocess.TimeoutExpired:
-        raise Exception("PDF変換中にタイムアウトしました")
-    except subprocess.CalledProcessError as e:
-        # marpコマンドがエラー終了した場合
-        raise Exception(f"PDF変換中にエラーが発生しました: {e}")
\ No newline at end of file
+    reporter.stage_started('pdf')
+    with tracing.trace_run("convert_md_to_pdf"):
+        with tracing.span("convert_md_to_pdf", bytes_read=tracing.file_size(md_file)) as sp:
+            try:
+                # 期限切れ・キャンセル時はmarp（Node/Chromium）をその場で終了させる
+                deadline.run_process(command, stage="PDF変換")
+                print(f"Successfully converted {md_file} to {pdf_output_file}")
+            except subprocess.CalledProcessError as e:
+                # marpコマンドがエラー終了した場合
+                raise Exception(f"PDF変換中にエラーが発生しました: {e}")
+            sp.set(bytes_written=tracing.file_size(pdf_output_file))
+    reporter.stage_finished('pdf')
+
+def convert_mds_to_pdf(md_files, timeout_sec=60, start_time=None, deadline=None, renderer=None):
+    """
+    複数のMarkdownを1回のmarp起動でまとめてPDFにする。
+    Node/Chromiumの起動は1回だけなので、短いスライドを大量に出力する場合に速い。
+    PDFは各Markdownと同じ場所に拡張子だけ変えて出力される。
+    戻り値は {md_file: pdf_file または 例外}。まとめて変換できなかったファイルは
+    1件ずつ convert_md_to_pdf でやり直し、失敗した原因をそのファイルの結果として返す。
+    """
+    if start_time is None:
+        start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+    if not md_files:
+        return {}
+
+    outputs = {md: os.path.splitext(md)[0] + ".pdf" for md in md_files}
+    if get_renderer(renderer) == 'pymupdf':
+        # プロセスを起動しないため、まとめる必要はない
+        results = {}
+        for md in md_files:
+            try:
+                convert_md_to_pdf(md, outputs[md], deadline=deadline, renderer='pymupdf')
+                results[md] = outputs[md]
+            except Exception as e:
+                results[md] = e
+        return results
+    before = {pdf: os.stat(pdf).st_mtime_ns if os.path.exists(pdf) else None for pdf in outputs.values()}
+    command = ['marp', '--pdf', '--allow-local-files'] + list(md_files)
+
+    with tracing.trace_run("convert_mds_to_pdf"):
+        with tracing.span("convert_mds_to_pdf", deck_count=len(md_files)) as sp:
+            try:
+                deadline.run_process(command, stage="PDF変換")
+            except subprocess.CalledProcessError as e:
+                # 一部のファイルだけ失敗した場合でも、出力できたものは使う
+                print(f"まとめてのPDF変換でエラーが発生しました: {e}")
+
+            results = {}
+            retry = []
+            for md, pdf in outputs.items():
+                if os.path.exists(pdf) and os.stat(pdf).st_mtime_ns != before[pdf]:
+                    results[md] = pdf
+                else:
+                    retry.append(md)
+            sp.set(converted=len(results), retried=len(retry))
+
+    for md in retry:
+        try:
+            convert_md_to_pdf(md, outputs[md], deadline=deadline)
+            results[md] = outputs[md]
+        except Exception as e:
+            results[md] = e
+    print(f"{len(md_files)} 件のMarkdownをPDFに変換しました（1件ずつやり直し {len(retry)} 件）")
+    return results
@@ -1,56 +1,41 @@
 # md2pptx.py
 import os
 import re
+import html
 import datetime
-from markdown import markdown
-from bs4 import BeautifulSoup
 from pptx import Presentation
 from pptx.util import Pt, Inches
+from PIL import Image
 from dotenv import dotenv_values
+import tracing
 
 def preprocess_marp(md_text):
     md_text = re.sub(r'<!--.*?-->', '', md_text, flags=re.DOTALL)
     return md_text.strip()
 
 def parse_front_matter(md_text):
-    fm_pattern = r'^---\s*(.*?)\s*---\s*(.*)$'
-    match = re.search(fm_pattern, md_text, flags=re.DOTALL|re.MULTILINE)
+    # front matter は文書の先頭が --- の行のときだけ。次の --- の行までを読む
     front_matter = {}
-    body = md_text
-    if match:
-        fm_text = match.group(1)
-        body = match.group(2)
-        for line in fm_text.split('\n'):
-            line=line.strip()
-            if not line:
-                continue
-            if ':' in line:
-                key, val = line.split(':',1)
-                key = key.strip()
-                val = val.strip()
-                front_matter[key] = val
-    return front_matter, body
-
-def split_slides(md_text):
-    slides = [s.strip() for s in md_text.split('---') if s.strip()]
-    return slides
-
-def parse_slide(slide_md):
-    html = markdown(slide_md, extensions=['extra', 'smarty'])
-    soup = BeautifulSoup(html, 'html.parser')
-    notes_div = soup.find('div', class_='notes')
-    notes = None
-    if notes_div:
-        notes = notes_div.get_text(strip=True, separator='\n')
-        notes_div.decompose()
-    heading = soup.find(['h1', 'h2', 'h3'])
-    title = heading.get_text(strip=True) if heading else None
-    if heading:
-        heading.decompose()
-
-    bullets = [li.get_text(strip=True) for li in soup.find_all('li')]
-    paragraphs = [p.get_text(strip=True) for p in soup.find_all('p')]
+    lines = md_text.split('\n')
+    if not lines or lines[0].strip() != '---':
+        return front_matter, md_text
+    for end in range(1, len(lines)):
+        if lines[end].strip() == '---':
+            break
+    else:
+        return front_matter, md_text
+    for line in lines[1:end]:
+        line = line.strip()
+        if not line:
+            continue
+        if ':' in line:
+            key, val = line.split(':', 1)
+            key = key.strip()
+            val = val.strip()
+            front_matter[key] = val
+    return front_matter, '\n'.join(lines[end + 1:])
 
+def make_slide_data(title, notes, images, bullets, paragraphs):
     if not title:
         if paragraphs:
             title = paragraphs[0]
@@ -75,6 +60,7 @@ def parse_slide(slide_md):
         'type': slide_type,
         'title': title,
         'notes': notes,
+        'images': images,
     }
     if slide_type == 'bullet':
         slide_data['bullets'] = bullets
@@ -83,11 +69,265 @@ def parse_slide(slide_md):
 
     return slide_data
 
-def build_slides_data(md_text):
-    slides = split_slides(md_text)
-    slides_data = [parse_slide(s) for s in slides]
+# ---- 1パスのスライド分割・解析 ----
+# Marp のスライドで使う記法だけを、行単位の走査と行内の正規表現で解析する。
+#   ブロック: 見出し(#)、段落（引用は > を除いて段落にする）、リスト（- * + 1.、入れ子の項目もそれぞれ1項目）、
+#             <div class="notes">、
+#             コード（``` ~~~ と段落の外のインデント）・表・HTMLブロックは読み飛ばす（画像だけ拾う）
+#   行内: 強調・コード・リンク・画像・<img>・エスケープ・文字参照・改行
+# Setext見出し・smarty（引用符やダッシュの置き換え）・項目の中の段落などは扱わず、そのままの文字列にする。
+# 行内のテキストは従来の markdown + BeautifulSoup（get_text(strip=True)）と同じく、
+# 記法で区切った断片ごとに前後の空白を除いて連結する。
+_FENCE_RE = re.compile(r'^(`{3,}|~{3,})')
+_HR_RE = re.compile(r'^ {0,3}([-*_])(?: *\1){2,} *$')
+_HEADING_RE = re.compile(r'^(#{1,6})(.*?)#*$')
+_LIST_RE = re.compile(r'^ *(?:[*+-]|\d+\.) +(.*)$')
+_QUOTE_RE = re.compile(r'^ {0,3}> ?')
+_NOTES_RE = re.compile(r'^ {0,3}<div\s+class=["\']notes["\']\s*>', re.IGNORECASE)
+_HTML_BLOCK_RE = re.compile(r'^ {0,3}</?(?:address|article|aside|blockquote|details|dialog|div|dl|fieldset|figure|'
+                            r'footer|form|h[1-6]|header|hr|iframe|ol|p|pre|section|table|ul)(?:\s|/?>|$)',
+                            re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]*>')
+_IMG_ATTR_RE = re.compile(r"""\b(src|alt)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+_INLINE_SPECIAL_RE = re.compile(r'[\\`*_\[!<&]| \n')
+_INLINE_RE = re.compile(
+    r'\\(?P<esc>[\\`*_{}\[\]()#+\-.!:|<>])'
+    r'|(?P<ticks>`+)(?P<code>.+?)(?<!`)(?P=ticks)(?!`)'
+    r'|!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]*)(?:\s+"[^"]*"|\s+\'[^\']*\')?\s*\)'
+    r'|\[(?P<label>(?:[^\[\]]|\[[^\]]*\])*)\]\([^)]*\)'
+    r'|<(?P<autolink>(?:https?|ftp)://[^>\s]+|[^>\s@]+@[^>\s@]+)>'
+    r'|<(?P<tag_name>/?[A-Za-z][A-Za-z0-9]*)(?P<attrs>[^>]*)>'
+    r'|(?P<br> {2,}\n)'
+    r'|\*\*\*(?P<em_strong>.+?)\*\*\*'
+    r'|\*\*(?P<strong>.+?)\*\*'
+    r'|(?<!\w)__(?!_)(?P<strong2>.+?)(?<!_)__(?!\w)'
+    r'|\*(?P<em>[^*]+)\*'
+    r'|(?<!\w)_(?!_)(?P<em2>.+?)(?<!_)_(?!\w)',
+    re.DOTALL)
+_INLINE_NESTED = ('label', 'em_strong', 'strong', 'strong2', 'em', 'em2')
+
+def _img_attrs(attrs):
+    values = {}
+    for m in _IMG_ATTR_RE.finditer(attrs):
+        values[m.group(1).lower()] = html.unescape(next(v for v in m.group(2, 3, 4) if v is not None))
+    return {'src': values.get('src'), 'alt': values.get('alt', '')}
+
+def _inline_segments(text, out, images):
+    """
+    行内記法を解釈し、記法で区切った断片を strip して out に追加する。
+    画像は images に追加する（None なら捨てる）。
+    """
+    pos = 0
+    buf = []
+
+    def flush():
+        s = html.unescape(''.join(buf)).strip()
+        if s:
+            out.append(s)
+        buf.clear()
+
+    for m in _INLINE_RE.finditer(text):
+        if m.start() > pos:
+            buf.append(text[pos:m.start()])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'esc':
+            buf.append(m.group('esc'))
+            continue
+        flush()
+        if kind == 'code':
+            s = m.group('code').strip()
+            if s:
+                out.append(s)
+        elif kind == 'src':
+            if images is not None:
+                images.append({'src': m.group('src'), 'alt': m.group('alt')})
+        elif kind == 'autolink':
+            out.append(m.group('autolink'))
+        elif kind == 'attrs':
+            if images is not None and m.group('tag_name').lower() == 'img':
+                images.append(_img_attrs(m.group('attrs')))
+        elif kind in _INLINE_NESTED:
+            _inline_segments(m.group(kind), out, images)
+    if pos < len(text):
+        buf.append(text[pos:])
+    flush()
+
+def inline_text(text, images=None):
+    if not _INLINE_SPECIAL_RE.search(text):
+        return text.strip()
+    out = []
+    _inline_segments(text, out, images)
+    return ''.join(out)
+
+class _SlideParser:
+    # 1枚のスライドの行を順に受け取り、タイトル・箇条書き・段落・画像・ノートを集める
+    def __init__(self):
+        self.has_content = False
+        self.title = None
+        self.notes = None
+        self.images = []
+        self.bullets = []
+        self.paragraphs = []
+        self.para = None        # 書きかけの段落（行のリスト）
+        self.item = None        # 書きかけのリスト項目（行のリスト）
+        self.in_list = False
+        self.skip = None        # 'code' / 'table' / 'html' のブロックを読み飛ばしている
+        self.notes_lines = None
+
+    def end_para(self):
+        if self.para is not None:
+            self.paragraphs.append(inline_text('\n'.join(self.para), self.images))
+            self.para = None
+
+    def end_item(self):
+        if self.item is not None:
+            self.bullets.append(inline_text('\n'.join(self.item), self.images))
+            self.item = None
+
+    def end_block(self):
+        self.end_para()
+        self.end_item()
+        self.in_list = False
+
+    def feed(self, line):
+        if '\t' in line:
+            line = line.expandtabs(4)
+        stripped = line.strip()
+        if stripped and not self.has_content:
+            # 従来どおりスライドの前後の空白は除いて扱う（先頭行のインデントはコードにしない）
+            self.has_content = True
+            line = line.lstrip()
+
+        if self.notes_lines is not None:
+            self.add_notes_line(line)
+            return
+        if self.skip is not None:
+            if not stripped:
+                if self.skip != 'code':
+                    self.skip = None
+                return
+            if self.skip != 'code' or line.startswith('    '):
+                return
+            self.skip = None
+
+        m = _QUOTE_RE.match(line)
+        if m:
+            line = line[m.end():]
+            stripped = line.strip()
+        if not stripped:
+            # 空行の後も項目が続けば同じリスト
+            self.end_para()
+            self.end_item()
+            return
+
+        if _NOTES_RE.match(line):
+            self.end_block()
+            self.notes_lines = []
+            self.add_notes_line(line[line.index('>') + 1:])
+            return
+        if line.startswith('#'):
+            m = _HEADING_RE.match(line)
+            self.end_block()
+            if self.title is None and len(m.group(1)) <= 3:
+                # タイトルにした見出しの中の画像は数えない（従来は decompose で消えていた）
+                self.title = inline_text(m.group(2))
+            else:
+                inline_text(m.group(2), self.images)
+            return
+
+        m = _LIST_RE.match(line)
+        if m:
+            self.end_para()
+            self.end_item()
+            self.in_list = True
+            self.item = [m.group(1)]
+            return
+        if self.item is not None:
+            # 空行なしで続く行は、直前の項目の続き
+            self.item.append(line.strip())
+            return
+        if self.para is not None:
+            self.para.append(line)
+            return
+        if line.startswith('    ') and not self.in_list:
+            self.skip = 'code'
+            return
+        self.in_list = False
+        if stripped.startswith('|'):
+            self.skip = 'table'
+            return
+        if _HTML_BLOCK_RE.match(line):
+            # notes 以外のHTMLブロックは画像だけ拾う
+            self.skip = 'html'
+            self.add_html_images(line)
+            return
+        self.para = [line]
+
+    def add_html_images(self, line):
+        for m in _INLINE_RE.finditer(line):
+            if m.lastgroup == 'attrs' and m.group('tag_name').lower() == 'img':
+                self.images.append(_img_attrs(m.group('attrs')))
+
+    def add_notes_line(self, line):
+        end = line.find('</div>')
+        self.notes_lines.append(line if end < 0 else line[:end])
+        if end >= 0:
+            self.end_notes()
+
+    def end_notes(self):
+        if self.notes is None:
+            # get_text(strip=True, separator='\n') と同じく、タグで区切った断片を改行でつなぐ
+            raw = '\n'.join(self.notes_lines)
+            parts = (html.unescape(s).strip() for s in _TAG_RE.split(raw))
+            self.notes = '\n'.join(s for s in parts if s)
+        self.notes_lines = None
+
+    def finish(self):
+        if self.notes_lines is not None:
+            # 閉じられていない notes はスライドの最後までとする
+            self.end_notes()
+        self.end_block()
+        if not self.has_content:
+            return None
+        return make_slide_data(self.title, self.notes, self.images, self.bullets, self.paragraphs)
+
+def tokenize_slides(md_text):
+    """
+    本文（front matter を除いたもの）を1回走査して、スライドごとのデータのリストを返す。
+    コードブロックの外にある水平線（---）だけをスライドの区切りとする。
+    """
+    slides_data = []
+    parser = _SlideParser()
+    fence = None
+    for line in md_text.split('\n'):
+        if fence is not None:
+            if line.startswith(fence) and not line.strip(fence[0]).strip():
+                fence = None
+            continue
+        m = _FENCE_RE.match(line)
+        if m and parser.notes_lines is None:
+            # コードは見出し・箇条書き・段落のどれにも入らない
+            fence = m.group(1)
+            parser.has_content = True
+            parser.end_block()
+            continue
+        if _HR_RE.match(line) and parser.notes_lines is None:
+            slide = parser.finish()
+            if slide is not None:
+                slides_data.append(slide)
+            parser = _SlideParser()
+            continue
+        parser.feed(line)
+    slide = parser.finish()
+    if slide is not None:
+        slides_data.append(slide)
     return slides_data
 
+def build_slides_data(md_text):
+    return tokenize_slides(md_text)
+
 def load_size_map():
     env = dotenv_values(".env")
     size_dict = {}
@@ -100,6 +340,14 @@ def load_size_map():
             size_dict[ratio_key] = (Inches(w), Inches(h))
     return size_dict
 
+# Marpのスライド幅(px)。![width:N] の N はこの幅に対する大きさ
+MARP_SLIDE_WIDTH = 1280
+IMAGE_MARGIN_RATIO = 0.04
+
+def image_width_px(alt):
+    m = re.search(r'width:(\d+)', alt or '')
+    return int(m.group(1)) if m else None
+
 def add_title_slide(prs, title_text, subtitle_text=None, notes=None):
     slide_layout = prs.slide_layouts[0]
     slide = prs.slides.add_slide(slide_layout)
@@ -139,18 +387,77 @@ def add_text_slide(prs, title_text, text_lines, title_layout=1, font_size=18, bo
     if notes:
         slide.notes_slide.notes_text_frame.text = notes
 
-def create_ppt_from_slides_data(front_matter, slides_data, output_filename="output.pptx", template_file=None):
+def add_image_slide(prs, image_path, title_text=None, width_px=None, image_size=None, notes=None):
+    """
+    画像1枚のスライドを追加する。width_px はMarpの ![width:N] と同じく1280px幅のスライドに対する幅で、
+    縦横比を保ったまま、タイトルの下の領域に収まる大きさで中央に置く。
+    """
+    layouts = prs.slide_layouts
+    if len(layouts) > 6:
+        layout = layouts[5] if title_text else layouts[6]
+    else:
+        layout = layouts[-1]
+    slide = prs.slides.add_slide(layout)
+    margin = int(prs.slide_width * IMAGE_MARGIN_RATIO)
+    top = margin
+    title = slide.shapes.title
+    if title is not None:
+        if title_text:
+            title.text = title_text
+            top = title.top + title.height
+        else:
+            title.element.getparent().remove(title.element)
+
+    if image_size is None:
+        with Image.open(image_path) as image:
+            image_size = image.size
+    width, height = image_size
+    max_width = prs.slide_width - 2 * margin
+    if width_px:
+        max_width = min(max_width, int(prs.slide_width * width_px / MARP_SLIDE_WIDTH))
+    max_height = prs.slide_height - top - margin
+    scale = min(max_width / width, max_height / height)
+    pic_width = int(width * scale)
+    pic_height = int(height * scale)
+    left = (prs.slide_width - pic_width) // 2
+    top = top + (max_height - pic_height) // 2
+    slide.shapes.add_picture(image_path, left, top, pic_width, pic_height)
+    if notes:
+        slide.notes_slide.notes_text_frame.text = notes
+    return slide
+
+def new_presentation(slide_ratio=None, template_file=None):
     if template_file:
         prs = Presentation(template_file)
     else:
         prs = Presentation()
     size_map = load_size_map()
-    slide_ratio = front_matter.get('size', None)
     DEFAULT_SIZE = (Inches(10), Inches(7.5))
     if slide_ratio in size_map:
         prs.slide_width, prs.slide_height = size_map[slide_ratio]
     else:
         prs.slide_width, prs.slide_height = DEFAULT_SIZE
+    return prs
+
+def add_slide_images(prs, slide_data, base_dir="."):
+    # 画像だけのスライド（make_md の図のスライド）は画像を貼る。見つからなければ False
+    added = False
+    title = slide_data['title'] if slide_data['title'] != "No Title" else None
+    for img in slide_data['images']:
+        path = img['src']
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        if not os.path.exists(path):
+            print(f"画像が見つからないためスキップします: {path}")
+            continue
+        add_image_slide(prs, path, title_text=None if added else title,
+                        width_px=image_width_px(img.get('alt')), notes=slide_data['notes'])
+        added = True
+    return added
+
+def create_ppt_from_slides_data(front_matter, slides_data, output_filename="output.pptx", template_file=None,
+                                deadline=None, base_dir="."):
+    prs = new_presentation(front_matter.get('size', None), template_file)
 
     title_text = front_matter.get('title', 'No Title')
     now = datetime.datetime.now()
@@ -158,6 +465,11 @@ def create_ppt_from_slides_data(front_matter, slides_data, output_filename="outp
     add_title_slide(prs, title_text, subtitle_text=today)
 
     for slide_data in slides_data:
+        if deadline is not None:
+            deadline.check("PPTX変換")
+        if (slide_data['images'] and not slide_data.get('bullets') and not slide_data.get('text_lines')
+                and add_slide_images(prs, slide_data, base_dir)):
+            continue
         if slide_data['type'] == 'bullet':
             add_bullet_slide(prs, slide_data['title'], slide_data['bullets'], notes=slide_data['notes'])
         elif slide_data['type'] == 'text':
@@ -168,10 +480,19 @@ def create_ppt_from_slides_data(front_matter, slides_data, output_filename="outp
     prs.save(output_filename)
     print(f"PowerPointファイル出力完了: {output_filename}")
 
-def convert_md_to_pptx(md_file, pptx_output_file="output.pptx"):
-    with open(md_file, 'r', encoding='utf-8') as f:
-        md_text = f.read()
-    md_text = preprocess_marp(md_text)
-    front_matter, body = parse_front_matter(md_text)
-    slides_data = build_slides_data(body)
-    create_ppt_from_slides_data(front_matter, slides_data, pptx_output_file)
\ No newline at end of file
+def convert_md_to_pptx(md_file, pptx_output_file="output.pptx", deadline=None):
+    with tracing.trace_run("convert_md_to_pptx"):
+        with tracing.span("convert_md_to_pptx") as sp:
+            with open(md_file, 'r', encoding='utf-8') as f:
+                md_text = f.read()
+            with tracing.span("parse_markdown", bytes_read=len(md_text.encode('utf-8'))):
+                md_text = preprocess_marp(md_text)
+                front_matter, body = parse_front_matter(md_text)
+                slides_data = build_slides_data(body)
+            if deadline is not None:
+                deadline.check("PPTX変換")
+            with tracing.span("write_pptx", slide_count=len(slides_data)):
+                # 画像のパスはMarpと同じくMarkdownファイルの場所からの相対パス
+                create_ppt_from_slides_data(front_matter, slides_data, pptx_output_file, deadline=deadline,
+                                            base_dir=os.path.dirname(os.path.abspath(md_file)))
+            sp.set(bytes_written=tracing.file_size(pptx_output_file))
\ No newline at end of file
@@ -1,24 +1,107 @@
 # mkmd_gui.py
 import os
-import glob
-import xmltodict
 import re
 import time
 from PIL import Image
+import pipeline_manifest
+import paper_record
+import image_derivatives
+import tracing
+import deadline as deadline_mod
+import progress
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp')
+# 図のスライドでの最大サイズ(px)。1600x900 の7割の枠に収める
+SLIDE_IMAGE_BOX = (1600.0 * 0.7, 900.0 * 0.7)
 
 def safe_filename(filename):
     return re.sub(r'[^a-zA-Z0-9_\-]', '_', filename)
 
-def make_md(dirname, filename, output_dir='./output_marp', min_size_kb=100):
+def read_paper(dirname, filename=None):
+    # filename は以前の呼び出し（"paper.xml" を渡していた）との互換のために残している
+    paper = paper_record.load(dirname)
+    print(f"Processing file: {os.path.basename(paper_record.record_path(dirname))}")
+    return paper
+
+def image_listing(dirname):
+    # images/ のファイル名とサイズ。出力を作り直すかどうかの判定に使う
+    images_dir = os.path.join(dirname, "images")
+    if not os.path.exists(images_dir):
+        return []
+    with os.scandir(images_dir) as it:
+        return sorted((entry.name, entry.stat().st_size) for entry in it if entry.is_file())
+
+def scan_images(images_dir):
+    # 記録のない古いディレクトリ用。scandir 1回でファイル名とサイズを集める（寸法は不明）
+    images = []
+    with os.scandir(images_dir) as it:
+        for entry in sorted(it, key=lambda e: e.name):
+            # half.png(.jpg/.webp)を除外（既に表示済）
+            if not entry.name.lower().endswith(IMAGE_EXTS) or os.path.splitext(entry.name)[0] == 'half':
+                continue
+            images.append({'file': entry.name, 'bytes': entry.stat().st_size})
+    return images
+
+def fit_width(width, height):
+    ratio = min(SLIDE_IMAGE_BOX[0] / float(width), SLIDE_IMAGE_BOX[1] / float(height))
+    return int(ratio * width)
+
+def derivative_params():
+    # 出力を作り直すかどうかの判定に含める、縮小コピーの設定
+    if not image_derivatives.derivatives_enabled():
+        return None
+    return {'box': SLIDE_IMAGE_BOX, 'jpeg_quality': image_derivatives.JPEG_QUALITY}
+
+def slide_images(dirname, min_size_kb=100, paper=None):
+    """
+    図のスライドにする画像の (パス, 幅, 高さ) のリストを返す。
+    half画像（ヘッダー画像は別のスライドにする）と min_size_kb 以下の画像は除く。
+    パスは表示サイズに縮小したコピー（image_derivatives）で、無効にした場合は元画像。
+    paper（read_paper の結果）に画像情報が記録されていれば、それを使って画像を開かずに済ませる。
+    """
+    images_dir = os.path.join(dirname, "images")
+    # image_meta（抽出時に記録した画像情報）がない古い記録では None
+    images = paper.get('image_meta') if paper is not None else None
+    if images is None:
+        if not os.path.exists(images_dir):
+            print("No images directory found, skipping additional images.")
+            return []
+        images = scan_images(images_dir)
+
+    # 画像ファイルサイズフィルタリング
+    valid_images = []
+    for img in images:
+        img_size_kb = img['bytes'] / 1024
+        print(f"Image: {img['file']}, Size: {img_size_kb:.2f} KB")
+
+        if img_size_kb > min_size_kb:
+            valid_images.append(img)
+
+    # 有効な画像がない場合の警告
+    if not valid_images:
+        print(f"Warning: No valid images found above {min_size_kb} KB")
+        return []
+    if not image_derivatives.derivatives_enabled():
+        results = []
+        for img in valid_images:
+            img_path = os.path.join(images_dir, img['file'])
+            if 'width' in img:
+                results.append((img_path, img['width'], img['height']))
+            else:
+                with Image.open(img_path) as image:
+                    results.append((img_path, *image.size))
+        return results
+    cache = image_derivatives.DerivativeCache(dirname, SLIDE_IMAGE_BOX)
+    try:
+        return [cache.get(os.path.join(images_dir, img['file']), digest=img.get('sha256'))
+                for img in valid_images]
+    finally:
+        cache.save()
+
+def make_md(dirname, filename=None, output_dir='./output_marp', min_size_kb=100):
     # dirname例: ユーザー指定ディレクトリ/xmls/(entry_id)
-    # filename: "paper.xml"
-    path = os.path.join(dirname, filename)
-    with open(path, "r", encoding="utf-8") as fin:
-        xml = fin.read()
-        print(f"Processing file: {filename}")
-
-    dict_data = xmltodict.parse(xml)['paper']
-    print(dict_data)
+    # filename: 互換のため残している（paper_record.load が paper.json を読む）
+    dict_data = read_paper(dirname, filename)
 
     # キーが存在しない場合のデフォルト値を設定
     title_jp = dict_data.get('title_jp', 'N/A')
@@ -77,66 +160,46 @@ def make_md(dirname, filename, output_dir='./output_marp', min_size_kb=100):
             print("No half_img_path or file not found, skipping half image.")
 
         # 画像処理
-        images_dir = os.path.join(dirname, "images")
-        if os.path.exists(images_dir):
-            images = [img for img in os.listdir(images_dir) if img.lower().endswith(('.png', '.jpg', '.jpeg'))]
-            # half.pngを除外（既に表示済）
-            if 'half.png' in images:
-                images.remove('half.png')
-
-            # 画像ファイルサイズフィルタリング
-            valid_images = []
-            for img in images:
-                img_path = os.path.join(images_dir, img)
-                img_size_kb = os.path.getsize(img_path) / 1024
-                print(f"Image: {img}, Size: {img_size_kb:.2f} KB")
-
-                if img_size_kb > min_size_kb:
-                    valid_images.append(img)
-
-            for img in valid_images:
-                img_path = os.path.join(images_dir, img)
-                relative_img_path = os.path.relpath(img_path, output_dir)
-                with Image.open(img_path) as image:
-                    width, height = image.size
-                    x_ratio = (1600.0 * 0.7) / float(width)
-                    y_ratio = (900.0 * 0.7) / float(height)
-                    ratio = min(x_ratio, y_ratio)
-                    resized_width = int(ratio * width)
-
-                    f.write("\n---\n")
-                    f.write('<!-- _class: info -->\n')
-                    f.write(f'![width:{resized_width}]({relative_img_path})\n')
-
-            # 有効な画像がない場合の警告
-            if not valid_images:
-                print(f"Warning: No valid images found above {min_size_kb} KB")
-        else:
-            print("No images directory found, skipping additional images.")
+        for img_path, width, height in slide_images(dirname, min_size_kb, paper=dict_data):
+            relative_img_path = os.path.relpath(img_path, output_dir)
+            f.write("\n---\n")
+            f.write('<!-- _class: info -->\n')
+            f.write(f'![width:{fit_width(width, height)}]({relative_img_path})\n')
 
     return output_path
 
-def convert_xmls_to_md(dir_path, output_dir='./output_marp', min_size_kb=100, timeout_sec=60, start_time=None):
+def convert_xmls_to_md(dir_path, output_dir='./output_marp', min_size_kb=100, timeout_sec=60, start_time=None,
+                       deadline=None, on_event=None):
     if start_time is None:
         start_time = time.time()
-
-    xml_files = glob.glob(os.path.join(dir_path, "*.xml"))
-
-    if not xml_files:
-        print(f"{dir_path} にXMLファイルが見つかりません。")
-        raise FileNotFoundError(f"{dir_path} にXMLファイルがありません。")
-
-    paper_xml_path = os.path.join(dir_path, "paper.xml")
-    if not os.path.exists(paper_xml_path):
-        print(f"{dir_path} にpaper.xmlが存在しません。")
-        raise FileNotFoundError(f"{dir_path} にpaper.xmlが存在しません。")
-
-    if (time.time() - start_time) > timeout_sec:
-        raise Exception("タイムアウトに達しました")
-
-    dirname, filename = os.path.split(paper_xml_path)
-    if (time.time() - start_time) > timeout_sec:
-        raise Exception("タイムアウトに達しました")
-
-    md_file = make_md(dirname, filename, output_dir=output_dir, min_size_kb=min_size_kb)
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+
+    # paper.json（古いディレクトリでは paper.xml）
+    record_path = paper_record.record_path(dir_path)
+    if not os.path.exists(record_path):
+        print(f"{dir_path} に{paper_record.RECORD_NAME}が存在しません。")
+        raise FileNotFoundError(f"{dir_path} に{paper_record.RECORD_NAME}が存在しません。")
+
+    deadline.check()
+
+    dirname = dir_path
+
+    # paper.jsonと画像が前回と同じなら、前回出力したMarkdownをそのまま使う
+    images = image_listing(dirname)
+    key = pipeline_manifest.stage_key(
+        'markdown', pipeline_manifest.file_hash(record_path),
+        os.path.abspath(output_dir), min_size_kb, images, derivative_params()
+    )
+    manifest = pipeline_manifest.Manifest(dirname)
+    deadline.check("Markdown生成")
+    with tracing.trace_run("convert_xmls_to_md"):
+        with tracing.span("convert_xmls_to_md", bytes_read=tracing.file_size(record_path),
+                          image_count=len(images)) as sp:
+            md_file = pipeline_manifest.run_stage(
+                manifest, 'markdown', key,
+                lambda: make_md(dirname, output_dir=output_dir, min_size_kb=min_size_kb),
+                outputs=lambda r: [r],
+                reporter=progress.Reporter(on_event)
+            )
+            sp.set(bytes_written=tracing.file_size(md_file))
     return md_file
\ No newline at end of file
@@ -0,0 +1,278 @@
+# mock_llm_server.py
+# OpenAI APIの代わりに使うローカルのモックサーバー
+# 応答遅延とレート制限(429)を再現し、ネットワークなしで要約処理を試せるようにする
+# Batch API（/v1/files, /v1/batches）の簡易的な代替も提供する
+#
+#   python mock_llm_server.py --port 8765 --latency 0.5 --rpm 60
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=dummy python batch_run.py ./papers
+import sys
+import json
+import time
+import threading
+import argparse
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_SUMMARY = """論文名:モック論文のタイトル
+キーワード:モック, テスト
+課題:モックサーバーが解決する課題
+手法:固定の応答を返す手法
+結果:ネットワークなしで動作を確認できた"""
+
+class MockState:
+    def __init__(self, latency=0.0, rpm=0, content=MOCK_SUMMARY, batch_delay=1.0, window=60.0):
+        """
+        rpm は window 秒あたりの許可リクエスト数（テストでは window を短くして429からの回復を確かめる）。
+        content は応答の文字列か、リクエストのbodyを受け取って文字列を返す関数。
+        """
+        self.latency = latency
+        self.rpm = rpm
+        self.window = window
+        self.content = content
+        self.batch_delay = batch_delay
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self):
+        # 直近 window 秒のリクエスト数がrpmを超えていれば待つべき秒数を返す
+        if not self.rpm:
+            return 0.0
+        now = time.monotonic()
+        with self.lock:
+            while self.request_times and now - self.request_times[0] > self.window:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.rpm:
+                self.rejected += 1
+                return self.window - (now - self.request_times[0])
+            self.request_times.append(now)
+        return 0.0
+
+def response_content(state, body):
+    if callable(state.content):
+        return state.content(body)
+    return state.content
+
+def make_completion(state, body):
+    messages = body.get('messages', [])
+    content = response_content(state, body)
+    prompt_tokens = sum(len(m.get('content', '')) // 2 for m in messages)
+    completion_tokens = len(content) // 2
+    return {
+        'id': f"chatcmpl-mock-{state.served}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'mock'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+def make_batch(batch_id, input_file_id):
+    now = int(time.time())
+    return {
+        'id': batch_id,
+        'object': 'batch',
+        'endpoint': '/v1/chat/completions',
+        'input_file_id': input_file_id,
+        'completion_window': '24h',
+        'status': 'validating',
+        'output_file_id': None,
+        'error_file_id': None,
+        'created_at': now,
+        'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+    }
+
+def advance_batch(state, batch):
+    # 投入から batch_delay 秒経過したら、入力ファイルの各行に応答を付けて完了にする
+    if batch['status'] in ('completed', 'failed', 'expired', 'cancelled'):
+        return batch
+    lines = [json.loads(l) for l in state.files[batch['input_file_id']]['data'].decode('utf-8').splitlines() if l.strip()]
+    batch['request_counts']['total'] = len(lines)
+    if time.time() - batch['created_at'] < state.batch_delay:
+        batch['status'] = 'in_progress'
+        return batch
+    # 呼び出し元でstate.lockを保持している
+    output = []
+    for req in lines:
+        state.served += 1
+        output.append(json.dumps({
+            'id': f"batch_req_{req['custom_id']}",
+            'custom_id': req['custom_id'],
+            'response': {'status_code': 200, 'request_id': req['custom_id'], 'body': make_completion(state, req['body'])},
+            'error': None,
+        }, ensure_ascii=False))
+    output_id = f"file-mock-{len(state.files)}"
+    state.files[output_id] = {'data': ('\n'.join(output) + '\n').encode('utf-8'), 'purpose': 'batch_output'}
+    batch['output_file_id'] = output_id
+    batch['status'] = 'completed'
+    batch['completed_at'] = int(time.time())
+    batch['request_counts']['completed'] = len(lines)
+    return batch
+
+def parse_multipart(content_type, raw):
+    msg = BytesParser(policy=email_policy).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + raw
+    )
+    fields = {}
+    for part in msg.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        fields[name] = part.get_payload(decode=True)
+    return fields
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _read_json(self):
+        return json.loads(self._read_body() or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, state, body):
+        # latency秒かけて数文字ずつSSEで送る
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        content = response_content(state, body)
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        delay = state.latency / max(1, len(pieces))
+        for i, piece in enumerate(pieces):
+            chunk = {
+                'id': f"chatcmpl-mock-{state.served}",
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'mock'),
+                'choices': [{
+                    'index': 0,
+                    'delta': {'role': 'assistant', 'content': piece} if i == 0 else {'content': piece},
+                    'finish_reason': None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        state = self.server.state
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 3 and parts[1] == 'batches' and parts[2] in state.batches:
+            with state.lock:
+                batch = advance_batch(state, state.batches[parts[2]])
+            self._send_json(200, batch)
+            return
+        if len(parts) == 4 and parts[1] == 'files' and parts[3] == 'content' and parts[2] in state.files:
+            data = state.files[parts[2]]['data']
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send_json(404, {'error': {'message': f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        state = self.server.state
+        path = self.path.rstrip('/')
+        if path.endswith('/files'):
+            fields = parse_multipart(self.headers.get('Content-Type', ''), self._read_body())
+            with state.lock:
+                file_id = f"file-mock-{len(state.files)}"
+                state.files[file_id] = {'data': fields.get('file') or b'', 'purpose': (fields.get('purpose') or b'').decode()}
+            self._send_json(200, {
+                'id': file_id, 'object': 'file', 'bytes': len(state.files[file_id]['data']),
+                'created_at': int(time.time()), 'filename': 'input.jsonl',
+                'purpose': state.files[file_id]['purpose'], 'status': 'processed',
+            })
+            return
+        body = self._read_json()
+        if path.endswith('/batches'):
+            with state.lock:
+                batch_id = f"batch_mock_{len(state.batches)}"
+                state.batches[batch_id] = make_batch(batch_id, body['input_file_id'])
+            self._send_json(200, state.batches[batch_id])
+            return
+        if path.endswith('/chat/completions'):
+            wait = state.admit()
+            if wait > 0:
+                self._send_json(429, {'error': {
+                    'message': 'Rate limit reached (mock)', 'type': 'requests', 'code': 'rate_limit_exceeded'
+                }}, headers={'Retry-After': f"{wait:.3f}"})
+                return
+            with state.lock:
+                state.served += 1
+            if body.get('stream'):
+                self._send_stream(state, body)
+                return
+            if state.latency:
+                time.sleep(state.latency)
+            self._send_json(200, make_completion(state, body))
+            return
+        self._send_json(404, {'error': {'message': f"unknown path {self.path}"}})
+
+def start_server(port=0, latency=0.0, rpm=0, content=MOCK_SUMMARY, batch_delay=1.0, window=60.0):
+    """
+    バックグラウンドスレッドでモックサーバーを起動し、serverを返す。
+    server.base_url をOpenAIクライアントの base_url に渡して使う。
+    停止するときは server.shutdown() を呼ぶ。
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(latency=latency, rpm=rpm, content=content, batch_delay=batch_delay, window=window)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI API互換のローカルモックサーバー")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="1リクエストあたりの応答遅延(秒)")
+    parser.add_argument('--rpm', type=int, default=0, help="1分あたりの許可リクエスト数（0で無制限）")
+    parser.add_argument('--batch-delay', type=float, default=5.0, help="バッチジョブが完了するまでの秒数")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(latency=args.latency, rpm=args.rpm, batch_delay=args.batch_delay)
+    print(f"モックサーバー起動: http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
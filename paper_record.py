@@ -0,0 +1,181 @@
+# paper_record.py
+# 論文ごとの中間データ（メタデータ・要約・画像情報）を xmls/<entry_id>/paper.json に保存・読み込みする。
+# 以前は dicttoxml + minidom で整形した paper.xml を書き、読むたびに xmltodict で解析していた。
+# 保存前にスキーマ（SCHEMA）を確認し、一時ファイルに書いてから置き換えるため、書きかけのファイルは残らない。
+# PAPER_XML_EXPORT=1 のときは paper.xml も書き出す（他のツール向け）。
+# paper.json がなく古い paper.xml だけがあるディレクトリは、読み込み時に変換して扱う。
+import os
+import copy
+import json
+
+RECORD_NAME = "paper.json"
+LEGACY_XML_NAME = "paper.xml"
+RECORD_VERSION = 1
+
+SUMMARY_FIELDS = ('title_jp', 'keywords', 'problem', 'method', 'result')
+# フィールド名: (型, 必須か)。必須でない項目は省略またはNoneにできる
+SCHEMA = {
+    'title': (str, True),
+    'authors': (list, True),
+    'abstract': (str, True),
+    'pdf': (str, True),
+    'image_count': (int, True),
+    'images': (list, True),
+    'image_meta': (list, False),
+    'half_img_path': (str, False),
+    'title_jp': (str, True),
+    'keywords': (str, True),
+    'problem': (str, True),
+    'method': (str, True),
+    'result': (str, True),
+    'query': (str, True),
+}
+# image_meta の各要素（query_gui.extract_images_from_pdf の画像情報）
+IMAGE_META_SCHEMA = {
+    'file': str,
+    'page': int,
+    'xref': int,
+    'width': int,
+    'height': int,
+    'bytes': int,
+    'sha256': str,
+}
+
+def xml_export_enabled():
+    return os.getenv("PAPER_XML_EXPORT", "0").strip().lower() in ("1", "true", "on", "yes")
+
+def record_path(dirpath):
+    # 読み込むファイルのパス。paper.json がなければ古い paper.xml
+    path = os.path.join(dirpath, RECORD_NAME)
+    if not os.path.exists(path):
+        legacy = os.path.join(dirpath, LEGACY_XML_NAME)
+        if os.path.exists(legacy):
+            return legacy
+    return path
+
+def exists(dirpath):
+    return os.path.exists(record_path(dirpath))
+
+def validate(paper, name=RECORD_NAME):
+    if not isinstance(paper, dict):
+        raise ValueError(f"{name} の形式が正しくありません: paper がオブジェクトではありません")
+    for field, (typ, required) in SCHEMA.items():
+        value = paper.get(field)
+        if value is None:
+            if required:
+                raise ValueError(f"{name} の形式が正しくありません: {field} がありません")
+            continue
+        # bool は int のサブクラスのため別に弾く
+        if not isinstance(value, typ) or isinstance(value, bool):
+            raise ValueError(f"{name} の形式が正しくありません: {field} の型が {typ.__name__} ではありません")
+    for item in paper.get('image_meta') or []:
+        for field, typ in IMAGE_META_SCHEMA.items():
+            if not isinstance(item.get(field), typ):
+                raise ValueError(f"{name} の形式が正しくありません: image_meta.{field} の型が {typ.__name__} ではありません")
+    return paper
+
+def save(dirpath, paper):
+    """
+    paper を検証して dirpath/paper.json に保存し、そのパスを返す。
+    PAPER_XML_EXPORT=1 なら paper.xml も書き出す。
+    """
+    validate(paper)
+    path = os.path.join(dirpath, RECORD_NAME)
+    text = json.dumps({'version': RECORD_VERSION, 'paper': paper}, ensure_ascii=False, separators=(',', ':'))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    if xml_export_enabled():
+        export_xml(paper, os.path.join(dirpath, LEGACY_XML_NAME))
+    return path
+
+def load(dirpath):
+    """
+    dirpath の paper.json を読み込み、検証済みの dict を返す。
+    paper.json がなく paper.xml がある場合はそれを変換して返す（ファイルは書き換えない）。
+    """
+    path = record_path(dirpath)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{dirpath} に{RECORD_NAME}が存在しません。")
+    if path.endswith(".xml"):
+        return validate(from_xml(path), LEGACY_XML_NAME)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    version = data.get('version') if isinstance(data, dict) else None
+    if version != RECORD_VERSION:
+        raise ValueError(f"{RECORD_NAME} のバージョン {version} には対応していません（対応: {RECORD_VERSION}）")
+    return validate(data.get('paper'))
+
+def load_many(dirpaths):
+    # 一覧表示やまとめての出力用。{dirpath: paper} を返し、読めないものは飛ばす
+    papers = {}
+    for dirpath in dirpaths:
+        try:
+            papers[dirpath] = load(dirpath)
+        except (OSError, ValueError) as e:
+            print(f"{dirpath} の読み込みに失敗: {e}")
+    return papers
+
+def _to_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def from_xml(path):
+    """
+    古い paper.xml（dicttoxml で書き出したもの）を paper.json と同じ形の dict に変換する。
+    xmltodict では値がすべて文字列になり、空の要素は None、要素が1つのリストは dict になる。
+    """
+    import xmltodict
+    with open(path, "r", encoding="utf-8") as f:
+        paper = xmltodict.parse(f.read()).get('paper') or {}
+
+    def text(key, default="N/A"):
+        value = paper.get(key)
+        return value if isinstance(value, str) else default
+
+    def items(value):
+        if isinstance(value, dict):
+            value = value.get('item')
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    authors = paper.get('authors')
+    images = paper.get('images')
+    image_meta = None
+    if 'image_meta' in paper:
+        image_meta = [
+            {
+                'file': item['file'],
+                'page': int(item['page']),
+                'xref': int(item['xref']),
+                'width': int(item['width']),
+                'height': int(item['height']),
+                'bytes': int(item['bytes']),
+                'sha256': item['sha256'],
+            }
+            for item in items(paper.get('image_meta'))
+        ]
+    record = {
+        'title': text('title', "Unknown"),
+        # 以前の書き出しでは文字列のリストは連結されていた
+        'authors': [authors] if isinstance(authors, str) else [a for a in items(authors) if isinstance(a, str)],
+        'abstract': text('abstract'),
+        'pdf': text('pdf', ""),
+        'image_count': _to_int(paper.get('image_count'), len(image_meta or [])),
+        'images': [images] if isinstance(images, str) else [i for i in items(images) if isinstance(i, str)],
+        'image_meta': image_meta,
+        'half_img_path': paper.get('half_img_path') if isinstance(paper.get('half_img_path'), str) else None,
+        'query': text('query'),
+    }
+    for field in SUMMARY_FIELDS:
+        record[field] = text(field)
+    return record
+
+def export_xml(paper, path):
+    # 従来の paper.xml と同じ形式で書き出す（dicttoxml + minidom）。save_as_xml は渡したdictを書き換えるためコピーを渡す
+    from query_gui import save_as_xml
+    save_as_xml({'paper': copy.deepcopy(paper)}, path)
@@ -0,0 +1,129 @@
+# pipeline_manifest.py
+# 論文ごとの処理状況を xmls/<entry_id>/manifest.json に記録し、
+# 入力（PDFの内容と各段階のパラメータ）が変わっていない段階を再実行しないようにする
+import os
+import json
+import time
+import hashlib
+import tracing
+import progress
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+STAGES = ('metadata', 'images', 'half_image', 'summary', 'record', 'markdown', 'pdf', 'pptx')
+
+def file_hash(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def stage_key(stage, *parts):
+    # 段階名と入力をまとめてハッシュ化する。datetime等はstrとして扱う
+    payload = json.dumps([stage, *parts], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _json_safe(value):
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+class Manifest:
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+        self.path = os.path.join(dirpath, MANIFEST_NAME)
+        self.data = {'version': MANIFEST_VERSION, 'source': None, 'stages': {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.data = data
+            except (OSError, ValueError):
+                # 壊れたマニフェストは無視して最初から処理する
+                pass
+
+    def source_hash(self, pdf_path):
+        """
+        入力PDFの内容ハッシュを返す。サイズと更新時刻が前回と同じなら、
+        ファイルを読み直さずに記録済みのハッシュを使う。
+        """
+        st = os.stat(pdf_path)
+        source = self.data.get('source') or {}
+        if (source.get('path') == os.path.abspath(pdf_path)
+                and source.get('size') == st.st_size
+                and source.get('mtime_ns') == st.st_mtime_ns
+                and source.get('sha256')):
+            return source['sha256']
+        digest = file_hash(pdf_path)
+        if source.get('sha256') != digest:
+            # 内容が変わった場合は全段階をやり直す
+            self.data['stages'] = {}
+        self.data['source'] = {
+            'path': os.path.abspath(pdf_path),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest,
+        }
+        self.save()
+        return digest
+
+    def is_fresh(self, stage, key):
+        entry = self.data['stages'].get(stage)
+        if not entry or entry.get('key') != key:
+            return False
+        return all(os.path.exists(p) for p in entry.get('outputs', []))
+
+    def result(self, stage):
+        return self.data['stages'][stage].get('result')
+
+    def outputs(self, stage):
+        entry = self.data['stages'].get(stage) or {}
+        return entry.get('outputs', [])
+
+    def record(self, stage, key, result=None, outputs=()):
+        self.data['stages'][stage] = {
+            'key': key,
+            'result': _json_safe(result),
+            'outputs': list(outputs),
+            'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self.save()
+
+    def invalidate(self, stage):
+        if self.data['stages'].pop(stage, None) is not None:
+            self.save()
+
+    def clear(self):
+        self.data['stages'] = {}
+        self.save()
+
+    def save(self):
+        # 書き込み途中で落ちても壊れたファイルが残らないよう、一時ファイルから置き換える
+        if not os.path.exists(self.dirpath):
+            os.makedirs(self.dirpath)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+def run_stage(manifest, stage, key, fn, outputs=None, reporter=None):
+    """
+    manifestに同じkeyの結果が残っていればそれを返し、なければ fn() を実行して記録する。
+    outputs(result) は出力ファイルのリストを返す関数で、いずれかが消えていれば再実行する。
+    reporter（progress.Reporter）を渡すと段階の開始・終了を通知する。
+    """
+    reporter = progress.ensure(reporter)
+    reporter.stage_started(stage)
+    with tracing.span(stage) as sp:
+        if manifest is not None and manifest.is_fresh(stage, key):
+            sp.set(skipped=True)
+            reporter.stage_finished(stage, skipped=True)
+            return manifest.result(stage)
+        result = fn()
+        if manifest is not None:
+            manifest.record(stage, key, result, outputs(result) if outputs else ())
+    reporter.stage_finished(stage)
+    return result
@@ -0,0 +1,190 @@
+# progress.py
+# 処理の進み具合を構造化したイベント（Event）として呼び出し元に伝える
+# process_pdf / convert_xmls_to_md / convert_xml_to_pptx / convert_md_to_pdf に on_event を渡すと、
+# 以下のイベントを受け取れる。GUIの進捗バー、batch_run の --progress の表示に使う。
+#   stage_started / stage_finished  段階の開始・終了（stage は pipeline_manifest.STAGES の名前、
+#                                   前回の結果を使った場合は skipped=True）
+#   page_scanned     画像抽出で current / total ページ目を調べ終えた
+#   image_accepted   画像を current 枚採用した（total は最大枚数）
+#   llm_request      要約APIにリクエストを送った（prompt_chars）
+#   tokens_received  要約のトークンを current 個受信した（token_interval 秒に1回に間引く）
+#   chunk_summarized 長文モード（long_summary.py）でチャンクを current / total 個要約した
+#   slide_built      スライドを current / total 枚作った（PPTX・PyMuPDFでのPDF出力）
+import time
+
+STAGE_LABELS = {
+    'metadata': "メタデータ取得",
+    'images': "画像抽出",
+    'half_image': "ヘッダー画像",
+    'summary': "要約",
+    'record': "中間データの保存",
+    'markdown': "Markdown生成",
+    'pdf': "PDF出力",
+    'pptx': "PPTX出力",
+}
+# 全体の進み具合を見積もるときの各段階の重み（おおよその所要時間の比）
+STAGE_WEIGHTS = {
+    'metadata': 1,
+    'images': 3,
+    'half_image': 1,
+    'summary': 12,
+    'record': 0.2,
+    'markdown': 0.5,
+    'pdf': 5,
+    'pptx': 2,
+}
+PDF_STAGES = ('metadata', 'images', 'half_image', 'summary', 'record')
+# 要約の応答のおおよそのトークン数（受信中の進み具合の見積もりに使う）
+EXPECTED_SUMMARY_TOKENS = 250
+# 長文モードで、チャンクの要約（map）が要約の段階に占める割合。残りはまとめ（reduce）の受信
+MAP_SHARE = 0.8
+
+class Event:
+    def __init__(self, kind, stage=None, current=None, total=None, **info):
+        self.kind = kind
+        self.stage = stage
+        self.current = current
+        self.total = total
+        self.info = info
+        self.time = time.time()
+
+    def describe(self):
+        # 表示用の短い説明（例: "画像抽出 3/12"）
+        label = STAGE_LABELS.get(self.stage, self.stage or "")
+        if self.kind == 'stage_finished':
+            return f"{label} 完了" + ("（前回の結果を使用）" if self.info.get('skipped') else "")
+        if self.kind == 'llm_request':
+            return f"{label} リクエスト送信"
+        if self.kind == 'tokens_received':
+            return f"{label} 受信中 {self.current}トークン"
+        if self.kind == 'chunk_summarized':
+            return f"{label} チャンク {self.current}/{self.total}"
+        if self.kind == 'image_accepted':
+            return f"{label} {self.current}枚採用"
+        if self.current is not None and self.total:
+            return f"{label} {self.current}/{self.total}"
+        return label
+
+    def __repr__(self):
+        return f"Event({self.kind!r}, {self.stage!r}, {self.current!r}, {self.total!r}, {self.info!r})"
+
+class Reporter:
+    """
+    on_event(Event) を呼ぶための小さなラッパー。on_event=None なら何もしない。
+    処理の各段階には deadline と同じく Reporter を渡す。
+    """
+    def __init__(self, on_event=None, token_interval=0.2):
+        self.on_event = on_event
+        self.token_interval = token_interval
+        self.token_count = 0
+        self.last_token_emit = 0.0
+
+    def enabled(self):
+        return self.on_event is not None
+
+    def emit(self, kind, stage=None, current=None, total=None, **info):
+        if self.on_event is not None:
+            self.on_event(Event(kind, stage, current, total, **info))
+
+    def stage_started(self, stage):
+        self.emit('stage_started', stage)
+
+    def stage_finished(self, stage, skipped=False):
+        self.emit('stage_finished', stage, skipped=skipped)
+
+    def tokens(self, stage='summary'):
+        # トークンごとに通知すると多すぎるため間引く（最初の1個は必ず通知する）
+        self.token_count += 1
+        if self.on_event is None:
+            return
+        now = time.time()
+        if self.token_count == 1 or now - self.last_token_emit >= self.token_interval:
+            self.last_token_emit = now
+            self.emit('tokens_received', stage, self.token_count)
+
+def ensure(reporter):
+    # reporter が渡されなければ何もしない Reporter を返す
+    if reporter is None:
+        return Reporter()
+    return reporter
+
+class Tracker:
+    """
+    イベントから全体の進み具合(0〜1)と残り時間を見積もる。
+    stages は実行する予定の段階。前回の結果を使った段階は重みから除く
+    （一瞬で終わるため、含めると残り時間を短く見積もってしまう）。
+    """
+    def __init__(self, stages=PDF_STAGES, weights=STAGE_WEIGHTS):
+        self.weights = {stage: weights.get(stage, 1) for stage in stages}
+        self.done = set()
+        self.current_stage = None
+        self.stage_fraction = 0.0
+        self.started_at = None
+        self.last_event = None
+
+    def update(self, event):
+        if self.started_at is None:
+            self.started_at = event.time
+        self.last_event = event
+        stage = event.stage
+        if stage not in self.weights:
+            return
+        if event.kind == 'stage_started':
+            self.current_stage = stage
+            self.stage_fraction = 0.0
+        elif event.kind == 'stage_finished':
+            if event.info.get('skipped'):
+                self.weights.pop(stage)
+            else:
+                self.done.add(stage)
+            if self.current_stage == stage:
+                self.current_stage = None
+        elif event.kind == 'tokens_received':
+            # 長文モードではチャンクの要約が終わった後に受信が始まるため、進み具合を戻さない
+            self.stage_fraction = max(self.stage_fraction, min(0.95, event.current / EXPECTED_SUMMARY_TOKENS))
+        elif event.kind == 'chunk_summarized' and event.total:
+            self.stage_fraction = MAP_SHARE * event.current / event.total
+        elif event.kind in ('page_scanned', 'slide_built') and event.total:
+            self.stage_fraction = min(1.0, event.current / event.total)
+
+    def fraction(self):
+        total = sum(self.weights.values())
+        if total <= 0:
+            # すべての段階で前回の結果を使った
+            return 1.0
+        finished = sum(w for stage, w in self.weights.items() if stage in self.done)
+        if self.current_stage in self.weights and self.current_stage not in self.done:
+            finished += self.weights[self.current_stage] * self.stage_fraction
+        return min(1.0, finished / total)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return time.time() - self.started_at
+
+    def eta(self, elapsed=None):
+        """
+        ここまでの速さで残りが進むとした残り秒数。進み具合が小さいうちは見積もらずNoneを返す。
+        elapsed を渡すと最初のイベントからの経過時間の代わりに使う（GUIでタイトル編集の待ち時間を除くため）。
+        """
+        fraction = self.fraction()
+        if fraction < 0.02:
+            return None
+        if fraction >= 1.0:
+            return 0.0
+        if elapsed is None:
+            elapsed = self.elapsed()
+        return elapsed * (1 - fraction) / fraction
+
+    def describe(self):
+        if self.last_event is None:
+            return ""
+        return self.last_event.describe()
+
+def format_eta(seconds):
+    if seconds is None:
+        return "残り時間を計算中"
+    seconds = int(round(seconds))
+    if seconds >= 60:
+        return f"残り約 {seconds // 60}分{seconds % 60:02d}秒"
+    return f"残り約 {seconds}秒"
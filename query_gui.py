@@ -1,13 +1,25 @@
 import os
 import time
+import datetime
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import fitz  # PyMuPDF
 from xml.dom import minidom
 import dicttoxml
-from PyPDF2 import PdfReader
 from dotenv import load_dotenv
 from PIL import Image
-import io
 import openai
+import httpx
+import summary_cache
+import image_hash
+import pipeline_manifest
+import paper_record
+import tracing
+import text_select
+import long_summary
+import deadline as deadline_mod
+import progress
 
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
@@ -21,52 +33,223 @@ prompt = """与えられた論文の要点をまとめ、以下の項目で日
 結果:提案手法によって得られた結果
 ```"""
 
-def get_summary(metadata):
+MODEL = 'gpt-4o'
+TEMPERATURE = 0.25
+
+SUMMARY_FIELDS = ['title_jp', 'keywords', 'problem', 'method', 'result']
+
+def parse_summary_line(line):
+    # 1行分の出力から (フィールド名, 値) を取り出す。該当しない行はNone
+    if line.startswith("論文名"):
+        return 'title_jp', line[4:].strip()
+    elif line.startswith("キーワード"):
+        return 'keywords', line[6:].strip()
+    elif line.startswith("課題"):
+        return 'problem', line[3:].strip()
+    elif line.startswith("手法"):
+        return 'method', line[3:].strip()
+    elif line.startswith("結果"):
+        return 'result', line[3:].strip()
+    return None
+
+def parse_summary(summary):
+    summary_dict = {}
+    for line in summary.split('\n'):
+        parsed = parse_summary_line(line)
+        if parsed:
+            summary_dict[parsed[0]] = parsed[1]
+
+    # Check for missing fields
+    for field in SUMMARY_FIELDS:
+        if field not in summary_dict:
+            summary_dict[field] = "N/A"
+    return summary_dict
+
+def build_summary_text(metadata):
     title = metadata['title']
     if isinstance(title, list):
         title = ''.join(title)
 
-    text = f"title: {title}\nbody: {metadata.get('abstract', 'N/A')}"
-    
-    # 新しいAPIの使用方法に変更
-    client = openai.OpenAI()
-    response = client.chat.completions.create(
-                model='gpt-4o',
-                messages=[
-                    {'role': 'system', 'content': prompt},
-                    {'role': 'user', 'content': text}
-                ],
-                temperature=0.25,
+    return f"title: {title}\nbody: {metadata.get('abstract', 'N/A')}"
+
+def build_messages(text):
+    return [
+        {'role': 'system', 'content': prompt},
+        {'role': 'user', 'content': text}
+    ]
+
+def lookup_summary_cache(text, use_cache=None):
+    # 同じ入力に対する要約はキャッシュから返す（SUMMARY_CACHE=0 または use_cache=False で無効）
+    if use_cache is None:
+        use_cache = summary_cache.cache_enabled()
+    cache = summary_cache.get_default_cache() if use_cache else None
+    cache_key = summary_cache.make_key(MODEL, prompt, TEMPERATURE, text)
+    cached = cache.get(cache_key) if cache is not None else None
+    return cache, cache_key, (cached['summary'] if cached is not None else None)
+
+_sync_client = None
+_sync_client_key = None
+
+def get_openai_client():
+    # 呼び出しごとにクライアントを作るとTLS接続を毎回張り直すため、APIキーが変わるまで使い回す
+    global _sync_client, _sync_client_key
+    api_key = os.getenv('OPENAI_API_KEY')
+    if _sync_client is None or _sync_client_key != api_key:
+        _sync_client = openai.OpenAI()
+        _sync_client_key = api_key
+    return _sync_client
+
+def get_summary(metadata, use_cache=None, on_field=None, on_progress=None, idle_timeout=None, deadline=None,
+                reporter=None):
+    """
+    on_field(field, value) を渡すとストリーミングで受信し、各項目の行が
+    揃った時点で通知する。on_progress() はトークンを受信するたびに呼ばれる。
+    idle_timeout は受信が途切れてからの待ち時間で、全体の処理時間ではない。
+    deadline（deadline.Deadline）を渡すと、HTTPのタイムアウトを残り時間以内に抑え、
+    キャンセルされた時点で受信を打ち切る。
+    reporter（progress.Reporter）を渡すとリクエストの送信とトークンの受信を通知する。
+    """
+    text = build_summary_text(metadata)
+    reporter = progress.ensure(reporter)
+    if reporter.enabled():
+        user_progress = on_progress
+
+        def on_progress():
+            reporter.tokens()
+            if user_progress is not None:
+                user_progress()
+
+    with tracing.span("get_summary", cat='llm', model=MODEL, prompt_chars=len(text)) as sp:
+        cache, cache_key, cached = lookup_summary_cache(text, use_cache)
+        if cached is not None:
+            sp.set(cache_hit=True)
+            if on_field is not None:
+                for field in SUMMARY_FIELDS:
+                    on_field(field, cached.get(field, "N/A"))
+            return cached
+
+        # 新しいAPIの使用方法に変更
+        client = get_openai_client()
+        if deadline is not None and deadline.remaining() is not None:
+            # SDKの自動再試行は1回ごとにタイムアウトを使い直すため、期限がある場合は再試行しない
+            client = client.with_options(max_retries=0)
+        reporter.emit('llm_request', 'summary', prompt_chars=len(text))
+        if on_field is None and on_progress is None:
+            if deadline is not None:
+                idle_timeout = deadline.timeout(idle_timeout, stage="要約")
+            response = client.chat.completions.create(
+                        model=MODEL,
+                        messages=build_messages(text),
+                        temperature=TEMPERATURE,
+                        timeout=idle_timeout if idle_timeout is not None else openai.NOT_GIVEN,
+                    )
+
+            summary = response.choices[0].message.content
+            if response.usage is not None:
+                sp.set(prompt_tokens=response.usage.prompt_tokens,
+                       completion_tokens=response.usage.completion_tokens)
+        else:
+            summary = stream_summary(client, text, on_field=on_field, on_progress=on_progress,
+                                     idle_timeout=idle_timeout, deadline=deadline)
+        sp.set(completion_chars=len(summary or ""))
+
+    summary_dict = parse_summary(summary)
+    if cache is not None:
+        cache.put(cache_key, summary_dict, raw=summary)
+    return summary_dict
+
+def stream_summary(client, text, on_field=None, on_progress=None, idle_timeout=None, deadline=None):
+    # 読み取りタイムアウトはチャンク間の待ち時間に適用されるため、
+    # 生成が遅くても受信が続いている限り打ち切られない
+    if deadline is not None:
+        idle_timeout = deadline.timeout(idle_timeout, stage="要約")
+    timeout = openai.NOT_GIVEN
+    if idle_timeout is not None:
+        timeout = httpx.Timeout(idle_timeout, connect=min(idle_timeout, 10.0))
+    stream = client.chat.completions.create(
+                model=MODEL,
+                messages=build_messages(text),
+                temperature=TEMPERATURE,
+                stream=True,
+                timeout=timeout,
             )
 
+    parts = []
+    pending = ""
+    with tracing.span("stream_summary", cat='llm') as sp:
+        try:
+            for chunk in stream:
+                if deadline is not None:
+                    deadline.check("要約")
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not delta:
+                    continue
+                parts.append(delta)
+                if on_progress is not None:
+                    on_progress()
+                pending += delta
+                # 改行まで届いた行から順に項目を取り出す
+                while '\n' in pending:
+                    line, pending = pending.split('\n', 1)
+                    parsed = parse_summary_line(line)
+                    if parsed and on_field is not None:
+                        on_field(*parsed)
+        finally:
+            stream.close()
+            # ストリーミングでは1チャンクがおおよそ1トークンに相当する
+            sp.set(completion_chunks=len(parts))
+
+    parsed = parse_summary_line(pending)
+    if parsed and on_field is not None:
+        on_field(*parsed)
+    return "".join(parts)
+
+async def get_summary_async(metadata, client, use_cache=None):
+    """
+    llm_client.AsyncLLMClient を使う get_summary の非同期版。
+    複数の論文をまとめて要約するときに使う。
+    """
+    text = build_summary_text(metadata)
+
+    cache, cache_key, cached = lookup_summary_cache(text, use_cache)
+    if cached is not None:
+        return cached
+
+    response = await client.chat(build_messages(text), model=MODEL, temperature=TEMPERATURE)
     summary = response.choices[0].message.content
 
-    summary_dict = {}
-    for line in summary.split('\n'):
-        if line.startswith("論文名"):
-            summary_dict['title_jp'] = line[4:].strip()
-        elif line.startswith("キーワード"):
-            summary_dict['keywords'] = line[6:].strip()
-        elif line.startswith("課題"):
-            summary_dict['problem'] = line[3:].strip()
-        elif line.startswith("手法"):
-            summary_dict['method'] = line[3:].strip()
-        elif line.startswith("結果"):
-            summary_dict['result'] = line[3:].strip()
-
-    # Check for missing fields
-    required_fields = ['title_jp', 'keywords', 'problem', 'method', 'result']
-    for field in required_fields:
-        if field not in summary_dict:
-            summary_dict[field] = "N/A"
+    summary_dict = parse_summary(summary)
+    if cache is not None:
+        cache.put(cache_key, summary_dict, raw=summary)
     return summary_dict
 
+def get_summaries(metadata_list, use_cache=None, **client_kwargs):
+    """
+    複数のメタデータを並行して要約する。戻り値は入力と同じ順序のリストで、
+    失敗した要素には例外オブジェクトが入る。
+    """
+    import asyncio
+    import llm_client
+
+    async def run():
+        async with llm_client.AsyncLLMClient(**client_kwargs) as client:
+            return await asyncio.gather(
+                *[get_summary_async(m, client, use_cache=use_cache) for m in metadata_list],
+                return_exceptions=True
+            )
+
+    return asyncio.run(run())
+
 def recoverpix(doc, item):
     xref = item[0]
     smask = item[1]
 
     if smask > 0:
-        pix0 = fitz.Pixmap(doc.extract_image(xref)["image"])
+        # 元画像は一度だけ取り出し、マスク合成に失敗した場合もそれを使い回す
+        base_image = doc.extract_image(xref)["image"]
+        pix0 = fitz.Pixmap(base_image)
         if pix0.alpha:
             pix0 = fitz.Pixmap(pix0, 0)
         mask = fitz.Pixmap(doc.extract_image(smask)["image"])
@@ -74,7 +257,7 @@ def recoverpix(doc, item):
         try:
             pix = fitz.Pixmap(pix0, mask)
         except:
-            pix = fitz.Pixmap(doc.extract_image(xref)["image"])
+            pix = fitz.Pixmap(base_image)
 
         ext = "pam" if pix0.n > 3 else "png"
         return {"ext": ext, "colorspace": pix.colorspace.n, "image": pix.tobytes(ext)}
@@ -86,65 +269,292 @@ def recoverpix(doc, item):
 
     return doc.extract_image(xref)
 
-def extract_images_from_pdf(pdf_path, imgdir="./output", min_width=400, min_height=400, relsize=0.05, abssize=2048, max_ratio=8, max_num=5):
+def raw_stream_length(doc, xref):
+    # デコードせずにストリームの長さを調べる（/Length が間接参照の場合のみ実データを読む）
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == 'int':
+        return int(value)
+    return len(doc.xref_stream_raw(xref) or b'')
+
+def iter_page_images(doc, pno, min_width=400, min_height=400, abssize=2048, max_ratio=8, seen=None, phash=False):
+    """
+    1ページ分の画像のうち条件を満たすものを (xref, ext, width, height, data, signature) で順に返す。
+    寸法・縦横比・ストリーム長の安価な条件で先に絞り込み、残ったものだけデコードする。
+    seen を渡すと、そこに含まれるxrefは飛ばし、調べたxrefを追加する。
+    phash=True なら知覚ハッシュと縮小画像 image_hash.signature_from_bytes も計算する（Falseの場合はNone）。
+    """
+    for img in doc.get_page_images(pno):
+        xref = img[0]
+        if seen is not None:
+            if xref in seen:
+                continue
+            seen.add(xref)
+        width = img[2]
+        height = img[3]
+        if width < min_width and height < min_height:
+            continue
+        if width == 0 or height == 0:
+            continue
+        if width / height > max_ratio or height / width > max_ratio:
+            continue
+        if raw_stream_length(doc, xref) <= abssize and img[1] == 0:
+            continue
+
+        image = recoverpix(doc, img)
+        imgdata = image["image"]
+        if len(imgdata) <= abssize:
+            continue
+        yield xref, image["ext"], width, height, imgdata, (image_hash.signature_from_bytes(imgdata) if phash else None)
+
+_worker_local = threading.local()
+
+def _worker_doc(pdf_path):
+    # ワーカー（スレッド/プロセス）ごとにドキュメントを1つずつ開いて使い回す
+    docs = getattr(_worker_local, 'docs', None)
+    if docs is None:
+        docs = _worker_local.docs = {}
+    if pdf_path not in docs:
+        docs[pdf_path] = open_pdf(pdf_path) or fitz.open(pdf_path)
+    return docs[pdf_path]
+
+def _scan_page(pdf_path, pno, filters):
+    doc = _worker_doc(pdf_path)
+    return list(iter_page_images(doc, pno, seen=set(), **filters))
+
+def extract_images_from_pdf(pdf_path, imgdir="./output", min_width=400, min_height=400, relsize=0.05, abssize=2048, max_ratio=8, max_num=5, doc=None,
+                            workers=1, executor="thread", dedup_distance=image_hash.DEFAULT_MAX_DISTANCE, deadline=None,
+                            reporter=None):
+    """
+    workers > 1 の場合はページをスレッド（executor="process" ならプロセス）に振り分けて並列に処理する。
+    いずれの場合もページ順に採用し、max_num 枚に達した時点で残りのページは処理しない。
+    dedup_distance は知覚ハッシュのハミング距離の閾値で、これ以下でかつ縮小画像も近い画像は重複として
+    書き出さない（Noneで無効）。ロゴや同じ図の再掲が max_num 枚の枠を使わないようにする。
+    deadline を渡すと、ページごとに期限切れ・キャンセルを確認して打ち切る。
+    reporter（progress.Reporter）を渡すと、ページを調べ終えるごとと画像を採用するごとに通知する。
+    戻り値は (xrefのリスト, 画像情報のリスト)。画像情報は書き出したファイルの
+    file（ファイル名）・page・xref・width・height・bytes・sha256 で、paper.json に記録して
+    make_md が画像を開き直さずに済むようにする。
+    """
     if not os.path.exists(imgdir):
         os.makedirs(imgdir)
 
     t0 = time.time()
-    doc = fitz.open(pdf_path)
+    reporter = progress.ensure(reporter)
+    own_doc = doc is None
+    if own_doc:
+        doc = fitz.open(pdf_path)
     page_count = doc.page_count
+    filters = {
+        'min_width': min_width,
+        'min_height': min_height,
+        'abssize': abssize,
+        'max_ratio': max_ratio,
+        'phash': dedup_distance is not None,
+    }
 
     xreflist = []
     images = []
-    for pno in range(page_count):
-        if len(images) >= max_num:
-            break
-        il = doc.get_page_images(pno)
-        for img in il:
-            xref = img[0]
-            if xref in xreflist:
-                continue
-            width = img[2]
-            height = img[3]
-            if width < min_width and height < min_height:
-                continue
-            image = recoverpix(doc, img)
-
-            imgdata = image["image"]
-
-            if len(imgdata) <= abssize:
-                continue
-
-            if width / height > max_ratio or height/width > max_ratio:
-                continue
-
-            imgname = f"img{pno+1:02d}_{xref:05d}.{image['ext']}"
-            images.append((imgname, pno+1, width, height))
-            imgfile = os.path.join(imgdir, imgname)
-            with open(imgfile, "wb") as fout:
-                fout.write(imgdata)
-            xreflist.append(xref)
-
+    seen = set()
+    hash_index = image_hash.HashIndex(dedup_distance) if dedup_distance is not None else None
+
+    def accept(pno, xref, ext, width, height, imgdata, signature):
+        if hash_index is not None:
+            phash, thumb = signature
+            if hash_index.find(phash, thumb) is not None:
+                return False
+            hash_index.add(phash, xref, thumb)
+        imgname = f"img{pno+1:02d}_{xref:05d}.{ext}"
+        images.append({
+            'file': imgname,
+            'page': pno+1,
+            'xref': xref,
+            'width': width,
+            'height': height,
+            'bytes': len(imgdata),
+            'sha256': hashlib.sha256(imgdata).hexdigest(),
+        })
+        imgfile = os.path.join(imgdir, imgname)
+        with open(imgfile, "wb") as fout:
+            fout.write(imgdata)
+        sp.add('bytes_written', len(imgdata))
+        xreflist.append(xref)
+        reporter.emit('image_accepted', 'images', len(images), max_num)
+        return len(images) >= max_num
+
+    try:
+        with tracing.span("extract_images_from_pdf", pages=page_count, workers=workers) as sp:
+            if workers <= 1 or page_count <= 1:
+                done = max_num <= 0
+                for pno in range(page_count):
+                    if done:
+                        break
+                    if deadline is not None:
+                        deadline.check("画像抽出")
+                    for xref, ext, width, height, imgdata, signature in iter_page_images(doc, pno, seen=seen, **filters):
+                        if accept(pno, xref, ext, width, height, imgdata, signature):
+                            done = True
+                            break
+                    reporter.emit('page_scanned', 'images', pno + 1, page_count)
+            else:
+                extract_images_parallel(pdf_path, page_count, filters, accept, seen, workers, executor, deadline,
+                                        reporter)
+            sp.set(image_count=len(images))
+    finally:
+        if own_doc:
+            doc.close()
     t1 = time.time()
     return xreflist, images
 
-def get_half(fname, imgdir):
-    pdf_file = fitz.open(fname)
-    page = pdf_file[0]
-    mat = fitz.Matrix(2, 2)
-    pix = page.get_pixmap(matrix=mat)
-    im = Image.open(io.BytesIO(pix.tobytes()))
-    width, height = im.size
-    box = (0, height // 20, width, (height // 2) + (height // 20))
-    im_cropped = im.crop(box)
-    half_img_path = os.path.join(imgdir, "half.png")
-    im_cropped.save(half_img_path, "PNG")
+def extract_images_parallel(pdf_path, page_count, filters, accept, seen, workers, executor="thread", deadline=None,
+                            reporter=None):
+    reporter = progress.ensure(reporter)
+    # 先読みするページ数を制限し、デコード済みの画像を溜め込みすぎないようにする
+    window = workers * 2
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    pool = pool_class(max_workers=workers)
+    try:
+        futures = {}
+        next_pno = 0
+        for pno in range(page_count):
+            if deadline is not None:
+                deadline.check("画像抽出")
+            while next_pno < page_count and next_pno < pno + window:
+                futures[next_pno] = pool.submit(_scan_page, pdf_path, next_pno, filters)
+                next_pno += 1
+            for xref, ext, width, height, imgdata, signature in futures.pop(pno).result():
+                # 別ページで既に出現したxrefは採用しない
+                if xref in seen:
+                    continue
+                seen.add(xref)
+                if accept(pno, xref, ext, width, height, imgdata, signature):
+                    return
+            reporter.emit('page_scanned', 'images', pno + 1, page_count)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def get_half(fname, imgdir, doc=None, dpi=144, fmt="png", max_width=None, quality=85):
+    """
+    1ページ目の上半分（上端1/20を除く）を切り出した画像を保存する。
+    ページ全体を描画してから切り抜くのではなく、対象範囲だけを直接描画して一度だけエンコードする。
+    fmt は "png" / "jpg" / "webp"。max_width を指定すると、その幅に収まる解像度で描画する。
+    """
+    own_doc = doc is None
+    if own_doc:
+        doc = fitz.open(fname)
+    page = doc[0]
+    rect = page.rect
+    clip = fitz.Rect(
+        rect.x0,
+        rect.y0 + rect.height / 20,
+        rect.x1,
+        rect.y0 + rect.height / 2 + rect.height / 20
+    )
+    zoom = dpi / 72.0
+    if max_width:
+        zoom = min(zoom, max_width / clip.width)
+    with tracing.span("render_half", fmt=fmt) as sp:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+
+        fmt = fmt.lower()
+        ext = "jpg" if fmt in ("jpg", "jpeg") else fmt
+        half_img_path = os.path.join(imgdir, f"half.{ext}")
+        if ext == "png":
+            pix.save(half_img_path)
+        elif ext == "jpg":
+            pix.save(half_img_path, jpg_quality=quality)
+        elif ext == "webp":
+            # PyMuPDFはWebPを書き出せないため、描画済みの画素からPILで直接エンコードする
+            im = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            im.save(half_img_path, "WEBP", quality=quality)
+        else:
+            raise ValueError(f"未対応の画像形式です: {fmt}")
+        if tracing.enabled():
+            sp.set(width=pix.width, height=pix.height, bytes_written=tracing.file_size(half_img_path))
+    if own_doc:
+        doc.close()
     return half_img_path
 
-def get_metadata_from_pdf(pdf_path):
+def open_pdf(pdf_path):
+    """
+    PyMuPDFでPDFを一度だけ開く。メタデータ・本文・画像・1ページ目の描画は
+    このドキュメントを共有して行う。開けない場合はNoneを返す。
+    """
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception:
+        return None
+    if doc.needs_pass and not doc.authenticate(''):
+        doc.close()
+        return None
+    return doc
+
+def _parse_pdf_date(value):
+    # "D:20240101120000+09'00'" 形式をdatetimeに変換（PyPDF2と同じ型に揃える）
+    if not value:
+        return None
+    raw = value[2:] if value.startswith('D:') else value
+    digits = ''.join(ch for ch in raw[:14] if ch.isdigit())
+    for fmt in ('%Y%m%d%H%M%S', '%Y%m%d%H%M', '%Y%m%d', '%Y%m', '%Y'):
+        try:
+            return datetime.datetime.strptime(digits, fmt)
+        except ValueError:
+            continue
+    return value
+
+def get_metadata_from_pdf(pdf_path, doc=None):
     if not os.path.exists(pdf_path):
         return None
 
+    own_doc = doc is None
+    if own_doc:
+        doc = open_pdf(pdf_path)
+    if doc is None:
+        # PyMuPDFで開けない場合のみPyPDF2にフォールバック
+        return _get_metadata_with_pypdf2(pdf_path)
+
+    try:
+        info = doc.metadata or {}
+        metadata = {}
+
+        metadata['title'] = info.get('title') or "Unknown"
+        metadata['authors'] = info['author'].split(',') if info.get('author') else ["Unknown"]
+        metadata['subject'] = info.get('subject') or "N/A"
+        if info.get('producer'):
+            metadata['producer'] = info['producer']
+        creation_date = _parse_pdf_date(info.get('creationDate'))
+        if creation_date:
+            metadata['creation_date'] = creation_date
+        mod_date = _parse_pdf_date(info.get('modDate'))
+        if mod_date:
+            metadata['mod_date'] = mod_date
+
+        if text_select.selection_enabled():
+            # Abstract / Introduction / Conclusion をトークン数の上限まで選ぶ（text_select.py）
+            with tracing.span("select_text", pages=doc.page_count) as sp:
+                text, select_info = text_select.select_text(doc, MODEL)
+                sp.set(chars=len(text), **select_info)
+            metadata['abstract'] = text
+            metadata['text_sections'] = select_info['sections']
+            metadata['text_tokens'] = select_info['tokens']
+        else:
+            with tracing.span("extract_text", pages=min(3, doc.page_count)) as sp:
+                text = ""
+                for page_num in range(min(3, doc.page_count)):
+                    page_text = doc[page_num].get_text()
+                    if page_text:
+                        text += page_text
+                sp.set(chars=len(text))
+            metadata['abstract'] = text[:2000]
+        metadata['pdf_path'] = pdf_path
+    finally:
+        if own_doc:
+            doc.close()
+
+    return metadata
+
+def _get_metadata_with_pypdf2(pdf_path):
+    from PyPDF2 import PdfReader
+
     with open(pdf_path, "rb") as f:
         reader = PdfReader(f)
 
@@ -172,7 +582,11 @@ def get_metadata_from_pdf(pdf_path):
             page_text = reader.pages[page_num].extract_text()
             if page_text:
                 text += page_text
-        metadata['abstract'] = text[:2000]
+        if text_select.selection_enabled():
+            # 節の位置が分からないため、先頭からトークン数の上限まで使う
+            metadata['abstract'] = text_select.truncate_to_tokens(text, text_select.token_budget(), MODEL)
+        else:
+            metadata['abstract'] = text[:2000]
         metadata['pdf_path'] = pdf_path
 
         return metadata
@@ -198,15 +612,67 @@ def convert_lists_to_strings(d):
     return d
 
 def save_as_xml(data, filepath):
-    data = convert_lists_to_strings(data)
-    xml_content = dicttoxml.dicttoxml(data, attr_type=False, root=False).decode('utf-8')
-    pretty_xml = minidom.parseString(xml_content).toprettyxml(indent="   ")
-    with open(filepath, "w") as xml_file:
-        xml_file.write(pretty_xml)
-
-def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None):
+    with tracing.span("save_as_xml") as sp:
+        data = convert_lists_to_strings(data)
+        xml_content = dicttoxml.dicttoxml(data, attr_type=False, root=False).decode('utf-8')
+        pretty_xml = minidom.parseString(xml_content).toprettyxml(indent="   ")
+        with open(filepath, "w") as xml_file:
+            xml_file.write(pretty_xml)
+        sp.set(bytes_written=len(pretty_xml.encode('utf-8')))
+
+# extract_images_from_pdf に渡す条件（manifestのキーにも含める）
+IMAGE_PARAMS = {
+    'min_width': 400,
+    'min_height': 400,
+    'abssize': 2048,
+    'max_ratio': 8,
+    'max_num': 5,
+    'dedup_distance': image_hash.DEFAULT_MAX_DISTANCE,
+}
+# メタデータ・本文の取り出し方を変えたら上げる（manifestの再実行判定用）
+METADATA_VERSION = 2
+# extract_images_from_pdf の戻り値（画像情報）の形式を変えたら上げる
+IMAGES_VERSION = 2
+
+def text_selection_params():
+    # 要約に使う本文の選び方（変わったらメタデータを取り直す）
+    if not text_select.selection_enabled():
+        return None
+    return {'budget': text_select.token_budget(), 'model': MODEL}
+
+def summary_stage_key(metadata, pdf_hash):
+    # 要約段階のキー（batch_run の sync モードも親プロセスでの要約に同じキーを使う）
+    return pipeline_manifest.stage_key(
+        'summary', MODEL, prompt, TEMPERATURE, build_summary_text(metadata),
+        # 長文モードではPDFの本文全体とチャンクの分け方も入力になる
+        [pdf_hash, long_summary.MAP_PROMPT, long_summary.chunk_params()] if long_summary.long_summary_enabled() else None
+    )
+
+def entry_id_for(pdf_file):
+    # 論文ごとの作業ディレクトリ名（xmls/<entry_id>）。PDFのファイル名から拡張子と空白を除いたもの
+    entry_id = os.path.splitext(os.path.basename(pdf_file))[0]
+    return entry_id.replace(' ', '_')
+
+def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None, summarize=True,
+                on_field=None, on_progress=None, force=False, deadline=None, on_event=None):
+    """
+    force=False の場合、xmls/<entry_id>/manifest.json を見て、
+    入力PDFとパラメータが前回と同じ段階は実行せずに前回の結果を使う。
+    TRACE_DIR が設定されていれば、各段階のトレースを出力する（tracing.py）。
+    deadline（deadline.Deadline）を渡さない場合は timeout_sec / start_time から作る。
+    期限切れ・キャンセル時は段階の合間や画像抽出のページごとに例外で打ち切る。
+    on_event(progress.Event) を渡すと、段階の開始・終了、画像抽出のページ、
+    要約のリクエスト送信とトークン受信を通知する（progress.py）。
+    """
+    with tracing.trace_run("process_pdf_" + os.path.splitext(os.path.basename(pdf_file))[0]):
+        with tracing.span("process_pdf", pdf=pdf_file, bytes_read=tracing.file_size(pdf_file)):
+            return _process_pdf(pdf_file, dir, timeout_sec, start_time, summarize, on_field, on_progress, force, deadline,
+                                progress.Reporter(on_event))
+
+def _process_pdf(pdf_file, dir, timeout_sec, start_time, summarize, on_field, on_progress, force, deadline, reporter):
     if start_time is None:
         start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
 
     if not os.path.exists(dir):
         os.makedirs(dir)
@@ -214,13 +680,7 @@ def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None):
     # dir自体にもスペースがあれば置換する
     dir = dir.replace(' ', '_')
 
-    metadata = get_metadata_from_pdf(pdf_file)
-    if metadata is None:
-        raise ValueError("PDFメタデータの取得に失敗")
-
-    entry_id = os.path.splitext(os.path.basename(pdf_file))[0]
-    # entry_idから空白を除去
-    entry_id = entry_id.replace(' ', '_')
+    entry_id = entry_id_for(pdf_file)
 
     # xmls以下に格納
     xmls_dir = os.path.join(dir, "xmls".replace(' ', '_'))
@@ -236,8 +696,70 @@ def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None):
     if not os.path.exists(images_dir):
         os.makedirs(images_dir)
 
-    image_count = extract_images_from_pdf(pdf_file, images_dir)
-    half_img_path = get_half(pdf_file, images_dir)
+    manifest = pipeline_manifest.Manifest(dirpath)
+    if force:
+        manifest.clear()
+    pdf_hash = manifest.source_hash(pdf_file)
+    half_params = {
+        'dpi': float(os.getenv("HALF_IMAGE_DPI", "144")),
+        'fmt': os.getenv("HALF_IMAGE_FORMAT", "png"),
+        'max_width': int(os.getenv("HALF_IMAGE_MAX_WIDTH", "0")) or None,
+    }
+    metadata_key = pipeline_manifest.stage_key('metadata', pdf_hash, METADATA_VERSION, text_selection_params())
+    images_key = pipeline_manifest.stage_key('images', pdf_hash, IMAGE_PARAMS, IMAGES_VERSION)
+    half_key = pipeline_manifest.stage_key('half_image', pdf_hash, half_params)
+
+    # PDFは必要になった段階で一度だけ開き、メタデータ・画像抽出・1ページ目の描画で共有する
+    doc = None
+
+    def get_doc():
+        nonlocal doc
+        if doc is None:
+            doc = open_pdf(pdf_file)
+        return doc
+
+    def run_images():
+        # 前回の出力が残っていると画像一覧に混ざるため、先に削除する
+        for path in manifest.outputs('images'):
+            if os.path.exists(path):
+                os.remove(path)
+        # IMAGE_WORKERS > 1 でページを並列に処理する（バッチ処理ではファイル単位で並列化済みのため既定は1）
+        return extract_images_from_pdf(
+            pdf_file, images_dir, doc=get_doc(),
+            workers=int(os.getenv("IMAGE_WORKERS", "1")),
+            deadline=deadline,
+            reporter=reporter,
+            **IMAGE_PARAMS
+        )
+
+    try:
+        deadline.check("メタデータ取得")
+        metadata = pipeline_manifest.run_stage(
+            manifest, 'metadata', metadata_key,
+            lambda: get_metadata_from_pdf(pdf_file, doc=get_doc()),
+            reporter=reporter
+        )
+        if metadata is None:
+            manifest.invalidate('metadata')
+            raise ValueError("PDFメタデータの取得に失敗")
+
+        deadline.check("画像抽出")
+        _, image_meta = pipeline_manifest.run_stage(
+            manifest, 'images', images_key, run_images,
+            outputs=lambda r: [os.path.join(images_dir, img['file']) for img in r[1]],
+            reporter=reporter
+        )
+        deadline.check("ヘッダー画像の作成")
+        half_img_path = pipeline_manifest.run_stage(
+            manifest, 'half_image', half_key,
+            lambda: get_half(pdf_file, images_dir, doc=get_doc(), **half_params),
+            outputs=lambda r: [r],
+            reporter=reporter
+        )
+    finally:
+        # LLM呼び出しの前にPDFを閉じ、メモリを解放しておく
+        if doc is not None:
+            doc.close()
 
     # 画像やメタデータ内のパスにも空白が入る可能性があるので全て置換
     # images_dir内のファイル名にもスペースがあれば置換
@@ -248,7 +770,39 @@ def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None):
             new_path = os.path.join(images_dir, new_name)
             os.rename(old_path, new_path)
 
-    summary_info = get_summary(metadata)
+    if summarize:
+        long_mode = long_summary.long_summary_enabled()
+        summary_key = summary_stage_key(metadata, pdf_hash)
+        if manifest.is_fresh('summary', summary_key) and on_field is not None:
+            for field in SUMMARY_FIELDS:
+                on_field(field, manifest.result('summary').get(field, "N/A"))
+
+        def run_summary():
+            options = dict(on_field=on_field, on_progress=on_progress, idle_timeout=timeout_sec,
+                           deadline=deadline, reporter=reporter)
+            if long_mode:
+                # 本文全体をチャンクに分けて並行に要約し、5項目にまとめる（long_summary.py）
+                return long_summary.get_long_summary(pdf_file, metadata, **options)
+            return get_summary(metadata, **options)
+
+        summary_info = pipeline_manifest.run_stage(
+            manifest, 'summary', summary_key, run_summary,
+            reporter=reporter
+        )
+    else:
+        # 要約は後でまとめて行う（batch_summary.py）。ここでは空欄のまま保存する
+        summary_key = None
+        summary_info = parse_summary("")
+
+    # paper.json（paper_record.py）に書き込む前にパス文字列をチェックし、スペースを_に変換
+    record_path = os.path.join(dirpath, paper_record.RECORD_NAME)
+    record_key = pipeline_manifest.stage_key('record', paper_record.RECORD_VERSION, metadata_key, images_key,
+                                             half_key, summary_key)
+    reporter.stage_started('record')
+    if manifest.is_fresh('record', record_key):
+        reporter.stage_finished('record', skipped=True)
+        return dirpath
+    deadline.check("中間データの保存")
 
     # paper_info中のパス文字列にもスペースが残らないよう処理
     def no_space_path(p):
@@ -258,25 +812,30 @@ def process_pdf(pdf_file, dir='./output', timeout_sec=60, start_time=None):
             return p.replace(' ', '_')
         return p
 
+    title = metadata['title']
+    if isinstance(title, list):
+        title = ''.join(title)
     paper_info = {
-        'paper': {
-            'title': metadata['title'],
-            'authors': metadata['authors'],
-            'abstract': metadata.get('abstract', 'N/A'),
-            'pdf': pdf_file.replace(' ', '_'),
-            'image_count': image_count,
-            'images': [no_space_path(os.path.join(images_dir, f)) for f in os.listdir(images_dir)],
-            'half_img_path': no_space_path(half_img_path),
-            'title_jp': summary_info['title_jp'],
-            'keywords': summary_info['keywords'],
-            'problem': summary_info['problem'],
-            'method': summary_info['method'],
-            'result': summary_info['result'],
-            'query': "N/A"
-        }
+        'title': str(title),
+        'authors': [str(a) for a in metadata['authors']],
+        'abstract': str(metadata.get('abstract', 'N/A')),
+        'pdf': pdf_file.replace(' ', '_'),
+        'image_count': len(image_meta),
+        'images': [no_space_path(os.path.join(images_dir, f)) for f in os.listdir(images_dir)],
+        # 抽出時に分かっている寸法・サイズ・ハッシュ（make_md が画像を開かずに使う）
+        'image_meta': image_meta,
+        'half_img_path': no_space_path(half_img_path),
+        'title_jp': summary_info['title_jp'],
+        'keywords': summary_info['keywords'],
+        'problem': summary_info['problem'],
+        'method': summary_info['method'],
+        'result': summary_info['result'],
+        'query': "N/A"
     }
 
-    # 再度paper.xmlに書き込む前にパス文字列をチェックし、スペースを_に変換
-    xml_path = os.path.join(dirpath, "paper.xml".replace(' ', '_'))
-    save_as_xml(paper_info, xml_path)
-    return dirpath
\ No newline at end of file
+    with tracing.span("save_record") as sp:
+        paper_record.save(dirpath, paper_info)
+        sp.set(bytes_written=tracing.file_size(record_path))
+    manifest.record('record', record_key, outputs=[record_path])
+    reporter.stage_finished('record')
+    return dirpath
@@ -0,0 +1,126 @@
+# slide_pdf.py
+# Marp（Node/Chromium）を使わずに、md2pptx.build_slides_data のスライドデータから
+# PyMuPDFで直接PDFを作る。見た目はMarpのdefaultテーマより簡素だが、プロセスを起動しない分速い。
+import os
+import re
+import html
+import time
+import fitz  # PyMuPDF
+import md2pptx
+import tracing
+import deadline as deadline_mod
+import progress
+
+# Marpと同じスライドサイズ(px)。PDFでは 1px = 0.75pt で出力される
+SLIDE_SIZES = {
+    '16:9': (1280, 720),
+    '4:3': (960, 720),
+}
+PX_TO_PT = 0.75
+MARGIN = 70
+# Marpのdefaultテーマに近い文字サイズ(px)と色。日本語は insert_htmlbox が内蔵フォントで補う
+SLIDE_CSS = """
+* {{ font-family: sans-serif; color: #23282d; }}
+h1 {{ font-size: {title}pt; margin: 0 0 {gap}pt 0; }}
+p, li {{ font-size: {body}pt; margin: 0 0 {gap}pt 0; }}
+"""
+
+def slide_size(front_matter):
+    # front matter の size（16:9 / 4:3 / 1280x720 形式）からページサイズ(pt)を返す
+    size = (front_matter.get('size') or '16:9').strip()
+    if size in SLIDE_SIZES:
+        w, h = SLIDE_SIZES[size]
+    else:
+        m = re.match(r'^(\d+)\s*[x×]\s*(\d+)$', size)
+        w, h = (int(m.group(1)), int(m.group(2))) if m else SLIDE_SIZES['16:9']
+    return w * PX_TO_PT, h * PX_TO_PT
+
+def slide_html(slide, show_title=True):
+    parts = []
+    if show_title and slide.get('title'):
+        parts.append(f"<h1>{html.escape(slide['title'])}</h1>")
+    if slide['type'] == 'bullet' and slide.get('bullets'):
+        parts.append("<ul>" + "".join(f"<li>{html.escape(b)}</li>" for b in slide['bullets']) + "</ul>")
+    for line in slide.get('text_lines') or []:
+        parts.append(f"<p>{html.escape(line)}</p>")
+    return "".join(parts)
+
+def render_slide(page, slide, base_dir, scale, page_no=None):
+    rect = page.rect
+    margin = MARGIN * scale
+    y = margin
+    images = slide.get('images') or []
+
+    # 画像だけのスライドでは md2pptx が付ける仮のタイトルを出さない
+    content = slide_html(slide, show_title=not (images and slide.get('title') == "No Title"))
+    if content:
+        css = SLIDE_CSS.format(title=40 * PX_TO_PT * scale, body=28 * PX_TO_PT * scale, gap=12 * scale)
+        bottom = rect.height - margin if not images else y + (rect.height - margin - y) / 2
+        box = fitz.Rect(margin, y, rect.width - margin, bottom)
+        # 収まらない場合は文字を縮小して枠内に収める（scale_low=0）
+        spare, _ = page.insert_htmlbox(box, content, css=css, scale_low=0)
+        y = box.y1 - spare + 12 * scale
+
+    # 画像は残りの領域に、縦横比を保って中央に配置する
+    for img in images:
+        path = img['src']
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        if not os.path.exists(path):
+            print(f"画像が見つからないためスキップします: {path}")
+            continue
+        box = fitz.Rect(margin / 2, y, rect.width - margin / 2, rect.height - margin / 2)
+        width_px = md2pptx.image_width_px(img.get('alt'))
+        if width_px:
+            w = min(box.width, width_px * PX_TO_PT * scale)
+            box = fitz.Rect(rect.width / 2 - w / 2, box.y0, rect.width / 2 + w / 2, box.y1)
+        if box.height <= 0:
+            break
+        page.insert_image(box, filename=path, keep_proportion=True)
+        y = box.y1
+
+    if page_no is not None:
+        page.insert_text((rect.width - margin, rect.height - 24 * scale), str(page_no),
+                         fontsize=18 * scale, color=(0.5, 0.5, 0.5))
+
+def render_slides_pdf(front_matter, slides_data, pdf_output_file, base_dir=".", deadline=None, reporter=None):
+    reporter = progress.ensure(reporter)
+    width, height = slide_size(front_matter)
+    # 文字サイズなどは1280x720(px)を基準にして、ページサイズに合わせて拡大縮小する
+    scale = height / (720 * PX_TO_PT)
+    paginate = str(front_matter.get('paginate', '')).lower() == 'true'
+
+    doc = fitz.open()
+    try:
+        for i, slide in enumerate(slides_data, 1):
+            if deadline is not None:
+                deadline.check("PDF変換")
+            page = doc.new_page(width=width, height=height)
+            render_slide(page, slide, base_dir, scale, page_no=i if paginate else None)
+            reporter.emit('slide_built', 'pdf', i, len(slides_data))
+        output_dir = os.path.dirname(pdf_output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        # 日本語フォントを丸ごと埋め込むと数MBになり保存も遅いため、使った文字だけに絞る
+        doc.subset_fonts()
+        doc.save(pdf_output_file, garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+def convert_md_to_pdf(md_file, pdf_output_file, timeout_sec=60, start_time=None, deadline=None, reporter=None):
+    if start_time is None:
+        start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+
+    with tracing.span("render_slides_pdf") as sp:
+        with open(md_file, 'r', encoding='utf-8') as f:
+            md_text = f.read()
+        md_text = md2pptx.preprocess_marp(md_text)
+        front_matter, body = md2pptx.parse_front_matter(md_text)
+        slides_data = md2pptx.build_slides_data(body)
+        # 画像のパスはMarpと同じくMarkdownファイルの場所からの相対パス
+        render_slides_pdf(front_matter, slides_data, pdf_output_file,
+                          base_dir=os.path.dirname(os.path.abspath(md_file)), deadline=deadline,
+                          reporter=reporter)
+        sp.set(slide_count=len(slides_data), bytes_written=tracing.file_size(pdf_output_file))
+    print(f"Successfully converted {md_file} to {pdf_output_file}")
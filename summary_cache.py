@@ -0,0 +1,133 @@
+# summary_cache.py
+# get_summaryの結果をSQLiteに保存する永続キャッシュ
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+DEFAULT_CACHE_PATH = "./.cache/summary_cache.sqlite3"
+DEFAULT_MAX_MB = 100
+DEFAULT_MAX_AGE_DAYS = 90
+
+def make_key(model, prompt, temperature, text):
+    # モデル・プロンプト・温度・送信テキストが完全に一致したときだけヒットさせる
+    payload = json.dumps(
+        {'model': model, 'prompt': prompt, 'temperature': temperature, 'text': text},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def cache_enabled():
+    # SUMMARY_CACHE=0 でキャッシュを無効化できる
+    return os.getenv("SUMMARY_CACHE", "1").strip().lower() not in ("0", "false", "off", "no")
+
+class SummaryCache:
+    def __init__(self, path=None, max_bytes=None, max_age_sec=None):
+        if path is None:
+            path = os.getenv("SUMMARY_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("SUMMARY_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        if max_age_sec is None:
+            max_age_sec = int(float(os.getenv("SUMMARY_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)) * 86400)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT PRIMARY KEY,"
+                " summary TEXT NOT NULL,"
+                " raw TEXT,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON summaries(accessed_at)")
+
+    def _connect(self):
+        # バッチ処理では複数プロセスから同時に書き込まれるためWALにしておく
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT summary, raw, created_at FROM summaries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                summary, raw, created_at = row
+                if self.max_age_sec and now - created_at > self.max_age_sec:
+                    conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+        return {'summary': json.loads(summary), 'raw': raw}
+
+    def put(self, key, summary_dict, raw=None):
+        now = time.time()
+        summary = json.dumps(summary_dict, ensure_ascii=False)
+        size = len(summary.encode('utf-8')) + len((raw or '').encode('utf-8'))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, raw, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, summary, raw, size, now, now)
+                )
+                self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def _evict(self, conn, now):
+        # 期限切れを削除し、上限サイズを超えた分は最終アクセスが古い順に削除する
+        if self.max_age_sec:
+            conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.max_age_sec,))
+        if not self.max_bytes:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM summaries ORDER BY accessed_at ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM summaries WHERE key = ?", doomed)
+
+    def evict(self):
+        conn = self._connect()
+        try:
+            with conn:
+                self._evict(conn, time.time())
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM summaries")
+        finally:
+            conn.close()
+
+_default_cache = None
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SummaryCache()
+    return _default_cache
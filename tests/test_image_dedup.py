@@ -0,0 +1,98 @@
+# test_image_dedup.py
+# query_gui.extract_images_from_pdf の近似重複の除外が、別の図（白地の多い棒グラフ同士）を残し、
+# 同じ図の再掲（別のxrefで埋め込み直したもの）だけを除くことを確かめる
+#
+#   python -m pytest -q tests
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fitz = pytest.importorskip("fitz")
+Image = pytest.importorskip("PIL.Image")
+from PIL import ImageDraw
+
+import image_hash
+import query_gui
+
+# 棒の高さ（グラフの高さに対する割合）。BASE と CLOSE は dHash の距離が数ビットしか違わない
+BASE = [0.3, 0.5, 0.7, 0.9]
+CLOSE = [0.3, 0.5, 0.9, 0.7]
+SWAPPED = [0.5, 0.3, 0.9, 0.7]
+
+
+def bar_chart(values, fmt="PNG", size=(800, 600)):
+    width, height = size
+    im = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(im)
+    bottom = height - 40
+    for y in range(40, bottom, 40):
+        draw.line([(40, y), (width - 20, y)], fill=(220, 220, 220), width=1)
+    draw.line([(40, bottom), (width - 20, bottom)], fill="black", width=3)
+    draw.line([(40, 20), (40, bottom)], fill="black", width=3)
+    bar_width = width // (len(values) * 2)
+    for i, value in enumerate(values):
+        x = 60 + i * 2 * bar_width
+        draw.rectangle([x, bottom - int(value * (bottom - 40)), x + bar_width, bottom], fill=(40, 90, 200))
+        draw.text((x, bottom + 10), f"method {i + 1}", fill="black")
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        im.save(buf, "JPEG", quality=95)
+    else:
+        im.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def make_pdf(path, images):
+    doc = fitz.open()
+    for data in images:
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), "Figure", fontsize=12)
+        page.insert_image(fitz.Rect(72, 100, 472, 400), stream=data)
+    doc.save(path)
+    doc.close()
+
+
+def signature_distance(a, b):
+    return image_hash.hamming(image_hash.dhash_from_bytes(a), image_hash.dhash_from_bytes(b))
+
+
+def test_close_charts_have_close_hashes():
+    # 前提: 別のグラフでも dHash だけでは重複と区別できない距離になる
+    base = bar_chart(BASE)
+    assert signature_distance(base, bar_chart(CLOSE)) <= image_hash.DEFAULT_MAX_DISTANCE
+    assert signature_distance(base, bar_chart(SWAPPED)) <= 10
+
+
+def test_distinct_charts_survive_and_reembedded_figure_is_dropped(tmp_path):
+    pdf = str(tmp_path / "charts.pdf")
+    # 4ページ目は1ページ目と同じ図をJPEGで埋め込み直したもの（データもxrefも異なる）
+    make_pdf(pdf, [bar_chart(BASE), bar_chart(CLOSE), bar_chart(SWAPPED), bar_chart(BASE, fmt="JPEG")])
+
+    _, images = query_gui.extract_images_from_pdf(pdf, imgdir=str(tmp_path / "images"), **query_gui.IMAGE_PARAMS)
+
+    assert [image['page'] for image in images] == [1, 2, 3]
+    assert len({image['xref'] for image in images}) == 3
+
+
+def test_dedup_disabled_keeps_every_figure(tmp_path):
+    pdf = str(tmp_path / "charts.pdf")
+    make_pdf(pdf, [bar_chart(BASE), bar_chart(BASE, fmt="JPEG")])
+
+    _, images = query_gui.extract_images_from_pdf(pdf, imgdir=str(tmp_path / "images"), dedup_distance=None)
+
+    assert [image['page'] for image in images] == [1, 2]
+
+
+def test_hash_index_confirms_with_thumbnail():
+    base = image_hash.signature_from_bytes(bar_chart(BASE))
+    close = image_hash.signature_from_bytes(bar_chart(CLOSE))
+    again = image_hash.signature_from_bytes(bar_chart(BASE, fmt="JPEG"))
+
+    index = image_hash.HashIndex()
+    index.add(base[0], "base", base[1])
+    assert index.find(*close) is None
+    assert index.find(*again)[0] == "base"
@@ -0,0 +1,117 @@
+# test_llm_client.py
+# llm_client（送信量の制御・429からの再送）と query_gui.get_summaries を、
+# 空きポートで起動した mock_llm_server に対して確かめる
+#
+#   python -m pytest -q tests
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+import mock_llm_server
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = mock_llm_server.start_server(port=0, **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_token_bucket_waits_for_refill():
+    # 1分あたり600個（0.1秒に1個）、容量1のバケットから4個取り出すと、2個目以降は補充を待つ
+    bucket = llm_client.TokenBucket(600, capacity=1)
+
+    async def run():
+        for _ in range(4):
+            await bucket.acquire(1)
+
+    start = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - start
+    assert 0.25 <= elapsed < 1.0
+
+
+def test_token_bucket_pause_blocks_until_retry_after():
+    bucket = llm_client.TokenBucket(6000)
+    bucket.pause(0.3)
+
+    start = time.monotonic()
+    asyncio.run(bucket.acquire(1))
+    assert time.monotonic() - start >= 0.25
+
+
+def test_chat_retries_after_429(start_server):
+    # 0.5秒あたり1リクエストだけ許可するサーバーに続けて送ると、2件目は429（Retry-After付き）になり、
+    # クライアントはその秒数だけ待ってから再送して成功する
+    server = start_server(rpm=1, window=0.5)
+
+    async def run():
+        async with llm_client.AsyncLLMClient(base_url=server.base_url, api_key="dummy", max_retries=3) as client:
+            messages = [{'role': 'user', 'content': "hello"}]
+            first = await client.chat(messages, model="mock", temperature=0)
+            second = await client.chat(messages, model="mock", temperature=0)
+            return first, second
+
+    start = time.monotonic()
+    first, second = asyncio.run(run())
+    elapsed = time.monotonic() - start
+    assert first.choices[0].message.content == mock_llm_server.MOCK_SUMMARY
+    assert second.choices[0].message.content == mock_llm_server.MOCK_SUMMARY
+    assert server.state.rejected >= 1
+    assert elapsed >= 0.3
+
+
+def test_chat_gives_up_after_max_retries(start_server):
+    import openai
+
+    server = start_server(rpm=1, window=30)
+
+    async def run():
+        async with llm_client.AsyncLLMClient(base_url=server.base_url, api_key="dummy", max_retries=0) as client:
+            messages = [{'role': 'user', 'content': "hello"}]
+            await client.chat(messages, model="mock", temperature=0)
+            await client.chat(messages, model="mock", temperature=0)
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+
+
+def test_get_summaries_keeps_input_order(start_server):
+    import query_gui
+
+    count = 6
+    finished = []
+    lock = threading.Lock()
+
+    def content(body):
+        # 後の論文ほど早く応答し、完了順を入力と逆にする
+        title = body['messages'][-1]['content'].split("\n", 1)[0].split(": ", 1)[1]
+        index = int(title.rsplit("-", 1)[1])
+        time.sleep((count - index) * 0.05)
+        with lock:
+            finished.append(index)
+        return f"論文名:{title}\nキーワード:k{index}\n課題:p\n手法:m\n結果:r"
+
+    server = start_server(content=content)
+    metadata = [{'title': f"paper-{i}", 'abstract': f"abstract {i}"} for i in range(count)]
+    results = query_gui.get_summaries(metadata, use_cache=False, base_url=server.base_url, api_key="dummy",
+                                      concurrency=count)
+
+    assert finished != sorted(finished)
+    assert [r['title_jp'] for r in results] == [f"paper-{i}" for i in range(count)]
+    assert [r['keywords'] for r in results] == [f"k{i}" for i in range(count)]
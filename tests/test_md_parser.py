@@ -0,0 +1,50 @@
+# test_md_parser.py
+# md2pptx.tokenize_slides（1パスの解析）が、扱う Marp の記法について従来の markdown + BeautifulSoup による
+# 解析と同じ結果になることと、扱いを変えた入力で期待どおりになることを benchmarks/bench_md_parser.py のコーパスで確かめる
+#
+#   python -m pytest -q tests
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import md2pptx
+import bench_md_parser
+
+
+@pytest.fixture(scope="module")
+def legacy():
+    # 従来の解析は比較のためだけに使うため、markdown / bs4 がなければ比較を省く
+    pytest.importorskip("markdown")
+    pytest.importorskip("bs4")
+    return bench_md_parser.legacy_slides_data
+
+
+@pytest.mark.parametrize("name,md", bench_md_parser.CORPUS, ids=[name for name, _ in bench_md_parser.CORPUS])
+def test_matches_legacy_parser(legacy, name, md):
+    assert md2pptx.tokenize_slides(md) == legacy(md)
+
+
+@pytest.mark.parametrize("name,md,expected", bench_md_parser.FIXED, ids=[name for name, _, _ in bench_md_parser.FIXED])
+def test_fixed_cases(name, md, expected):
+    # 従来の分割（--- を含む箇所すべてで分割）では壊れていた入力
+    assert md2pptx.tokenize_slides(md) == expected
+
+
+@pytest.mark.parametrize("name,md,expected", bench_md_parser.CHANGED,
+                         ids=[name for name, _, _ in bench_md_parser.CHANGED])
+def test_changed_cases(name, md, expected):
+    assert md2pptx.tokenize_slides(md) == expected
+
+
+def test_generated_deck_matches_legacy_parser(legacy):
+    deck = bench_md_parser.generate_deck(200)
+    assert md2pptx.tokenize_slides(deck) == legacy(deck)
+
+
+def test_front_matter_only_at_start():
+    assert bench_md_parser.check_front_matter()
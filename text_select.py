@@ -0,0 +1,203 @@
+# text_select.py
+# 要約プロンプトに入れる本文を選ぶ。
+# 以前は1〜3ページ目のテキストを連結して先頭2000文字で切っていたため、著者や所属の行で枠を使い、
+# Abstract の後半や結論が入らないことが多かった。ここでは PyMuPDF のテキストブロックから
+# Abstract / Introduction / Conclusion の節を探し、トークン数の上限（SUMMARY_TOKEN_BUDGET）に収まるよう詰める。
+# トークン数は tiktoken で数える。インストールされていないか、エンコーディングを読み込めない
+# （オフラインなど）場合は文字種からの概算を使う。
+import os
+import re
+
+DEFAULT_TOKEN_BUDGET = 700
+# 節が見つからなかった場合に使う先頭のページ数（以前と同じ）
+FALLBACK_PAGES = 3
+
+# 節の種類と見出しの語。英語は大文字・小文字を区別しない
+SECTION_NAMES = {
+    'abstract': r"abstract|概要|要旨|アブストラクト",
+    'introduction': r"introduction|はじめに|序論",
+    'conclusion': r"conclusions?(?: and (?:future work|outlook))?|concluding remarks|summary and conclusions?"
+                  r"|discussion and conclusions?|おわりに|結論|まとめ",
+    'end': r"references|bibliography|acknowledge?ments?|appendix|参考文献|謝辞|付録",
+}
+SECTION_LABELS = {
+    'abstract': "Abstract",
+    'introduction': "Introduction",
+    'conclusion': "Conclusion",
+    'front': "Front matter",
+}
+# プロンプトに入れる順（本文中の順）と、予算を割り当てる優先順
+SECTION_ORDER = ('front', 'abstract', 'introduction', 'conclusion')
+SECTION_PRIORITY = ('abstract', 'conclusion', 'introduction')
+LABEL_TOKENS = 4
+
+# 行頭の章番号（"1", "1.", "IV." など）。"1.1" のような小節は節の区切りとして扱わない
+_NUMBER = r"(?:\d+|[IVX]+)\.?"
+_KNOWN_HEADING = re.compile(
+    r"^\s*(?P<num>" + _NUMBER + r"\s*)?(?P<name>" + "|".join(
+        f"(?P<{kind}>{pattern})" for kind, pattern in SECTION_NAMES.items()
+    ) + r")\b\s*(?P<sep>[.:：—–\-]?)\s*",
+    re.IGNORECASE
+)
+# 番号付きの見出し（"3 Method" など）。ここで Introduction / Conclusion の節が終わる
+_NUMBERED_HEADING = re.compile(r"^\s*" + _NUMBER + r"\s+[A-Z][^.\n]{2,60}$")
+
+_encoders = {}
+
+def token_budget():
+    try:
+        return max(50, int(os.getenv("SUMMARY_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET))))
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
+
+def selection_enabled():
+    return os.getenv("SECTION_SELECT", "1").strip().lower() not in ("0", "false", "off", "no")
+
+def get_encoder(model):
+    # 読み込みに失敗した場合も記録し、呼び出しごとにダウンロードを試みないようにする
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"tiktoken を使えないため、トークン数は概算します: {type(e).__name__}")
+            _encoders[model] = None
+    return _encoders[model]
+
+def tokenizer_name(model):
+    encoder = get_encoder(model)
+    return f"tiktoken:{encoder.name}" if encoder is not None else "approx"
+
+def _approx_cost(ch):
+    # 英数字はおおよそ4文字で1トークン、日本語などは1文字1トークンとして多めに見積もる
+    return 0.25 if ord(ch) < 128 else 1.0
+
+def count_tokens(text, model):
+    encoder = get_encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return int(sum(_approx_cost(ch) for ch in text) + 0.999)
+
+def truncate_to_tokens(text, max_tokens, model):
+    """
+    text を max_tokens 以内に切り詰める。切った位置の近くに文の終わりがあればそこで切る。
+    """
+    if max_tokens <= 0:
+        return ""
+    encoder = get_encoder(model)
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = encoder.decode(tokens[:max_tokens])
+    else:
+        cost = 0.0
+        end = len(text)
+        for i, ch in enumerate(text):
+            cost += _approx_cost(ch)
+            if cost > max_tokens:
+                end = i
+                break
+        if end == len(text):
+            return text
+        cut = text[:end]
+    # 後ろ3割以内に文末があれば、文の途中で切らない
+    stop = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("。"))
+    if stop >= len(cut) * 0.7:
+        cut = cut[:stop + 1]
+    return cut.rstrip()
+
+def _clean(text):
+    # 行末のハイフネーションをつなぎ、改行と連続する空白を1つの空白にする
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def _heading(block_text):
+    """
+    ブロックの先頭が見出しなら (種類, 見出しの後の本文) を返す。種類は SECTION_NAMES のキーか 'other'。
+    見出しでなければ None。
+    """
+    first_line = block_text.lstrip().split("\n", 1)[0].strip()
+    m = _KNOWN_HEADING.match(block_text)
+    if m:
+        kind = next(k for k in SECTION_NAMES if m.group(k))
+        rest = block_text[m.end():]
+        standalone = len(first_line) <= len(m.group(0).strip()) + 1
+        # "Abstract—We propose ..." のように本文が続く形は Abstract だけ認める。
+        # 他の語は本文の文頭（"Introduction of ..." など）と区別するため、単独の行か番号付きのみ
+        if standalone or m.group('num') or (kind == 'abstract' and m.group('sep')):
+            return kind, rest
+    if len(first_line) <= 60 and _NUMBERED_HEADING.match(first_line):
+        return 'other', block_text.lstrip().split("\n", 1)[1] if "\n" in block_text.strip() else ""
+    return None
+
+def split_sections(doc, max_pages=None):
+    """
+    doc（fitz.Document）のテキストブロックを見出しで区切り、[(種類, テキスト), ...] を返す。
+    最初の見出しより前は 'front'（タイトル・著者・所属、見出しのない Abstract など）。
+    """
+    sections = [['front', []]]
+    page_count = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+    for pno in range(page_count):
+        for block in doc[pno].get_text("blocks"):
+            if block[6] != 0:
+                # 画像ブロック
+                continue
+            text = block[4]
+            if not text.strip():
+                continue
+            heading = _heading(text)
+            if heading is not None:
+                kind, rest = heading
+                sections.append([kind, [rest] if rest.strip() else []])
+            else:
+                sections[-1][1].append(text)
+    return [(kind, _clean(" ".join(parts))) for kind, parts in sections]
+
+def pack_sections(found, budget, model):
+    """
+    found（{種類: テキスト}）を SECTION_PRIORITY の順に budget トークンまで割り当てる。
+    最初の節は後の節がある場合は6割まで、以降は残りを後の節と等分し、使われなかった分は次の節に回す。
+    """
+    wanted = [kind for kind in SECTION_PRIORITY if found.get(kind)]
+    if 'abstract' not in found and found.get('front'):
+        # 見出しのない Abstract はタイトル・著者の後にあることが多いため、その位置に前付けを使う
+        wanted.insert(0, 'front')
+    remaining = budget
+    picked = {}
+    for i, kind in enumerate(wanted):
+        later = len(wanted) - i - 1
+        # 最初の節（Abstract）は全体の6割まで、それ以外は残りを後の節と等分する
+        share = int(remaining * 0.6) if i == 0 and later else remaining // (later + 1)
+        text = truncate_to_tokens(found[kind], share, model)
+        if text:
+            picked[kind] = text
+            remaining -= count_tokens(text, model)
+    return picked
+
+def select_text(doc, model, budget=None):
+    """
+    要約に使う本文を選び、(テキスト, 情報) を返す。情報は
+    {'sections': 使った節, 'tokens': トークン数, 'tokenizer': 数え方}。
+    節が1つも見つからなければ、以前と同じく先頭 FALLBACK_PAGES ページのテキストを上限まで使う。
+    """
+    if budget is None:
+        budget = token_budget()
+    found = {}
+    for kind, text in split_sections(doc):
+        # 同じ種類の節が複数あれば最初のもの（目次や本文中の語に引っかかった後のものは使わない）
+        if kind in SECTION_LABELS and text and kind not in found:
+            found[kind] = text
+    if not any(kind in found for kind in SECTION_PRIORITY):
+        text = "".join(doc[pno].get_text() for pno in range(min(FALLBACK_PAGES, doc.page_count)))
+        text = truncate_to_tokens(_clean(text), budget, model)
+        return text, {'sections': [], 'tokens': count_tokens(text, model), 'tokenizer': tokenizer_name(model)}
+
+    # 節の見出し（"Abstract: " と区切りの改行）の分を残しておく
+    picked = pack_sections(found, budget - LABEL_TOKENS * len(SECTION_PRIORITY), model)
+    order = [kind for kind in SECTION_ORDER if kind in picked]
+    text = "\n\n".join(f"{SECTION_LABELS[kind]}: {picked[kind]}" for kind in order)
+    return text, {'sections': order, 'tokens': count_tokens(text, model), 'tokenizer': tokenizer_name(model)}
@@ -0,0 +1,158 @@
+# tracing.py
+# 処理段階ごとの所要時間と入出力量を記録し、Chrome trace形式(JSON)で出力する
+# 既定では無効。環境変数 TRACE_DIR を指定すると有効になり、実行ごとに
+#   <TRACE_DIR>/<名前>_<日時>_<pid>.trace.json（メインスレッド以外では末尾に _t<スレッドID>）
+# を書き出す。chrome://tracing や https://ui.perfetto.dev で開ける。
+# 記録中のspanと trace_run の入れ子の深さはスレッドごとに持つ。GUIでは複数のPDFを
+# QThreadPool で並行に処理するため、各 trace_run には同じスレッドで記録したspanだけが入る。
+import os
+import json
+import time
+import threading
+
+_enabled = False
+_trace_dir = None
+_local = threading.local()
+
+def _thread_state():
+    # このスレッドで記録したspan（events）と trace_run の入れ子の深さ（depth）
+    if not hasattr(_local, 'events'):
+        _local.events = []
+        _local.depth = 0
+    return _local
+
+class _NoopSpan:
+    # 無効時に返す何もしないspan。毎回の生成を避けるため1つを使い回す
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, value):
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    def __init__(self, name, cat, attrs):
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, value):
+        # bytes_written などを積算する
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs['error'] = f"{exc_type.__name__}: {exc}"
+        event = {
+            'name': self.name,
+            'cat': self.cat,
+            'ph': 'X',
+            'ts': round(self.start * 1e6, 3),
+            'dur': round((end - self.start) * 1e6, 3),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.attrs,
+        }
+        _thread_state().events.append(event)
+        return False
+
+def enable(trace_dir):
+    global _enabled, _trace_dir
+    _trace_dir = trace_dir
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def enabled():
+    return _enabled
+
+def span(name, cat='stage', **attrs):
+    """
+    with tracing.span("extract_images", pdf=path) as sp:
+        ...
+        sp.set(image_count=n)
+    無効時は共有の何もしないspanを返すため、呼び出し側の負担はほぼない。
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, cat, attrs)
+
+def file_size(path):
+    # 入出力バイト数の記録用。存在しなければ0
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def dump(path):
+    # 呼び出したスレッドで記録したspanを書き出す
+    state = _thread_state()
+    events = list(state.events)
+    state.events.clear()
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+class _Run:
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+        self.span = None
+
+    def __enter__(self):
+        state = _thread_state()
+        outermost = state.depth == 0
+        state.depth += 1
+        # 同じスレッドで入れ子になった trace_run は一番外側のファイルにまとめ、run自体のspanは記録しない
+        if outermost:
+            self.span = Span(self.name, 'run', {})
+            self.span.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _thread_state().depth -= 1
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.name)
+            suffix = f"{os.getpid()}"
+            if threading.current_thread() is not threading.main_thread():
+                # 並行して処理している他のジョブと同じ名前・時刻でも上書きしない
+                suffix += f"_t{threading.get_ident()}"
+            self.path = dump(os.path.join(_trace_dir, f"{safe_name}_{stamp}_{suffix}.trace.json"))
+            print(f"トレースを出力しました: {self.path}")
+        return False
+
+def trace_run(name):
+    """
+    1回の実行（PDF1件の処理や1回の変換）を囲む。
+    有効時は、一番外側の trace_run を抜けたときにそれまでのspanをファイルに書き出す。
+    """
+    if not _enabled:
+        return _NOOP
+    return _Run(name)
+
+if os.getenv("TRACE_DIR"):
+    enable(os.getenv("TRACE_DIR"))
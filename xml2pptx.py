@@ -0,0 +1,103 @@
+# xml2pptx.py
+# paper.json（paper_record.py）から直接PPTXを作る。Markdownを書き出して md2pptx で読み直す往復を省き、
+# make_md と同じ並び（タイトル・要約・ヘッダー画像・図）のスライドを python-pptx で組み立てる
+import os
+import time
+import datetime
+from pptx.util import Pt
+import mkmd_gui
+import md2pptx
+import paper_record
+import pipeline_manifest
+import tracing
+import deadline as deadline_mod
+import progress
+
+# make_md の front matter と同じスライドサイズ
+SLIDE_RATIO = '16:9'
+SUMMARY_FIELDS = (('problem', '課題'), ('method', '手法'), ('result', '結果'))
+
+def _field(paper, key):
+    # 古い paper.xml から変換した記録では、空の要素が空文字列・None になっていることがある
+    return paper.get(key) or 'N/A'
+
+def add_summary_slide(prs, paper, font_size=18):
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = _field(paper, 'title_jp')
+    tf = slide.placeholders[1].text_frame
+    tf.clear()
+    lines = [(None, _field(paper, 'title')), (None, f"[{_field(paper, 'year')}] {_field(paper, 'entry_id')}")]
+    lines += [(label, _field(paper, key)) for key, label in SUMMARY_FIELDS]
+    for i, (label, text) in enumerate(lines):
+        p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+        if label:
+            run = p.add_run()
+            run.text = f"{label} "
+            run.font.bold = True
+            run.font.size = Pt(font_size)
+        run = p.add_run()
+        run.text = text
+        run.font.size = Pt(font_size)
+    return slide
+
+def build_pptx(dirname, pptx_output_file, min_size_kb=100, template_file=None, deadline=None, reporter=None):
+    reporter = progress.ensure(reporter)
+    paper = mkmd_gui.read_paper(dirname)
+    prs = md2pptx.new_presentation(SLIDE_RATIO, template_file)
+
+    today = datetime.datetime.now().strftime('%Y年%m月%d日')
+    md2pptx.add_title_slide(prs, _field(paper, 'title'), subtitle_text=today)
+    add_summary_slide(prs, paper)
+
+    half_img_path = paper.get('half_img_path')
+    has_half = bool(half_img_path and os.path.exists(half_img_path))
+    images = mkmd_gui.slide_images(dirname, min_size_kb, paper=paper)
+    slide_total = len(prs.slides) + int(has_half) + len(images)
+    reporter.emit('slide_built', 'pptx', len(prs.slides), slide_total)
+    if has_half:
+        md2pptx.add_image_slide(prs, half_img_path, width_px=1400)
+        reporter.emit('slide_built', 'pptx', len(prs.slides), slide_total)
+    else:
+        print("No half_img_path or file not found, skipping half image.")
+
+    for img_path, width, height in images:
+        if deadline is not None:
+            deadline.check("PPTX変換")
+        md2pptx.add_image_slide(prs, img_path, width_px=mkmd_gui.fit_width(width, height),
+                                image_size=(width, height))
+        reporter.emit('slide_built', 'pptx', len(prs.slides), slide_total)
+
+    output_dir = os.path.dirname(pptx_output_file)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    prs.save(pptx_output_file)
+    print(f"PowerPointファイル出力完了: {pptx_output_file}")
+    return len(prs.slides)
+
+def pptx_key(dirname, min_size_kb=100):
+    # paper.json と画像が前回と同じなら、PPTXを作り直さない
+    return pipeline_manifest.stage_key(
+        'pptx', pipeline_manifest.file_hash(paper_record.record_path(dirname)),
+        mkmd_gui.image_listing(dirname), min_size_kb, mkmd_gui.derivative_params()
+    )
+
+def convert_xml_to_pptx(dir_path, pptx_output_file, min_size_kb=100, timeout_sec=60, start_time=None,
+                        deadline=None, on_event=None):
+    if start_time is None:
+        start_time = time.time()
+    deadline = deadline_mod.ensure(deadline, timeout_sec, start_time)
+
+    record_path = paper_record.record_path(dir_path)
+    if not os.path.exists(record_path):
+        raise FileNotFoundError(f"{dir_path} に{paper_record.RECORD_NAME}が存在しません。")
+    deadline.check("PPTX変換")
+
+    reporter = progress.Reporter(on_event)
+    reporter.stage_started('pptx')
+    with tracing.trace_run("convert_xml_to_pptx"):
+        with tracing.span("convert_xml_to_pptx", bytes_read=tracing.file_size(record_path)) as sp:
+            slide_count = build_pptx(dir_path, pptx_output_file, min_size_kb=min_size_kb, deadline=deadline,
+                                     reporter=reporter)
+            sp.set(slide_count=slide_count, bytes_written=tracing.file_size(pptx_output_file))
+    reporter.stage_finished('pptx')
+    return pptx_output_file